@@ -0,0 +1,35 @@
+# alembic/env.py
+
+from logging.config import fileConfig
+from alembic import context
+from app import models  # noqa: F401 - registers the tables
+from app.config import settings
+from app.database import Base, engine
+
+if context.config.config_file_name is not None:
+    fileConfig(context.config.config_file_name)
+
+def run_migrations_offline():
+    """Emit the migration SQL without connecting to the database."""
+    context.configure(url=settings.DATABASE_URL, target_metadata=Base.metadata, literal_binds=True)
+    with context.begin_transaction():
+        context.run_migrations()
+
+def _run_migrations(connection):
+    context.configure(connection=connection, target_metadata=Base.metadata)
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online():
+    """Run the migrations on the application engine, or on a connection passed in by the caller."""
+    connection = context.config.attributes.get("connection")
+    if connection is not None:
+        _run_migrations(connection)
+        return
+    with engine.connect() as connection:
+        _run_migrations(connection)
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
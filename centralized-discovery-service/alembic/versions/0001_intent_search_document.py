@@ -0,0 +1,93 @@
+"""Add the intent search document and its full-text index
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+
+from collections import defaultdict
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from app.models.intent import build_search_document
+
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+intents = sa.table(
+    'intents', sa.column('id'), sa.column('intent_name'), sa.column('description'), sa.column('search_document')
+)
+intent_tags = sa.table('intent_tags', sa.column('intent_id'), sa.column('tag_id'))
+tags = sa.table('tags', sa.column('id'), sa.column('name'))
+
+_SQLITE_FTS = [
+    "CREATE VIRTUAL TABLE intents_fts USING fts5("
+    "search_document, content='intents', content_rowid='id', tokenize='porter unicode61')",
+    "CREATE TRIGGER intents_fts_insert AFTER INSERT ON intents BEGIN "
+    "INSERT INTO intents_fts(rowid, search_document) VALUES (new.id, new.search_document); END",
+    "CREATE TRIGGER intents_fts_delete AFTER DELETE ON intents BEGIN "
+    "INSERT INTO intents_fts(intents_fts, rowid, search_document) "
+    "VALUES ('delete', old.id, old.search_document); END",
+    "CREATE TRIGGER intents_fts_update AFTER UPDATE OF search_document ON intents BEGIN "
+    "INSERT INTO intents_fts(intents_fts, rowid, search_document) "
+    "VALUES ('delete', old.id, old.search_document); "
+    "INSERT INTO intents_fts(rowid, search_document) VALUES (new.id, new.search_document); END",
+]
+
+def _backfill_search_documents(bind):
+    tag_names = defaultdict(list)
+    for intent_id, name in bind.execute(
+        sa.select(intent_tags.c.intent_id, tags.c.name).join(tags, tags.c.id == intent_tags.c.tag_id)
+    ):
+        tag_names[intent_id].append(name)
+    rows = [
+        {"intent_id": row.id, "document": build_search_document(row.intent_name, row.description, tag_names[row.id])}
+        for row in bind.execute(sa.select(intents.c.id, intents.c.intent_name, intents.c.description))
+    ]
+    if rows:
+        bind.execute(
+            intents.update().where(intents.c.id == sa.bindparam("intent_id"))
+            .values(search_document=sa.bindparam("document")),
+            rows
+        )
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    # Databases created by Base.metadata.create_all() already have the columns
+    if 'intents' not in inspector.get_table_names():
+        return
+    if 'search_document' in {c['name'] for c in inspector.get_columns('intents')}:
+        return
+    op.add_column('intents', sa.Column('search_document', sa.Text()))
+    if bind.dialect.name == 'postgresql':
+        op.add_column('intents', sa.Column('search_vector', TSVECTOR()))
+        op.execute(
+            "CREATE TRIGGER intents_search_vector_update "
+            "BEFORE INSERT OR UPDATE OF search_document ON intents "
+            "FOR EACH ROW EXECUTE FUNCTION "
+            "tsvector_update_trigger(search_vector, 'pg_catalog.english', search_document)"
+        )
+        # The trigger fills search_vector from the backfilled documents
+        _backfill_search_documents(bind)
+        op.create_index('ix_intents_search_vector', 'intents', ['search_vector'], postgresql_using='gin')
+    else:
+        op.add_column('intents', sa.Column('search_vector', sa.Text()))
+        _backfill_search_documents(bind)
+        for statement in _SQLITE_FTS:
+            op.execute(statement)
+        op.execute("INSERT INTO intents_fts(intents_fts) VALUES ('rebuild')")
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('ix_intents_search_vector', table_name='intents')
+        op.execute("DROP TRIGGER IF EXISTS intents_search_vector_update ON intents")
+    else:
+        for trigger in ('intents_fts_insert', 'intents_fts_delete', 'intents_fts_update'):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS intents_fts")
+    with op.batch_alter_table('intents') as batch:
+        batch.drop_column('search_vector')
+        batch.drop_column('search_document')
@@ -0,0 +1,39 @@
+"""Add the agents.json crawl state of services
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+_COLUMNS = [
+    sa.Column('agents_json_url', sa.String(), nullable=True),
+    sa.Column('etag', sa.String(), nullable=True),
+    sa.Column('last_modified', sa.String(), nullable=True),
+    sa.Column('content_hash', sa.String(64), nullable=True),
+]
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    # Databases created by Base.metadata.create_all() already have the columns
+    if 'services' not in inspector.get_table_names():
+        return
+    existing = {c['name'] for c in inspector.get_columns('services')}
+    for column in _COLUMNS:
+        if column.name not in existing:
+            op.add_column('services', column)
+    if 'ix_services_agents_json_url' not in {i['name'] for i in inspector.get_indexes('services')}:
+        op.create_index('ix_services_agents_json_url', 'services', ['agents_json_url'])
+
+def downgrade():
+    op.drop_index('ix_services_agents_json_url', table_name='services')
+    with op.batch_alter_table('services') as batch:
+        for column in reversed(_COLUMNS):
+            batch.drop_column(column.name)
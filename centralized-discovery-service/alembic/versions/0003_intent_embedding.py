@@ -0,0 +1,28 @@
+"""Add the stored embedding of intents
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    # Databases created by Base.metadata.create_all() already have the column
+    if 'intents' not in inspector.get_table_names():
+        return
+    if 'embedding' in {c['name'] for c in inspector.get_columns('intents')}:
+        return
+    # Left empty: the vector index encodes intents without a stored embedding when it loads them
+    op.add_column('intents', sa.Column('embedding', sa.LargeBinary(), nullable=True))
+
+def downgrade():
+    with op.batch_alter_table('intents') as batch:
+        batch.drop_column('embedding')
@@ -0,0 +1,37 @@
+"""Add the trigram indexes of intent names and descriptions on PostgreSQL
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+_INDEXES = {
+    'ix_intents_intent_name_trgm': 'intent_name',
+    'ix_intents_description_trgm': 'description',
+}
+
+def upgrade():
+    # The filters use ILIKE and similarity() only on PostgreSQL
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    # Built without blocking writes; databases created by create_all() already have them
+    with op.get_context().autocommit_block():
+        for name, column in _INDEXES.items():
+            op.create_index(
+                name, 'intents', [column], postgresql_using='gin', postgresql_ops={column: 'gin_trgm_ops'},
+                postgresql_concurrently=True, if_not_exists=True
+            )
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for name in _INDEXES:
+        op.drop_index(name, table_name='intents', if_exists=True)
@@ -1,12 +1,94 @@
 # app/config.py
 
+from typing import Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
     """Configuration settings for the application."""
     DATABASE_URL: str
     LOG_LEVEL: str = "INFO"
+    # Serve requests through an AsyncSession (asyncpg / aiosqlite) instead of
+    # sync sessions run in the threadpool
+    DATABASE_ASYNC: bool = False
+    # Defaults to DATABASE_URL with its driver swapped for the asyncio one
+    ASYNC_DATABASE_URL: Optional[str] = None
+    # Connection pool; sizing and the statement timeout apply to server databases only
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    # Per-statement timeout in milliseconds (PostgreSQL); 0 disables it
+    DB_STATEMENT_TIMEOUT_MS: int = 30000
+    # Discovery query result cache; 0 entries disables it
+    QUERY_CACHE_MAX_ENTRIES: int = 10000
+    QUERY_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    QUERY_CACHE_TTL_SECONDS: float = 60.0
+    # Semantic search: spaCy model with word vectors (e.g. en_core_web_md); without
+    # one, intents are embedded by feature hashing into EMBEDDING_DIM dimensions
+    EMBEDDING_MODEL: Optional[str] = None
+    EMBEDDING_DIM: int = 256
+    EMBEDDING_BATCH_SIZE: int = 256
+    # Catalog size from which an HNSW graph (if hnswlib is installed) replaces exact search
+    EMBEDDING_HNSW_MIN_SIZE: int = 100000
+    # BM25F search (mode=bm25): term saturation, length normalization and field weights
+    BM25_K1: float = 1.2
+    BM25_B: float = 0.75
+    BM25_NAME_WEIGHT: float = 3.0
+    BM25_DESCRIPTION_WEIGHT: float = 1.0
+    BM25_TAGS_WEIGHT: float = 2.0
+    # Query preprocessing: spaCy model (loaded lazily, falls back to plain tokenization
+    # when missing), JSON file mapping terms to synonyms, and LRU size of processed queries
+    NLP_MODEL: Optional[str] = "en_core_web_sm"
+    NLP_SYNONYMS_FILE: Optional[str] = None
+    NLP_CACHE_SIZE: int = 4096
+    # Load the model in a background thread at startup instead of on the first query
+    NLP_WARMUP: bool = True
+    # Hybrid search: candidates per retriever, RRF constant and time budget of the retrievers
+    HYBRID_CANDIDATES: int = 100
+    HYBRID_RRF_K: int = 60
+    HYBRID_TIME_BUDGET_MS: float = 250.0
+    # Crawler HTTP client: concurrent domains, connections per host and timeouts
+    CRAWLER_CONCURRENCY: int = 200
+    CRAWLER_LIMIT_PER_HOST: int = 4
+    CRAWLER_CONNECT_TIMEOUT: float = 5.0
+    CRAWLER_READ_TIMEOUT: float = 15.0
+    CRAWLER_TOTAL_TIMEOUT: float = 30.0
+    CRAWLER_DNS_CACHE_TTL: int = 300
+    # Crawl pipeline: queue bound between stages, parse workers and services per write transaction
+    CRAWLER_QUEUE_SIZE: int = 1000
+    CRAWLER_PARSE_WORKERS: int = 2
+    CRAWLER_WRITE_BATCH_SIZE: int = 100
+    # Larger agents.json bodies are rejected while streaming
+    CRAWLER_MAX_BODY_BYTES: int = 5 * 1024 * 1024
+    # Documents of at least this size are validated in a process pool of
+    # CRAWLER_VALIDATION_PROCESSES workers (default: one per core, 0 disables it)
+    CRAWLER_OFFLOAD_BYTES: int = 256 * 1024
+    CRAWLER_VALIDATION_PROCESSES: Optional[int] = None
+    # Politeness: requests per second per host (0 disables pacing), retries of
+    # transient failures with jittered exponential backoff, and a circuit
+    # breaker parking hosts after consecutive failures
+    CRAWLER_HOST_RATE: float = 2.0
+    CRAWLER_RETRIES: int = 2
+    CRAWLER_BACKOFF_BASE: float = 0.5
+    CRAWLER_BACKOFF_MAX: float = 30.0
+    CRAWLER_BREAKER_THRESHOLD: int = 5
+    CRAWLER_BREAKER_COOLDOWN: float = 300.0
+    # DNS TXT discovery cache; answers live for their record TTL up to DNS_MAX_TTL
+    DNS_TIMEOUT: float = 5.0
+    DNS_MAX_IN_FLIGHT: int = 100
+    DNS_MAX_TTL: float = 24 * 3600
+    DNS_NEGATIVE_TTL: float = 300
+    DNS_ERROR_TTL: float = 30
+    DNS_CACHE_MAX_ENTRIES: int = 100000
+    # Adaptive recrawl interval bounds of the crawl scheduler, in seconds
+    CRAWL_INITIAL_INTERVAL: float = 24 * 3600
+    CRAWL_MIN_INTERVAL: float = 3600
+    CRAWL_MAX_INTERVAL: float = 14 * 24 * 3600
+    # Distributed crawling: domains claimed per batch and how long a claim lasts
+    CRAWL_CLAIM_BATCH_SIZE: int = 100
+    CRAWL_LEASE_SECONDS: float = 600
 
     model_config = SettingsConfigDict(env_file=".env")
 
-settings = Settings()
\ No newline at end of file
+settings = Settings()
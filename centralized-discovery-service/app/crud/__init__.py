@@ -5,11 +5,16 @@ from .intent import (
     create_intent,
     update_intent,
     delete_intent,
-    get_intents_by_filters
+    get_intents_by_filters,
+    get_ranked_intents_by_filters,
+    resolve_tags
 )
 from .service import (
     get_service_by_name,
+    get_service_by_agents_json_url,
     create_service,
     update_service,
-    delete_service
-)
\ No newline at end of file
+    delete_service,
+    bulk_upsert_agents_json,
+    reconcile_service_intents
+)
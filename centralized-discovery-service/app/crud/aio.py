@@ -0,0 +1,122 @@
+# app/crud/aio.py
+
+# Async counterparts of the CRUD functions, usable with either session flavour
+
+import asyncio
+import logging
+from functools import wraps
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm import Session
+from app.crud import intent, service
+
+logger = logging.getLogger(__name__)
+
+_SESSION_LOCK = "aio_session_lock"
+
+async def run(db, fn, *args, **kwargs):
+    """Run a sync function taking a session first without blocking the event loop.
+
+    An AsyncSession runs it through run_sync() on the asyncio driver, that is
+    on the event loop; the CPU-bound steps of the search functions (index
+    builds, scoring, query preprocessing and embedding) move themselves to
+    the threadpool with offload(). A sync Session runs it in the threadpool.
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args, **kwargs)
+    return await run_in_threadpool(fn, db, *args, **kwargs)
+
+async def run_isolated(db, fn, *args, **kwargs):
+    """Like run(), but on a short-lived session of its own, so that several calls can overlap.
+
+    The new session uses the engine db is bound to. Sessions bound to a
+    single connection (such as an enclosing test transaction) cannot be
+    shared between concurrent calls, so calls on them take turns on db.
+
+    Cancelling the call interrupts the statement it is running, so that a
+    caller giving up, for instance on a timeout, releases the connection
+    and the worker thread as soon as the driver aborts. Python code between
+    statements cannot be interrupted and runs to its end.
+    """
+    if isinstance(db, AsyncSession):
+        if isinstance(db.bind, AsyncEngine):
+            # Cancelling the task cancels the query on asyncio drivers
+            async with AsyncSession(db.bind, autoflush=False) as own:
+                return await own.run_sync(fn, *args, **kwargs)
+    elif isinstance(db.get_bind(), Engine):
+        running = _Running()
+        call = run_in_threadpool(_run_in_own_session, db.get_bind(), running, fn, args, kwargs)
+        return await _interruptible(call, running, wait=False)
+    lock = db.info.get(_SESSION_LOCK)
+    if lock is None:
+        lock = db.info[_SESSION_LOCK] = asyncio.Lock()
+    async with lock:
+        if isinstance(db, AsyncSession):
+            return await run(db, fn, *args, **kwargs)
+        running = _Running()
+        running.connection = db.get_bind().connection.dbapi_connection
+        # The connection is shared, so the lock is held until the call let go of it
+        return await _interruptible(run(db, fn, *args, **kwargs), running, wait=True)
+
+class _Running:
+    """The DBAPI connection a threadpool call runs on, for interrupting it from the event loop."""
+
+    def __init__(self):
+        self.connection = None
+        self.cancelled = False
+
+    def interrupt(self):
+        self.cancelled = True
+        # psycopg and psycopg2 connections cancel(), sqlite3 ones interrupt()
+        connection = self.connection
+        abort = getattr(connection, "cancel", None) or getattr(connection, "interrupt", None)
+        if abort is None:
+            return
+        try:
+            abort()
+        except Exception as e:
+            logger.warning(f"Could not interrupt a cancelled query: {e}")
+
+async def _interruptible(call, running: _Running, wait: bool):
+    task = asyncio.ensure_future(call)
+    try:
+        return await asyncio.shield(task)
+    except asyncio.CancelledError:
+        running.interrupt()
+        task.add_done_callback(_discard_result)
+        if wait:
+            await asyncio.wait([task])
+        raise
+
+def _discard_result(task: asyncio.Future):
+    # The interrupted call usually fails; nobody is waiting for it any more
+    if not task.cancelled():
+        task.exception()
+
+def _run_in_own_session(bind, running: _Running, fn, args, kwargs):
+    with Session(bind=bind, autoflush=False) as own:
+        running.connection = own.connection().connection.dbapi_connection
+        if running.cancelled:
+            return None
+        return fn(own, *args, **kwargs)
+
+def _async(fn):
+    @wraps(fn)
+    async def wrapper(db, *args, **kwargs):
+        return await run(db, fn, *args, **kwargs)
+    return wrapper
+
+get_intent_by_uid = _async(intent.get_intent_by_uid)
+get_intents_by_filters = _async(intent.get_intents_by_filters)
+get_ranked_intents_by_filters = _async(intent.get_ranked_intents_by_filters)
+create_intent = _async(intent.create_intent)
+update_intent = _async(intent.update_intent)
+delete_intent = _async(intent.delete_intent)
+get_service_by_name = _async(service.get_service_by_name)
+get_service_by_agents_json_url = _async(service.get_service_by_agents_json_url)
+create_service = _async(service.create_service)
+update_service = _async(service.update_service)
+delete_service = _async(service.delete_service)
+bulk_upsert_agents_json = _async(service.bulk_upsert_agents_json)
+reconcile_service_intents = _async(service.reconcile_service_intents)
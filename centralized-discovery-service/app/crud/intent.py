@@ -1,15 +1,28 @@
 # app/crud/intent.py
 
-from sqlalchemy.orm import Session
+from bisect import bisect_right
+from itertools import islice
+from typing import Dict, Iterable, List, Tuple
+from sqlalchemy import REAL, func, select
+from sqlalchemy.orm import Session, selectinload
 from sqlalchemy.exc import IntegrityError
 from app import models, schemas
+from app.database import dialect_insert
+from app.search.tags import tag_index
+from app.search.trigram import rank_candidates
+from app.utils.pagination import Cursor, keyset_condition, is_after_cursor
 import logging
 
 logger = logging.getLogger(__name__)
 
 def get_intent_by_uid(db: Session, intent_uid: str):
     """Retrieve an intent by its unique identifier."""
-    return db.query(models.Intent).filter(models.Intent.intent_uid == intent_uid).first()
+    return db.query(models.Intent).options(
+        selectinload(models.Intent.tags)
+    ).filter(models.Intent.intent_uid == intent_uid).first()
+
+# Number of ranked candidate ids rechecked against the database per query
+_CANDIDATE_BATCH = 500
 
 def get_intents_by_filters(
     db: Session,
@@ -18,43 +31,139 @@ def get_intents_by_filters(
     description: str = None,
     tags: list = None,
     skip: int = 0,
-    limit: int = 10
+    limit: int = 10,
+    cursor: Cursor = None,
+    tag_match: str = "any"
 ):
-    """Retrieve intents based on filters."""
-    query = db.query(models.Intent)
-    if intent_name:
-        query = query.filter(models.Intent.intent_name.ilike(f"%{intent_name}%"))
+    """Retrieve intents based on filters, ranked by trigram similarity."""
+    ranked = get_ranked_intents_by_filters(
+        db, intent_name=intent_name, uid=uid, description=description, tags=tags,
+        skip=skip, limit=limit, cursor=cursor, tag_match=tag_match
+    )
+    return [intent for intent, _ in ranked]
+
+def get_ranked_intents_by_filters(
+    db: Session,
+    intent_name: str = None,
+    uid: str = None,
+    description: str = None,
+    tags: list = None,
+    skip: int = 0,
+    limit: int = 10,
+    cursor: Cursor = None,
+    tag_match: str = "any"
+) -> List[Tuple[models.Intent, float]]:
+    """Retrieve (intent, rank) pairs ordered by rank, then id, after an optional keyset cursor.
+
+    tag_match selects whether intents need "all" or "any" of the given tags.
+    Each intent is returned at most once. On PostgreSQL every filter runs in
+    SQL; elsewhere candidates come from the in-process indexes and are
+    rechecked by the query, so an index lagging writes of another process
+    can miss new intents but never returns ones the filters reject.
+    """
+    # Tags are serialized with every intent; load them in one extra query per page
+    query = db.query(models.Intent).options(selectinload(models.Intent.tags))
     if uid:
         query = query.filter(models.Intent.intent_uid == uid)
-    if description:
-        query = query.filter(models.Intent.description.ilike(f"%{description}%"))
+    terms = {
+        field: value
+        for field, value in (("intent_name", intent_name), ("description", description))
+        if value
+    }
+    for field, value in terms.items():
+        query = query.filter(getattr(models.Intent, field).ilike(f"%{value}%"))
+    match_all = tag_match == "all"
     if tags:
-        query = query.join(models.Intent.tags).filter(models.Tag.name.in_(tags))
-    return query.offset(skip).limit(limit).all()
+        # EXISTS semi-joins, unlike a join on tags, never repeat an intent
+        if match_all:
+            for tag in dict.fromkeys(tags):
+                query = query.filter(models.Intent.tags.any(models.Tag.name == tag))
+        else:
+            query = query.filter(models.Intent.tags.any(models.Tag.name.in_(tags)))
+    postgres = db.get_bind().dialect.name == "postgresql"
+    if terms and postgres:
+        # ILIKE is served by the pg_trgm GIN indexes
+        ranks = [
+            func.similarity(getattr(models.Intent, field), value, type_=REAL)
+            for field, value in terms.items()
+        ]
+        rank = sum(ranks[1:], ranks[0])
+        if cursor:
+            query = query.filter(keyset_condition(rank, models.Intent.id, cursor))
+        rows = query.add_columns(rank).order_by(rank.desc(), models.Intent.id).offset(skip).limit(limit).all()
+        return [(intent, intent_rank) for intent, intent_rank in rows]
+    tagged = None
+    if tags and not postgres:
+        tag_index.ensure_loaded(db)
+        tagged = tag_index.match(tags, match_all)
+    ranked = rank_candidates(db, terms) if terms else None
+    if ranked is not None:
+        if tagged is not None:
+            tagged = set(tagged)
+            ranked = [(intent_id, rank) for intent_id, rank in ranked if intent_id in tagged]
+        ranked = [(intent_id, rank) for intent_id, rank in ranked if is_after_cursor(rank, intent_id, cursor)]
+        return _fetch_ranked(query, ranked, skip, limit)
+    if tagged is not None:
+        # Posting lists are sorted by id, which is the unranked order
+        start = bisect_right(tagged, cursor.id) if cursor else 0
+        return _fetch_ranked(query, ((tagged[i], 0.0) for i in range(start, len(tagged))), skip, limit)
+    # Unranked filters, tags on PostgreSQL, or terms shorter than a trigram, are ordered by id alone
+    if cursor:
+        query = query.filter(models.Intent.id > cursor.id)
+    intents = query.order_by(models.Intent.id).offset(skip).limit(limit).all()
+    return [(intent, 0.0) for intent in intents]
 
-def create_intent(db: Session, intent_data: schemas.IntentCreate, service_id: int):
-    """Create a new intent associated with a service."""
-    db_intent = models.Intent(
+def _fetch_ranked(query, ranked: Iterable[Tuple[int, float]], skip: int, limit: int):
+    """Load candidate rows in rank order, dropping those the query rejects."""
+    results = []
+    wanted = skip + limit
+    candidates = iter(ranked)
+    while len(results) < wanted:
+        batch = list(islice(candidates, _CANDIDATE_BATCH))
+        if not batch:
+            break
+        ids = [intent_id for intent_id, _ in batch]
+        rows = {intent.id: intent for intent in query.filter(models.Intent.id.in_(ids)).all()}
+        results.extend((rows[intent_id], rank) for intent_id, rank in batch if intent_id in rows)
+    return results[skip:wanted]
+
+def resolve_tags(db: Session, names) -> Dict[str, models.Tag]:
+    """Fetch or create tags by name with one SELECT and at most one INSERT."""
+    names = sorted(set(names))
+    if not names:
+        return {}
+    tags = {tag.name: tag for tag in db.scalars(select(models.Tag).where(models.Tag.name.in_(names)))}
+    missing = [name for name in names if name not in tags]
+    if missing:
+        stmt = dialect_insert(db, models.Tag).values([{"name": name} for name in missing])
+        stmt = stmt.on_conflict_do_nothing(index_elements=["name"]).returning(models.Tag)
+        tags.update((tag.name, tag) for tag in db.scalars(stmt))
+        # Tags created concurrently by another transaction are not returned
+        raced = [name for name in missing if name not in tags]
+        if raced:
+            tags.update(
+                (tag.name, tag) for tag in db.scalars(select(models.Tag).where(models.Tag.name.in_(raced)))
+            )
+    return tags
+
+def intent_row(intent_data: schemas.IntentCreate, service_id: int) -> dict:
+    """Column values of an intent, with parameters serialized for the JSON columns."""
+    return dict(
         service_id=service_id,
         intent_uid=intent_data.intent_uid,
         intent_name=intent_data.intent_name,
         description=intent_data.description,
-        input_parameters=intent_data.input_parameters,
-        output_parameters=intent_data.output_parameters,
+        input_parameters=[parameter.model_dump() for parameter in intent_data.input_parameters],
+        output_parameters=[parameter.model_dump() for parameter in intent_data.output_parameters],
         endpoint=intent_data.endpoint
     )
-    # Handle tags
+
+def create_intent(db: Session, intent_data: schemas.IntentCreate, service_id: int):
+    """Create a new intent associated with a service."""
+    db_intent = models.Intent(**intent_row(intent_data, service_id))
     if intent_data.tags:
-        tags = []
-        for tag_name in intent_data.tags:
-            # Check if the tag already exists
-            tag = db.query(models.Tag).filter_by(name=tag_name).first()
-            if not tag:
-                tag = models.Tag(name=tag_name)
-                db.add(tag)
-                db.flush()  # To get the tag ID
-            tags.append(tag)
-        db_intent.tags = tags
+        tags = resolve_tags(db, intent_data.tags)
+        db_intent.tags = [tags[name] for name in dict.fromkeys(intent_data.tags)]
     try:
         db.add(db_intent)
         db.commit()
@@ -69,17 +178,8 @@ def update_intent(db: Session, intent: models.Intent, updates: schemas.IntentUpd
     """Update an existing intent."""
     for key, value in updates.dict(exclude_unset=True).items():
         if key == "tags" and value is not None:
-            # Update tags
-            tags = []
-            for tag_name in value:
-                tag = db.query(models.Tag).filter(models.Tag.name == tag_name).first()
-                if not tag:
-                    tag = models.Tag(name=tag_name)
-                    db.add(tag)
-                    db.commit()
-                    db.refresh(tag)
-                tags.append(tag)
-            intent.tags = tags
+            tags = resolve_tags(db, value)
+            intent.tags = [tags[name] for name in dict.fromkeys(value)]
         else:
             setattr(intent, key, value)
     db.commit()
@@ -89,4 +189,4 @@ def update_intent(db: Session, intent: models.Intent, updates: schemas.IntentUpd
 def delete_intent(db: Session, intent: models.Intent):
     """Delete an intent."""
     db.delete(intent)
-    db.commit()
\ No newline at end of file
+    db.commit()
@@ -1,8 +1,15 @@
 # app/crud/service.py
 
-from sqlalchemy.orm import Session
+from typing import Dict, Iterable, List
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session, selectinload
 from sqlalchemy.exc import IntegrityError
 from app import models, schemas
+from app.crud.intent import intent_row, resolve_tags
+from app.database import dialect_insert
+from app.models.intent import intent_tags, build_search_document
+from app.search.indexing import mark_intents_changed
+from app.search.vectors import encode_texts
 import logging
 
 logger = logging.getLogger(__name__)
@@ -11,6 +18,10 @@ def get_service_by_name(db: Session, name: str):
     """Retrieve a service by its name."""
     return db.query(models.Service).filter(models.Service.name == name).first()
 
+def get_service_by_agents_json_url(db: Session, url: str):
+    """Retrieve the service last crawled from an agents.json URL."""
+    return db.query(models.Service).filter(models.Service.agents_json_url == url).first()
+
 def create_service(db: Session, service_info: schemas.ServiceCreate):
     """Create a new service."""
     db_service = models.Service(
@@ -42,4 +53,159 @@ def update_service(db: Session, service: models.Service, updates: schemas.Servic
 def delete_service(db: Session, service: models.Service):
     """Delete a service and its associated intents."""
     db.delete(service)
-    db.commit()
\ No newline at end of file
+    db.commit()
+
+def reconcile_service_intents(
+    db: Session, service: models.Service, intents: Iterable[schemas.IntentCreate]
+) -> Dict[str, int]:
+    """Make the intents of a service match a fetched agents.json document.
+
+    Existing intents are loaded in one query and only the differences are
+    written: new intents are inserted, changed ones updated and intents
+    missing from the document deleted. Nothing is committed, so the caller
+    decides the transaction boundary. Returns the number of rows per change.
+    """
+    existing = {
+        intent.intent_uid: intent
+        for intent in db.scalars(
+            select(models.Intent).options(
+                selectinload(models.Intent.tags)
+            ).where(models.Intent.service_id == service.id)
+        )
+    }
+    wanted = {intent_data.intent_uid: intent_data for intent_data in intents}
+    tags = resolve_tags(db, {tag for intent_data in wanted.values() for tag in intent_data.tags or ()})
+    counts = {"inserted": 0, "updated": 0, "deleted": 0, "unchanged": 0}
+
+    for uid, intent_data in wanted.items():
+        row = intent_row(intent_data, service.id)
+        tag_names = list(dict.fromkeys(intent_data.tags or ()))
+        intent = existing.pop(uid, None)
+        if intent is None:
+            intent = models.Intent(**row)
+            intent.tags = [tags[name] for name in tag_names]
+            db.add(intent)
+            counts["inserted"] += 1
+            continue
+        changed = {key: value for key, value in row.items() if getattr(intent, key) != value}
+        for key, value in changed.items():
+            setattr(intent, key, value)
+        if {tag.name for tag in intent.tags} != set(tag_names):
+            intent.tags = [tags[name] for name in tag_names]
+            changed["tags"] = tag_names
+        counts["updated" if changed else "unchanged"] += 1
+
+    for intent in existing.values():
+        db.delete(intent)
+        counts["deleted"] += 1
+    db.flush()
+    return counts
+
+_SERVICE_FIELDS = (
+    "name",
+    "description",
+    "service_url",
+    "service_logo_url",
+    "service_terms_of_service_url",
+    "service_privacy_policy_url"
+)
+
+# service_id is left out: an upsert never moves an intent to another service
+_INTENT_FIELDS = (
+    "intent_name",
+    "description",
+    "input_parameters",
+    "output_parameters",
+    "endpoint",
+    "search_document",
+    "embedding"
+)
+
+def bulk_upsert_agents_json(
+    db: Session, documents: Iterable[schemas.AgentsJson], batch_size: int = 100
+) -> Dict[str, int]:
+    """Insert or update the services and intents of agents.json documents.
+
+    Documents are written batch_size at a time, one transaction per batch,
+    with multi-row upserts instead of per-row ORM flushes. Intents missing
+    from a document are kept; see reconcile_service_intents for that.
+    Intents whose UID already belongs to another service are skipped and
+    counted as such.
+    """
+    totals = {"services": 0, "intents": 0, "skipped": 0}
+    batch = []
+    for document in documents:
+        batch.append(document)
+        if len(batch) >= batch_size:
+            _upsert_batch(db, batch, totals)
+            batch = []
+    if batch:
+        _upsert_batch(db, batch, totals)
+    return totals
+
+def _upsert_batch(db: Session, documents: List[schemas.AgentsJson], totals: Dict[str, int]):
+    """Upsert one batch of documents in a single transaction."""
+    # Later documents win when a batch repeats a service or an intent
+    by_service = {document.service_info.name: document for document in documents}
+    try:
+        services = models.Service.__table__
+        stmt = dialect_insert(db, services)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["name"],
+            set_={field: stmt.excluded[field] for field in _SERVICE_FIELDS if field != "name"}
+        ).returning(services.c.id, services.c.name, sort_by_parameter_order=True)
+        service_rows = [
+            {field: getattr(document.service_info, field) for field in _SERVICE_FIELDS}
+            for document in by_service.values()
+        ]
+        service_ids = {name: service_id for service_id, name in db.execute(stmt, service_rows)}
+
+        intents, skipped = {}, set()
+        for name, document in by_service.items():
+            for intent_data in document.intents:
+                intents[intent_data.intent_uid] = (service_ids[name], intent_data)
+        if intents:
+            tags = resolve_tags(db, {tag for _, intent_data in intents.values() for tag in intent_data.tags or ()})
+            intent_rows = []
+            for service_id, intent_data in intents.values():
+                row = intent_row(intent_data, service_id)
+                row["search_document"] = build_search_document(
+                    intent_data.intent_name, intent_data.description, intent_data.tags or ()
+                )
+                intent_rows.append(row)
+            # The Core upsert bypasses the ORM flush hooks, so embed the batch here
+            vectors = encode_texts([row["search_document"] for row in intent_rows])
+            for row, vector in zip(intent_rows, vectors):
+                row["embedding"] = vector.tobytes()
+            table = models.Intent.__table__
+            stmt = dialect_insert(db, table)
+            # Rows conflicting with another service's intent are neither
+            # updated nor returned
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["intent_uid"],
+                set_={field: stmt.excluded[field] for field in _INTENT_FIELDS},
+                where=table.c.service_id == stmt.excluded.service_id
+            ).returning(table.c.id, table.c.intent_uid)
+            intent_ids = {uid: intent_id for intent_id, uid in db.execute(stmt, intent_rows)}
+            skipped = intents.keys() - intent_ids.keys()
+            if skipped:
+                logger.warning(f"Skipped intents owned by other services: {sorted(skipped)}")
+                intents = {uid: value for uid, value in intents.items() if uid in intent_ids}
+
+            db.execute(delete(intent_tags).where(intent_tags.c.intent_id.in_(list(intent_ids.values()))))
+            links = [
+                {"intent_id": intent_ids[uid], "tag_id": tags[name].id}
+                for uid, (_, intent_data) in intents.items()
+                for name in dict.fromkeys(intent_data.tags or ())
+            ]
+            if links:
+                db.execute(insert(intent_tags), links)
+            mark_intents_changed(db, intent_ids.values())
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        logger.error(f"Integrity error in bulk agents.json upsert: {e}")
+        raise
+    totals["services"] += len(by_service)
+    totals["intents"] += len(intents)
+    totals["skipped"] += len(skipped)
@@ -1,17 +1,60 @@
 # app/database.py
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, make_url
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.config import settings
+from app.utils.db_pool import PoolMetrics, engine_options
 import logging
 
 logger = logging.getLogger(__name__)
 
+# asyncio drivers used for each backend when DATABASE_ASYNC is enabled
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+def async_database_url(url: str) -> str:
+    """Map a sync database URL to the same database on its asyncio driver."""
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.get_backend_name(), parsed.drivername)
+    return driver + url[url.index(":"):]
+
+def enable_sqlite_savepoints(engine):
+    """Let SQLAlchemy emit BEGIN itself so SAVEPOINTs nest inside the real transaction.
+
+    pysqlite defers BEGIN until the first DML statement, so a SAVEPOINT issued
+    first opens (and its RELEASE commits) a transaction of its own.
+    """
+    @event.listens_for(engine, "connect")
+    def _disable_pysqlite_transactions(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _begin(connection):
+        connection.exec_driver_sql("BEGIN")
+
 try:
-    engine = create_engine(settings.DATABASE_URL)
+    engine = create_engine(settings.DATABASE_URL, **engine_options(settings.DATABASE_URL, settings))
+    pool_metrics = {"sync": PoolMetrics("sync").instrument(engine)}
+    if engine.dialect.name == "sqlite":
+        enable_sqlite_savepoints(engine)
     SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
     Base = declarative_base()
+    async_engine = None
+    AsyncSessionLocal = None
+    if settings.DATABASE_ASYNC:
+        async_url = settings.ASYNC_DATABASE_URL or async_database_url(settings.DATABASE_URL)
+        async_engine = create_async_engine(async_url, **engine_options(async_url, settings, is_async=True))
+        pool_metrics["async"] = PoolMetrics("async").instrument(async_engine.sync_engine)
+        # Objects stay usable after commit without an implicit (blocking) refresh
+        AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 except Exception as e:
     logger.error(f"Database connection failed: {e}")
-    raise
\ No newline at end of file
+    raise
+
+def dialect_insert(db, table):
+    """Return an INSERT supporting on_conflict_do_nothing() for the session's dialect."""
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql.insert(table)
+    return sqlite.insert(table)
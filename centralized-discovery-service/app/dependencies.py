@@ -1,6 +1,7 @@
 # app/dependencies.py
 
-from app.database import SessionLocal
+from app.config import settings
+from app.database import SessionLocal, AsyncSessionLocal
 from contextlib import contextmanager
 
 def get_db():
@@ -9,4 +10,12 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    """Provide an asyncio database session."""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+# Session dependency of the API routes, selected by DATABASE_ASYNC
+get_session = get_async_db if settings.DATABASE_ASYNC else get_db
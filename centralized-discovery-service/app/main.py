@@ -1,8 +1,10 @@
 # app/main.py
 
 from fastapi import FastAPI
-from app.routers import discovery, search
+from app.routers import discovery, search, services, metrics
+from app.config import settings
 from app.database import engine, Base
+from app.services.nlp import query_preprocessor
 from app.utils.logging import setup_logging
 
 def create_app():
@@ -15,10 +17,16 @@ def create_app():
     # Create database tables
     Base.metadata.create_all(bind=engine)
 
+    # Load the query preprocessing pipeline without delaying startup
+    if settings.NLP_WARMUP:
+        query_preprocessor.warmup()
+
     # Include routers
     app.include_router(discovery.router)
     app.include_router(search.router)
+    app.include_router(services.router)
+    app.include_router(metrics.router)
 
     return app
 
-app = create_app()
\ No newline at end of file
+app = create_app()
@@ -2,4 +2,5 @@
 
 from .service import Service
 from .intent import Intent
-from .tag import Tag
\ No newline at end of file
+from .tag import Tag
+from .crawl import CrawlFrontier
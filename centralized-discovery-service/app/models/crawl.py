@@ -0,0 +1,23 @@
+# app/models/crawl.py
+
+from sqlalchemy import Column, DateTime, Float, Integer, String
+from app.database import Base
+
+class CrawlFrontier(Base):
+    """Crawl state of a domain: when it is due next and how often it changes."""
+    __tablename__ = 'crawl_frontier'
+
+    id = Column(Integer, primary_key=True, index=True)
+    domain = Column(String, unique=True, nullable=False)
+    next_due_at = Column(DateTime(timezone=True), index=True, nullable=False)
+    # Current recrawl interval, adapted to the observed change frequency
+    interval_seconds = Column(Float, nullable=False)
+    last_crawled_at = Column(DateTime(timezone=True), nullable=True)
+    last_changed_at = Column(DateTime(timezone=True), nullable=True)
+    crawl_count = Column(Integer, nullable=False, default=0)
+    change_count = Column(Integer, nullable=False, default=0)
+    # Consecutive failed crawls; reset by the next successful one
+    failure_count = Column(Integer, nullable=False, default=0)
+    # Worker currently crawling the domain, until the lease expires
+    lease_owner = Column(String, nullable=True)
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)
@@ -1,7 +1,12 @@
 # app/models/intent.py
 
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, Table
-from sqlalchemy.orm import relationship
+from collections import defaultdict
+from itertools import chain
+from sqlalchemy import (
+    Column, Integer, LargeBinary, String, Text, ForeignKey, Table, Index, DDL, event, inspect, select, table, column
+)
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import relationship, deferred, Session
 from sqlalchemy.types import JSON
 from app.database import Base
 
@@ -15,6 +20,18 @@ intent_tags = Table(
 class Intent(Base):
     """Intent model representing a single intent."""
     __tablename__ = 'intents'
+    __table_args__ = (
+        # Trigram GIN indexes serve ILIKE '%x%' and similarity() on PostgreSQL
+        Index(
+            'ix_intents_intent_name_trgm', 'intent_name',
+            postgresql_using='gin', postgresql_ops={'intent_name': 'gin_trgm_ops'}
+        ).ddl_if(dialect='postgresql'),
+        Index(
+            'ix_intents_description_trgm', 'description',
+            postgresql_using='gin', postgresql_ops={'description': 'gin_trgm_ops'}
+        ).ddl_if(dialect='postgresql'),
+        Index('ix_intents_search_vector', 'search_vector', postgresql_using='gin').ddl_if(dialect='postgresql'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     service_id = Column(Integer, ForeignKey('services.id'), nullable=False)
@@ -24,6 +41,90 @@ class Intent(Base):
     input_parameters = Column(JSON)
     output_parameters = Column(JSON)
     endpoint = Column(String, nullable=False)
+    # Name, description and tag names; the full-text index is derived from it
+    search_document = Column(Text)
+    # Maintained by a trigger on PostgreSQL; SQLite uses the intents_fts table instead
+    search_vector = deferred(Column(Text().with_variant(TSVECTOR(), 'postgresql')))
+    # float32 embedding of search_document, computed at ingest for semantic search
+    embedding = deferred(Column(LargeBinary))
 
     service = relationship('Service', back_populates='intents')
-    tags = relationship('Tag', secondary=intent_tags, back_populates='intents')
\ No newline at end of file
+    tags = relationship('Tag', secondary=intent_tags, back_populates='intents')
+
+# FTS5 external-content table mirroring intents.search_document on SQLite
+intents_fts = table('intents_fts', column('rowid'), column('search_document'))
+# Tag names are read through the table, the Tag model imports this module
+_tags = table('tags', column('id'), column('name'))
+
+def build_search_document(intent_name, description, tag_names) -> str:
+    """Concatenate the searchable text of an intent."""
+    return " ".join(part for part in (intent_name, description, *tag_names) if part)
+
+def _needs_search_document(obj) -> bool:
+    """Whether the searchable fields of a new or dirty intent may have changed."""
+    state = inspect(obj)
+    return not state.persistent or any(
+        state.attrs[key].history.has_changes() for key in ('intent_name', 'description', 'tags')
+    )
+
+def _tags_unchanged_and_unloaded(obj) -> bool:
+    state = inspect(obj)
+    return state.persistent and 'tags' in state.unloaded and not state.attrs.tags.history.has_changes()
+
+@event.listens_for(Session, 'before_flush')
+def _refresh_search_documents(session, flush_context, instances):
+    changed = [
+        obj for obj in chain(session.new, session.dirty)
+        if isinstance(obj, Intent) and _needs_search_document(obj)
+    ]
+    # Read the stored tags of all changed intents in one query, not one lazy load each
+    unloaded = {obj.id for obj in changed if _tags_unchanged_and_unloaded(obj)}
+    stored_tags = defaultdict(list)
+    if unloaded:
+        rows = session.execute(
+            select(intent_tags.c.intent_id, _tags.c.name)
+            .join(_tags, _tags.c.id == intent_tags.c.tag_id)
+            .where(intent_tags.c.intent_id.in_(sorted(unloaded)))
+        )
+        for intent_id, name in rows:
+            stored_tags[intent_id].append(name)
+    for obj in changed:
+        tag_names = stored_tags[obj.id] if obj.id in unloaded else [tag.name for tag in obj.tags]
+        document = build_search_document(obj.intent_name, obj.description, tag_names)
+        if obj.search_document != document:
+            obj.search_document = document
+
+event.listen(
+    Intent.__table__,
+    'before_create',
+    DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(dialect='postgresql')
+)
+event.listen(
+    Intent.__table__,
+    'after_create',
+    DDL(
+        "CREATE TRIGGER intents_search_vector_update "
+        "BEFORE INSERT OR UPDATE OF search_document ON intents "
+        "FOR EACH ROW EXECUTE FUNCTION "
+        "tsvector_update_trigger(search_vector, 'pg_catalog.english', search_document)"
+    ).execute_if(dialect='postgresql')
+)
+for statement in (
+    "CREATE VIRTUAL TABLE intents_fts USING fts5("
+    "search_document, content='intents', content_rowid='id', tokenize='porter unicode61')",
+    "CREATE TRIGGER intents_fts_insert AFTER INSERT ON intents BEGIN "
+    "INSERT INTO intents_fts(rowid, search_document) VALUES (new.id, new.search_document); END",
+    "CREATE TRIGGER intents_fts_delete AFTER DELETE ON intents BEGIN "
+    "INSERT INTO intents_fts(intents_fts, rowid, search_document) "
+    "VALUES ('delete', old.id, old.search_document); END",
+    "CREATE TRIGGER intents_fts_update AFTER UPDATE OF search_document ON intents BEGIN "
+    "INSERT INTO intents_fts(intents_fts, rowid, search_document) "
+    "VALUES ('delete', old.id, old.search_document); "
+    "INSERT INTO intents_fts(rowid, search_document) VALUES (new.id, new.search_document); END",
+):
+    event.listen(Intent.__table__, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+event.listen(
+    Intent.__table__,
+    'before_drop',
+    DDL('DROP TABLE IF EXISTS intents_fts').execute_if(dialect='sqlite')
+)
@@ -15,5 +15,10 @@ class Service(Base):
     service_logo_url = Column(String, nullable=True)
     service_terms_of_service_url = Column(String, nullable=True)
     service_privacy_policy_url = Column(String, nullable=True)
+    # Crawl state of the agents.json document, used for conditional re-crawls
+    agents_json_url = Column(String, nullable=True, index=True)
+    etag = Column(String, nullable=True)
+    last_modified = Column(String, nullable=True)
+    content_hash = Column(String(64), nullable=True)
 
-    intents = relationship('Intent', back_populates='service', cascade='all, delete-orphan')
\ No newline at end of file
+    intents = relationship('Intent', back_populates='service', cascade='all, delete-orphan')
@@ -1,4 +1,6 @@
 # app/routers/__init__.py
 
 from .discovery import router as discovery_router
-from .search import router as search_router
\ No newline at end of file
+from .search import router as search_router
+from .services import router as services_router
+from .metrics import router as metrics_router
@@ -2,34 +2,89 @@
 
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Literal, Optional
 from app import models, schemas
-from app.dependencies import get_db
-from app.crud.intent import get_intents_by_filters
+from app.crud import aio
+from app.dependencies import get_session
+from app.search.cache import normalize_tags, normalize_text, query_cache
+from app.search.suggest import KINDS, MAX_SUGGESTIONS, suggest_index
+from app.utils.pagination import decode_cursor, render_page, page_response
 
 router = APIRouter(prefix="/api/intents", tags=["Discovery"])
 
+# Fixed paths must be declared before any /{uid} route, which would capture them
+@router.get("/suggest", response_model=List[schemas.IntentSuggestion])
+async def suggest_intents(
+    prefix: str = Query(..., min_length=1),
+    kind: Optional[List[Literal[KINDS]]] = Query(None),
+    limit: int = Query(10, ge=1, le=MAX_SUGGESTIONS),
+    db: Session = Depends(get_session)
+):
+    """Complete a prefix of an intent name, intent UID or tag, most frequent values first.
+
+    `kind` may be repeated to restrict the suggestions to some of these fields.
+    """
+    if not suggest_index.loaded:
+        await aio.run(db, suggest_index.ensure_loaded)
+    return [
+        {"text": text, "kind": value_kind, "count": count}
+        for text, value_kind, count in suggest_index.suggest(prefix, limit, kind)
+    ]
+
 @router.get("/search", response_model=List[schemas.Intent])
-def search_intents(
+async def search_intents(
     intent_name: Optional[str] = Query(None, min_length=3),
     uid: Optional[str] = None,
     description: Optional[str] = Query(None, min_length=3),
     tags: Optional[str] = None,
+    match: Literal["any", "all"] = "any",
     skip: int = 0,
     limit: int = 10,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_session)
 ):
-    """Search for intents based on criteria."""
-    tag_list = [tag.strip() for tag in tags.split(',')] if tags else None
-    intents = get_intents_by_filters(
-        db=db,
-        intent_name=intent_name,
-        uid=uid,
-        description=description,
-        tags=tag_list,
-        skip=skip,
-        limit=limit
+    """Search for intents based on criteria.
+
+    `tags` is a comma-separated list; `match` selects whether intents need
+    any or all of them. Pass the X-Next-Cursor response header back as
+    `cursor` to fetch the next page.
+    """
+    try:
+        after = decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+    # Text filters are case-insensitive and tag order does not matter; the
+    # normalized values are both the cache key and the query
+    intent_name = normalize_text(intent_name)
+    description = normalize_text(description)
+    tag_list = normalize_tags(tags)
+    key = (
+        "intents",
+        intent_name,
+        uid,
+        description,
+        tuple(tag_list) if tag_list else None,
+        match,
+        skip,
+        limit,
+        after
     )
-    if not intents:
-        raise HTTPException(status_code=404, detail="No intents found.")
-    return intents
\ No newline at end of file
+    page, version = query_cache.lookup(key)
+    if page is None:
+        # Fetch one extra row to tell whether another page exists
+        ranked = await aio.get_ranked_intents_by_filters(
+            db,
+            intent_name=intent_name,
+            uid=uid,
+            description=description,
+            tags=tag_list,
+            tag_match=match,
+            skip=skip,
+            limit=limit + 1,
+            cursor=after
+        )
+        body, next_cursor = render_page(ranked, limit)
+        query_cache.store(key, version, (body, next_cursor), len(body))
+        return page_response(body, next_cursor, cache_hit=False)
+    body, next_cursor = page
+    return page_response(body, next_cursor, cache_hit=True)
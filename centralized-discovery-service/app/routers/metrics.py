@@ -0,0 +1,23 @@
+# app/routers/metrics.py
+
+from fastapi import APIRouter
+from app.database import pool_metrics
+from app.search.cache import query_cache
+from app.services.nlp import query_preprocessor
+
+router = APIRouter(prefix="/api/metrics", tags=["Metrics"])
+
+@router.get("/cache")
+def cache_metrics():
+    """Report query result cache hits, misses, evictions and memory use."""
+    return query_cache.stats()
+
+@router.get("/pool")
+def pool_metrics_report():
+    """Report checked-out, idle and overflow connections and checkout wait times per engine."""
+    return {name: metrics.snapshot() for name, metrics in pool_metrics.items()}
+
+@router.get("/nlp")
+def nlp_metrics():
+    """Report the query preprocessing backend, its load time, per-query cost and cache use."""
+    return query_preprocessor.stats()
@@ -2,22 +2,121 @@
 
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Literal, Optional
 from app import models, schemas
-from app.dependencies import get_db
-from app.services.nlp import process_natural_language_query
+from app.crud import aio
+from app.dependencies import get_session
+from app.search.bm25 import rank_bm25_query
+from app.search.cache import normalize_tags, normalize_text, query_cache
+from app.search.vectors import rank_semantic_query
+from app.services.hybrid import hybrid_search, server_timing
+from app.services.nlp import rank_natural_language_query
+from app.utils.pagination import decode_cursor, render_page, page_response
 
 router = APIRouter(prefix="/api/search", tags=["Search"])
 
+_RANKERS = {
+    "fulltext": rank_natural_language_query,
+    "semantic": rank_semantic_query,
+    "bm25": rank_bm25_query
+}
+
 @router.get("/", response_model=List[schemas.Intent])
-def search_intents_by_query(
+async def search_intents_by_query(
     query: str = Query(..., min_length=3),
     skip: int = 0,
     limit: int = 10,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    mode: Literal["fulltext", "semantic", "bm25"] = "fulltext",
+    db: Session = Depends(get_session)
 ):
-    """Search intents using a natural language query."""
-    intents = process_natural_language_query(db=db, query=query, skip=skip, limit=limit)
-    if not intents:
-        raise HTTPException(status_code=404, detail="No intents found.")
-    return intents
\ No newline at end of file
+    """Search intents using a natural language query.
+
+    `mode=semantic` ranks intents by embedding similarity instead of full-text
+    matching, so queries need not share words with the descriptions.
+    `mode=bm25` scores names, descriptions and tags with field-weighted BM25
+    in memory, independently of database load.
+    Pass the X-Next-Cursor response header back as `cursor` to fetch the next page.
+    """
+    try:
+        after = decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+    # Full-text matching is case-insensitive and ignores extra whitespace, so
+    # the cache key is lowercased; the ranker keeps the case for entity recognition
+    normalized = normalize_text(query)
+    if normalized is None:
+        raise HTTPException(status_code=400, detail="Empty query.")
+    query = " ".join(query.split())
+    key = ("search", mode, normalized, skip, limit, after)
+    page, version = query_cache.lookup(key)
+    if page is None:
+        # Fetch one extra row to tell whether another page exists
+        rank = _RANKERS[mode]
+        ranked = await aio.run(db, rank, query=query, skip=skip, limit=limit + 1, cursor=after)
+        body, next_cursor = render_page(ranked, limit)
+        query_cache.store(key, version, (body, next_cursor), len(body))
+        return page_response(body, next_cursor, cache_hit=False)
+    body, next_cursor = page
+    return page_response(body, next_cursor, cache_hit=True)
+
+@router.get("/hybrid", response_model=List[schemas.Intent])
+async def search_intents_hybrid(
+    query: Optional[str] = Query(None, min_length=3),
+    intent_name: Optional[str] = Query(None, min_length=3),
+    description: Optional[str] = Query(None, min_length=3),
+    tags: Optional[str] = None,
+    match: Literal["any", "all"] = "any",
+    skip: int = 0,
+    limit: int = 10,
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_session)
+):
+    """Search intents with lexical filters, full-text and semantic retrieval fused by reciprocal rank.
+
+    Retrievers run concurrently under a time budget; those cut off by it are
+    left out. The Server-Timing header reports the time spent in each stage.
+    Cursors page through the fused top HYBRID_CANDIDATES of each retriever
+    only.
+    """
+    # The normalized values are both the cache key and the filters; the query
+    # keeps its case for entity recognition
+    normalized = normalize_text(query)
+    query = " ".join(query.split()) if normalized else None
+    intent_name = normalize_text(intent_name)
+    description = normalize_text(description)
+    tag_list = normalize_tags(tags)
+    if not (query or intent_name or description or tag_list):
+        raise HTTPException(status_code=400, detail="Provide a query or at least one filter.")
+    try:
+        after = decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+    key = (
+        "hybrid",
+        normalized,
+        intent_name,
+        description,
+        tuple(tag_list) if tag_list else None,
+        match,
+        skip,
+        limit,
+        after
+    )
+    page, version = query_cache.lookup(key)
+    if page is not None:
+        body, next_cursor = page
+        return page_response(body, next_cursor, cache_hit=True)
+    # Fetch one extra row to tell whether another page exists
+    result = await hybrid_search(
+        db, query=query, intent_name=intent_name, description=description, tags=tag_list,
+        tag_match=match, skip=skip, limit=limit + 1, cursor=after
+    )
+    body, next_cursor = render_page(result.ranked, limit)
+    # Pages missing a retriever are not cached, so the next request gets another chance
+    if not result.timed_out:
+        query_cache.store(key, version, (body, next_cursor), len(body))
+    return page_response(
+        body, next_cursor, cache_hit=False,
+        headers={"Server-Timing": server_timing(result.timings, result.timed_out)}
+    )
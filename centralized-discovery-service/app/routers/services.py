@@ -0,0 +1,70 @@
+# app/routers/services.py
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy.orm import Session
+from typing import List
+from app import schemas
+from app.crud import aio
+from app.dependencies import get_session
+
+router = APIRouter(prefix="/api/services", tags=["Services"])
+
+# Documents validated before each batched write of a streamed upload
+BULK_BATCH_SIZE = 100
+
+_documents_adapter = TypeAdapter(List[schemas.AgentsJson])
+
+@router.post("/bulk", response_model=schemas.BulkIngestResult)
+async def bulk_ingest_services(request: Request, response: Response, db: Session = Depends(get_session)):
+    """Upsert services and intents from many agents.json documents.
+
+    The body is either a JSON array of documents or, with the
+    application/x-ndjson content type, a stream of one document per line.
+    An invalid array is rejected as a whole. Streamed documents are written
+    batch by batch as they arrive; invalid lines are skipped and reported
+    under `rejected`, with status 207 when there are any.
+    """
+    if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+        result = await _ingest_ndjson(request, db)
+        if result["rejected"]:
+            response.status_code = 207
+        return result
+    try:
+        documents = _documents_adapter.validate_json(await request.body())
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False))
+    return await aio.bulk_upsert_agents_json(db, documents, BULK_BATCH_SIZE)
+
+async def _ingest_ndjson(request: Request, db: Session) -> dict:
+    """Validate and write an NDJSON stream without buffering the whole body."""
+    totals = {"services": 0, "intents": 0, "skipped": 0, "rejected": []}
+    batch, buffer, line_number = [], b"", 0
+
+    async def flush():
+        result = await aio.bulk_upsert_agents_json(db, batch, BULK_BATCH_SIZE)
+        for key, count in result.items():
+            totals[key] += count
+        batch.clear()
+
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_number += 1
+            _append_document(batch, totals["rejected"], line, line_number)
+            if len(batch) >= BULK_BATCH_SIZE:
+                await flush()
+    _append_document(batch, totals["rejected"], buffer, line_number + 1)
+    if batch:
+        await flush()
+    return totals
+
+def _append_document(batch: list, rejected: list, line: bytes, line_number: int):
+    """Validate one NDJSON line and add it to the batch, or record it as rejected; blank lines are skipped."""
+    if not line.strip():
+        return
+    try:
+        batch.append(schemas.AgentsJson.model_validate_json(line))
+    except ValidationError as e:
+        rejected.append({"line": line_number, "errors": e.errors(include_url=False, include_context=False)})
@@ -6,7 +6,8 @@ from .intent import (
     IntentBase,
     IntentCreate,
     IntentUpdate,
-    Intent
+    Intent,
+    IntentSuggestion
 )
 from .service import (
     ServiceInfo,
@@ -14,6 +15,8 @@ from .service import (
     ServiceCreate,
     ServiceUpdate,
     Service,
-    AgentsJson
+    AgentsJson,
+    RejectedLine,
+    BulkIngestResult
 )
-from .tag import Tag
\ No newline at end of file
+from .tag import Tag
@@ -1,6 +1,6 @@
 # app/schemas/intent.py
 
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, field_validator
 from typing import List, Optional
 from .tag import Tag
 
@@ -27,19 +27,42 @@ class IntentBase(BaseModel):
     tags: Optional[List[Tag]] = None
     model_config = ConfigDict(from_attributes=True)
 
+def tag_names(value):
+    """Normalize tags given as names, dicts or tag objects to a list of names."""
+    if value is None:
+        return None
+    names = []
+    for tag in value:
+        if isinstance(tag, dict):
+            tag = tag.get("name")
+        elif not isinstance(tag, str):
+            tag = getattr(tag, "name", tag)
+        names.append(tag)
+    return names
+
 class IntentCreate(IntentBase):
-    pass
+    tags: Optional[List[str]] = None
     model_config = ConfigDict(from_attributes=True)
 
+    _normalize_tags = field_validator("tags", mode="before")(tag_names)
+
 class IntentUpdate(BaseModel):
     description: Optional[str] = None
     input_parameters: Optional[List[InputParameter]] = None
     output_parameters: Optional[List[OutputParameter]] = None
     endpoint: Optional[str] = None
-    tags: Optional[List[Tag]] = None
+    tags: Optional[List[str]] = None
     model_config = ConfigDict(from_attributes=True)
 
+    _normalize_tags = field_validator("tags", mode="before")(tag_names)
+
 class Intent(IntentBase):
     id: int
     service_id: int
-    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
+
+
+class IntentSuggestion(BaseModel):
+    text: str
+    kind: str
+    count: int
@@ -37,4 +37,16 @@ class ServiceInfo(ServiceBase):
 class AgentsJson(BaseModel):
     service_info: ServiceInfo
     intents: List[IntentCreate]
-    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
+
+class RejectedLine(BaseModel):
+    line: int
+    errors: List[dict]
+
+class BulkIngestResult(BaseModel):
+    services: int
+    intents: int
+    # Intents whose UID belongs to another service
+    skipped: int = 0
+    # NDJSON lines that failed validation and were not written
+    rejected: List[RejectedLine] = []
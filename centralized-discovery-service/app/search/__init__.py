@@ -0,0 +1,19 @@
+# app/search/__init__.py
+
+from .indexing import (
+    IntentDocument,
+    CatalogIndex,
+    register_index,
+    reset_indexes,
+    mark_intents_changed,
+    catalog_version,
+    bump_catalog_version,
+    top_hits,
+    fetch_ranked_intents
+)
+from .trigram import TrigramIndex
+from .tags import TagIndex
+from .suggest import SuggestIndex, suggest_index
+from .cache import QueryCache, query_cache
+from .vectors import VectorIndex, vector_index, encode_texts, rank_semantic_query
+from .bm25 import BM25Index, bm25_index, rank_bm25_query
@@ -0,0 +1,181 @@
+# app/search/bm25.py
+
+import math
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models.intent import Intent
+from app.search.indexing import CatalogIndex, fetch_ranked_intents, register_index, top_hits
+from app.utils.concurrency import offload
+from app.utils.pagination import Cursor
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_CAMEL_RE = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+")
+
+FIELDS = ("intent_name", "description", "tags")
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase words of text; CamelCase words also yield their parts ("SearchFlights" -> search, flights)."""
+    tokens = []
+    for word in _WORD_RE.findall(text or ""):
+        lower = word.lower()
+        tokens.append(lower)
+        if lower != word or not word.isalpha():
+            parts = _CAMEL_RE.findall(word)
+            if len(parts) > 1:
+                tokens.extend(part.lower() for part in parts)
+    return tokens
+
+def field_weights() -> Tuple[float, ...]:
+    return (settings.BM25_NAME_WEIGHT, settings.BM25_DESCRIPTION_WEIGHT, settings.BM25_TAGS_WEIGHT)
+
+class BM25Index(CatalogIndex):
+    """In-memory BM25F index over intent names, descriptions and tags.
+
+    Each term keeps per-field posting arrays of (row, term frequency),
+    compiled to NumPy on first use after a change. A query is scored
+    against every intent at once: field frequencies are length-normalized
+    and weighted into one pseudo-frequency per row, then saturated with k1
+    and multiplied by the term's idf. Rows of removed intents are reused.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._clear()
+
+    def search(self, query: str, k: int, after: Optional[Cursor] = None) -> List[Tuple[int, float]]:
+        """Return the k best (intent_id, score) pairs ordered by (-score, id), after a cursor."""
+        with self._lock:
+            terms = [term for term in dict.fromkeys(tokenize(query)) if term in self._df]
+            if not terms or k <= 0:
+                return []
+            return top_hits(self._ids[:self._rows_used], self.score(terms), k, after)
+
+    def score(self, terms: List[str]) -> np.ndarray:
+        """BM25F scores of every row for the given terms."""
+        k1, b = settings.BM25_K1, settings.BM25_B
+        size = self._rows_used
+        count = len(self._rows)
+        # Per-field length normalization of every row: 1 - b + b * length / average length
+        norms = []
+        for f in range(len(FIELDS)):
+            average = self._total_lengths[f] / count if count else 0.0
+            lengths = self._lengths[f, :size]
+            norms.append(1 - b + b * lengths / average if average else np.ones(size))
+        scores = np.zeros(size, dtype=np.float64)
+        for term in terms:
+            df = self._df.get(term, 0)
+            if not df:
+                continue
+            idf = math.log(1 + (count - df + 0.5) / (df + 0.5))
+            pseudo = np.zeros(size, dtype=np.float64)
+            for f, (rows, tfs) in enumerate(self._compiled(term)):
+                if len(rows):
+                    pseudo[rows] += self._weights[f] * tfs / norms[f][rows]
+            scores += idf * pseudo / (k1 + pseudo)
+        return scores
+
+    def _compiled(self, term: str):
+        arrays = self._arrays.get(term)
+        if arrays is None:
+            arrays = tuple(
+                (np.fromiter(posting.keys(), dtype=np.int64, count=len(posting)),
+                 np.fromiter(posting.values(), dtype=np.float64, count=len(posting)))
+                for posting in (field_postings.get(term, {}) for field_postings in self._postings)
+            )
+            self._arrays[term] = arrays
+        return arrays
+
+    def _add_all(self, docs):
+        postings, total_lengths, df = self._postings, self._total_lengths, self._df
+        touched = set()
+        for doc in docs:
+            row = self._free.pop() if self._free else self._next_row()
+            # _next_row may have grown the arrays
+            lengths = self._lengths
+            counts = (
+                Counter(tokenize(doc.intent_name)),
+                Counter(tokenize(doc.description)),
+                Counter(tokenize(" ".join(doc.tags)))
+            )
+            for f, field_counts in enumerate(counts):
+                length = sum(field_counts.values())
+                lengths[f, row] = length
+                total_lengths[f] += length
+                field_postings = postings[f]
+                for term, tf in field_counts.items():
+                    posting = field_postings.get(term)
+                    if posting is None:
+                        field_postings[term] = {row: tf}
+                    else:
+                        posting[row] = tf
+            terms = counts[0].keys() | counts[1].keys() | counts[2].keys()
+            for term in terms:
+                df[term] = df.get(term, 0) + 1
+            touched |= terms
+            self._ids[row] = doc.id
+            self._rows[doc.id] = (row, counts)
+        if len(touched) > len(self._arrays):
+            self._arrays.clear()
+        else:
+            for term in touched:
+                self._arrays.pop(term, None)
+
+    def _remove(self, intent_id: int):
+        entry = self._rows.pop(intent_id, None)
+        if entry is None:
+            return
+        row, counts = entry
+        for f, field_counts in enumerate(counts):
+            self._total_lengths[f] -= self._lengths[f, row]
+            self._lengths[f, row] = 0
+            for term in field_counts:
+                posting = self._postings[f][term]
+                del posting[row]
+                if not posting:
+                    del self._postings[f][term]
+                self._arrays.pop(term, None)
+        for term in set().union(*counts):
+            self._df[term] -= 1
+            if not self._df[term]:
+                del self._df[term]
+        self._ids[row] = -1
+        self._free.append(row)
+
+    def _next_row(self) -> int:
+        if self._rows_used == len(self._ids):
+            capacity = max(2 * self._rows_used, 1024)
+            lengths = np.zeros((len(FIELDS), capacity), dtype=np.float64)
+            lengths[:, :self._rows_used] = self._lengths[:, :self._rows_used]
+            ids = np.full(capacity, -1, dtype=np.int64)
+            ids[:self._rows_used] = self._ids[:self._rows_used]
+            self._lengths, self._ids = lengths, ids
+        self._rows_used += 1
+        return self._rows_used - 1
+
+    def _clear(self):
+        self._weights = field_weights()
+        # field -> term -> {row: term frequency}
+        self._postings: List[Dict[str, Dict[int, int]]] = [{} for _ in FIELDS]
+        self._arrays: Dict[str, tuple] = {}
+        self._df: Dict[str, int] = {}
+        self._lengths = np.zeros((len(FIELDS), 0), dtype=np.float64)
+        self._total_lengths = [0.0] * len(FIELDS)
+        self._ids = np.zeros(0, dtype=np.int64)
+        # intent_id -> (row, per-field term counts)
+        self._rows: Dict[int, tuple] = {}
+        self._free: List[int] = []
+        self._rows_used = 0
+
+bm25_index = register_index(BM25Index())
+
+def rank_bm25_query(
+    db: Session, query: str, skip: int = 0, limit: int = 10, cursor: Cursor = None
+) -> List[Tuple[Intent, float]]:
+    """Return (intent, BM25F score) pairs for a natural language query, after an optional keyset cursor."""
+    bm25_index.ensure_loaded(db)
+    hits = offload(bm25_index.search, query, skip + limit, after=cursor)
+    return fetch_ranked_intents(db, hits[skip:])
@@ -0,0 +1,105 @@
+# app/search/cache.py
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, List, Optional, Tuple
+from app.config import settings
+from app.search.indexing import catalog_version
+
+def normalize_text(value: Optional[str]) -> Optional[str]:
+    """Lowercase a case-insensitive query term and collapse its whitespace; empty becomes None."""
+    if value is None:
+        return None
+    return " ".join(value.lower().split()) or None
+
+def normalize_tags(tags: Optional[str]) -> Optional[List[str]]:
+    """Split a comma-separated tag list into sorted distinct names; empty becomes None."""
+    if not tags:
+        return None
+    return sorted({tag.strip() for tag in tags.split(",") if tag.strip()}) or None
+
+class QueryCache:
+    """LRU cache of query results with a TTL, bounded by entry count and bytes.
+
+    Entries are tagged with the catalog version they were computed at and
+    are ignored once a write has bumped the version.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, Tuple[int, float, int, Any]]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Tuple[Any, int]]) -> Tuple[Any, bool]:
+        """Return (value, hit). On a miss, loader() returns the value and its size in bytes."""
+        value, version = self.lookup(key)
+        if value is not None:
+            return value, True
+        value, size = loader()
+        self.store(key, version, value, size)
+        return value, False
+
+    def lookup(self, key: Hashable) -> Tuple[Optional[Any], int]:
+        """Return (value or None, version); pass version to store() after a miss."""
+        version = catalog_version()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry_version, expires_at, size, value = entry
+                if entry_version == version and expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value, version
+                self._discard(key)
+            self.misses += 1
+        return None, version
+
+    def store(self, key: Hashable, version: int, value: Any, size: int):
+        """Cache a value computed at the given catalog version, evicting LRU entries to fit."""
+        if self.max_entries <= 0 or size > self.max_bytes or version != catalog_version():
+            return
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = (version, time.monotonic() + self.ttl_seconds, size, value)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._discard(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every entry; counters are kept."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        """Return hit, miss and eviction counters and current usage."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "catalog_version": catalog_version()
+            }
+
+    def _discard(self, key: Hashable):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+query_cache = QueryCache(
+    max_entries=settings.QUERY_CACHE_MAX_ENTRIES,
+    max_bytes=settings.QUERY_CACHE_MAX_BYTES,
+    ttl_seconds=settings.QUERY_CACHE_TTL_SECONDS
+)
@@ -0,0 +1,240 @@
+# app/search/indexing.py
+
+import logging
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from itertools import chain
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session, selectinload
+from app.models.intent import Intent, intent_tags
+from app.models.tag import Tag
+from app.utils.concurrency import offload, on_event_loop
+from app.utils.pagination import Cursor
+
+logger = logging.getLogger(__name__)
+
+_PENDING_IDS = "catalog_pending_intent_ids"
+_COMMITTED_CHANGES = "catalog_committed_changes"
+
+@dataclass(frozen=True)
+class IntentDocument:
+    """Snapshot of the searchable fields of an intent."""
+    id: int
+    service_id: int
+    intent_uid: str
+    intent_name: str
+    description: str
+    tags: Tuple[str, ...] = ()
+    # Stored float32 embedding bytes, loaded only for indexes that need them
+    embedding: Optional[bytes] = None
+
+class CatalogIndex:
+    """Base class for in-process indexes kept in sync with catalog writes.
+
+    Indexes are built lazily from the database on first use and then
+    updated incrementally from the intents changed by each commit. Only
+    commits made in this process are seen: with several API or crawler
+    processes sharing a database, an index lags the writes of the others
+    until it is reset, so callers must recheck its candidates in SQL.
+    """
+
+    # Whether documents passed to this index carry their stored embedding
+    needs_embeddings = False
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.loaded = False
+
+    def ensure_loaded(self, db: Session):
+        """Build the index from the database if it has not been built yet.
+
+        Under AsyncSession.run_sync() the documents are read on the event
+        loop and the index is built in the threadpool, without holding the
+        lock across the wait; a build that raced a commit is started again.
+        """
+        if self.loaded:
+            return
+        if not on_event_loop():
+            with self._lock:
+                if not self.loaded:
+                    self._load(load_documents(db, embeddings=self.needs_embeddings))
+            return
+        while not self.loaded:
+            version = catalog_version()
+            docs = load_documents(db, embeddings=self.needs_embeddings)
+            offload(self._load, docs, version)
+
+    def _load(self, docs: List[IntentDocument], version: Optional[int] = None):
+        with self._lock:
+            # Changes committed after docs were read were not applied to the index
+            if self.loaded or (version is not None and version != catalog_version()):
+                return
+            self._clear()
+            self._add_all(docs)
+            self.loaded = True
+
+    def apply(self, docs: Iterable[IntentDocument], removed_ids: Iterable[int]):
+        """Apply committed changes; ignored until the index has been built."""
+        with self._lock:
+            if not self.loaded:
+                return
+            for intent_id in removed_ids:
+                self._remove(intent_id)
+            docs = list(docs)
+            for doc in docs:
+                self._remove(doc.id)
+            self._add_all(docs)
+
+    def reset(self):
+        """Drop the index contents; it is rebuilt on next use."""
+        with self._lock:
+            self._clear()
+            self.loaded = False
+
+    def _add_all(self, docs: Iterable[IntentDocument]):
+        for doc in docs:
+            self._add(doc)
+
+    def _add(self, doc: IntentDocument):
+        raise NotImplementedError
+
+    def _remove(self, intent_id: int):
+        raise NotImplementedError
+
+    def _clear(self):
+        raise NotImplementedError
+
+_indexes: List[CatalogIndex] = []
+_version_lock = threading.Lock()
+_catalog_version = 0
+
+def catalog_version() -> int:
+    """Return a counter that changes whenever committed intents change."""
+    return _catalog_version
+
+def bump_catalog_version() -> int:
+    """Invalidate everything derived from the catalog, such as cached query results."""
+    global _catalog_version
+    with _version_lock:
+        _catalog_version += 1
+        return _catalog_version
+
+def register_index(index: CatalogIndex) -> CatalogIndex:
+    """Register an index so that it receives committed catalog changes."""
+    _indexes.append(index)
+    return index
+
+def reset_indexes():
+    """Reset every registered index."""
+    for index in _indexes:
+        index.reset()
+
+def load_documents(
+    db: Session, ids: Optional[Iterable[int]] = None, embeddings: bool = False
+) -> List[IntentDocument]:
+    """Load intent documents, with their tag names, in two queries."""
+    columns = [Intent.id, Intent.service_id, Intent.intent_uid, Intent.intent_name, Intent.description]
+    if embeddings:
+        columns.append(Intent.embedding)
+    intent_query = select(*columns).order_by(Intent.id)
+    tag_query = select(intent_tags.c.intent_id, Tag.name).join(Tag, Tag.id == intent_tags.c.tag_id)
+    if ids is not None:
+        ids = list(ids)
+        if not ids:
+            return []
+        intent_query = intent_query.where(Intent.id.in_(ids))
+        tag_query = tag_query.where(intent_tags.c.intent_id.in_(ids))
+    tags_by_intent: Dict[int, List[str]] = defaultdict(list)
+    for intent_id, name in db.execute(tag_query):
+        tags_by_intent[intent_id].append(name)
+    return [
+        IntentDocument(
+            id=row.id,
+            service_id=row.service_id,
+            intent_uid=row.intent_uid,
+            intent_name=row.intent_name,
+            description=row.description or "",
+            tags=tuple(sorted(tags_by_intent.get(row.id, ()))),
+            embedding=row.embedding if embeddings else None
+        )
+        for row in db.execute(intent_query)
+    ]
+
+def top_hits(ids: np.ndarray, scores: np.ndarray, k: int, after: Optional[Cursor] = None) -> List[Tuple[int, float]]:
+    """Return the k best positive (id, score) pairs in (-score, id) order, after a keyset cursor."""
+    if after is not None:
+        before = (scores > after.rank) | ((scores == after.rank) & (ids <= after.id))
+        scores = np.where(before, -np.inf, scores)
+    if len(scores) > k:
+        # Keep every row tied with the k-th score so ties are broken by id
+        kth = -np.partition(-scores, k - 1)[k - 1]
+        positions = np.flatnonzero(scores >= max(kth, np.finfo(scores.dtype).tiny))
+    else:
+        positions = np.flatnonzero(scores > 0)
+    return sorted(
+        ((int(ids[p]), float(scores[p])) for p in positions if scores[p] > 0),
+        key=lambda hit: (-hit[1], hit[0])
+    )[:k]
+
+def fetch_ranked_intents(db: Session, hits: List[Tuple[int, float]]) -> List[Tuple[Intent, float]]:
+    """Load the intents of ranked (intent_id, score) hits with their tags, keeping the ranking."""
+    if not hits:
+        return []
+    intents = {
+        intent.id: intent
+        for intent in db.query(Intent).options(
+            selectinload(Intent.tags)
+        ).filter(Intent.id.in_([intent_id for intent_id, _ in hits]))
+    }
+    return [(intents[intent_id], score) for intent_id, score in hits if intent_id in intents]
+
+def mark_intents_changed(db: Session, intent_ids: Iterable[int]):
+    """Record intents changed outside the ORM unit of work (e.g. Core inserts)."""
+    db.info.setdefault(_PENDING_IDS, set()).update(intent_ids)
+
+@event.listens_for(Session, "after_flush")
+def _collect_flushed_intents(session, flush_context):
+    pending = session.info.setdefault(_PENDING_IDS, set())
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, Intent) and obj.id is not None:
+            pending.add(obj.id)
+
+@event.listens_for(Session, "before_commit")
+def _snapshot_changed_intents(session):
+    session.flush()
+    ids = session.info.pop(_PENDING_IDS, None)
+    if not ids:
+        return
+    docs = removed = None
+    loaded = [index for index in _indexes if index.loaded]
+    if loaded:
+        docs = load_documents(session, ids, embeddings=any(index.needs_embeddings for index in loaded))
+        removed = ids - {doc.id for doc in docs}
+    session.info[_COMMITTED_CHANGES] = (docs, removed)
+
+@event.listens_for(Session, "after_commit")
+def _apply_committed_intents(session):
+    session.info.pop(_PENDING_IDS, None)
+    changes = session.info.pop(_COMMITTED_CHANGES, None)
+    if not changes:
+        return
+    bump_catalog_version()
+    docs, removed = changes
+    if docs is None:
+        return
+    for index in _indexes:
+        try:
+            index.apply(docs, removed)
+        except Exception as e:
+            logger.error(f"Error updating {type(index).__name__}, resetting it: {e}")
+            index.reset()
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_pending_intents(session, previous_transaction):
+    if previous_transaction.nested:
+        return
+    session.info.pop(_PENDING_IDS, None)
+    session.info.pop(_COMMITTED_CHANGES, None)
@@ -0,0 +1,145 @@
+# app/search/suggest.py
+
+import heapq
+from bisect import bisect_left, insort
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+from app.search.indexing import CatalogIndex, IntentDocument, register_index
+
+KINDS = ("intent_name", "intent_uid", "tag")
+
+# Ranked prefixes remembered between catalog changes
+_MAX_CACHED_PREFIXES = 10000
+# Largest number of suggestions a cached prefix keeps
+MAX_SUGGESTIONS = 50
+# Larger batches of changed intents drop the cached rankings instead of patching them
+_MAX_PATCHED_DOCS = 200
+
+def _prefix_end(prefix: str) -> str:
+    # Smallest string greater than every string starting with prefix
+    return prefix + "\U0010ffff"
+
+class SuggestIndex(CatalogIndex):
+    """Prefix index of intent names, intent UIDs and tag names.
+
+    Distinct lowercase values are kept in one sorted array searched with
+    bisect; each value counts the intents carrying it, which ranks the
+    suggestions. Ranked results are remembered per prefix and patched in
+    place by catalog changes.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._clear()
+
+    def suggest(
+        self, prefix: str, limit: int = 10, kinds: Optional[Iterable[str]] = None
+    ) -> List[Tuple[str, str, int]]:
+        """Return up to limit (text, kind, count) values starting with prefix, most frequent first."""
+        prefix = prefix.lower()
+        kinds = tuple(sorted(set(kinds))) if kinds else KINDS
+        with self._lock:
+            cached = self._ranked.setdefault(prefix, {})
+            ranked = cached.get(kinds)
+            if ranked is None:
+                ranked = cached[kinds] = self._rank(prefix, kinds)
+                self._cached_lists += 1
+                if self._cached_lists > _MAX_CACHED_PREFIXES:
+                    self._ranked = {prefix: {kinds: ranked}}
+                    self._cached_lists = 1
+            return [(self._display[key], key[1], self._counts[key]) for key in ranked[:limit]]
+
+    def _order(self, key: Tuple[str, str]):
+        # Most frequent first, then shortest, then alphabetical
+        return -self._counts[key], len(key[0]), key
+
+    def _rank(self, prefix: str, kinds: Tuple[str, ...]) -> List[Tuple[str, str]]:
+        start = bisect_left(self._keys, (prefix,))
+        end = bisect_left(self._keys, (_prefix_end(prefix),), start)
+        matches = (key for key in self._keys[start:end] if key[1] in kinds)
+        return heapq.nsmallest(MAX_SUGGESTIONS, matches, key=self._order)
+
+    def _update_cached(self, key: Tuple[str, str], increased: bool):
+        """Keep the cached rankings of every prefix of key exact after its count changed.
+
+        A value whose count rose can only move up, so it is re-inserted in
+        place. One whose count fell can only move down: rankings it is not in
+        stay exact, those holding every match are re-sorted, and truncated
+        ones containing it are dropped.
+        """
+        text, kind = key
+        for end in range(1, len(text) + 1):
+            cached = self._ranked.get(text[:end])
+            if not cached:
+                continue
+            for kinds, ranked in list(cached.items()):
+                if kind not in kinds:
+                    continue
+                if key in ranked:
+                    if not increased and len(ranked) >= MAX_SUGGESTIONS:
+                        del cached[kinds]
+                        self._cached_lists -= 1
+                        continue
+                    ranked.remove(key)
+                if key in self._counts and (increased or len(ranked) < MAX_SUGGESTIONS):
+                    order = self._order(key)
+                    position = bisect_left([self._order(other) for other in ranked], order)
+                    if position < MAX_SUGGESTIONS:
+                        ranked.insert(position, key)
+                        del ranked[MAX_SUGGESTIONS:]
+
+    def _add_all(self, docs: Iterable[IntentDocument]):
+        docs = list(docs)
+        # Large batches (initial loads, bulk upserts) rank again rather than patch every prefix
+        patch = len(docs) <= _MAX_PATCHED_DOCS
+        new_keys = []
+        for doc in docs:
+            keys = [
+                (value.lower(), kind, value)
+                for kind, value in (("intent_name", doc.intent_name), ("intent_uid", doc.intent_uid))
+                if value
+            ] + [(tag.lower(), "tag", tag) for tag in doc.tags if tag]
+            self._doc_keys[doc.id] = tuple(dict.fromkeys((text, kind) for text, kind, _ in keys))
+            for text, kind, value in keys:
+                self._display.setdefault((text, kind), value)
+            for key in self._doc_keys[doc.id]:
+                if not self._counts[key]:
+                    new_keys.append(key)
+                self._counts[key] += 1
+                # Patched at once, so that cached rankings stay sorted for the next key
+                if patch:
+                    self._update_cached(key, increased=True)
+        if len(new_keys) > 64:
+            self._keys = sorted(set(self._keys).union(new_keys))
+        else:
+            for key in new_keys:
+                insort(self._keys, key)
+        if not patch:
+            self._ranked = {}
+            self._cached_lists = 0
+
+    def _add(self, doc: IntentDocument):
+        self._add_all([doc])
+
+    def _remove(self, intent_id: int):
+        for key in self._doc_keys.pop(intent_id, ()):
+            self._counts[key] -= 1
+            if self._counts[key] <= 0:
+                del self._counts[key]
+                del self._display[key]
+                position = bisect_left(self._keys, key)
+                if position < len(self._keys) and self._keys[position] == key:
+                    del self._keys[position]
+            self._update_cached(key, increased=False)
+
+    def _clear(self):
+        self._keys: List[Tuple[str, str]] = []
+        self._counts: Counter = Counter()
+        # Original spelling shown for each lowercase value
+        self._display: Dict[Tuple[str, str], str] = {}
+        self._doc_keys: Dict[int, Tuple[Tuple[str, str], ...]] = {}
+        # prefix -> kinds -> best keys, at most MAX_SUGGESTIONS
+        self._ranked: Dict[str, Dict[Tuple[str, ...], List[Tuple[str, str]]]] = {}
+        self._cached_lists = 0
+
+suggest_index = register_index(SuggestIndex())
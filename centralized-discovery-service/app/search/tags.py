@@ -0,0 +1,73 @@
+# app/search/tags.py
+
+import heapq
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Tuple
+from app.search.indexing import CatalogIndex, IntentDocument, register_index
+
+def intersect_sorted(left: List[int], right: List[int]) -> List[int]:
+    """Intersect two sorted id lists by binary-searching the longer one."""
+    if len(left) > len(right):
+        left, right = right, left
+    result, position = [], 0
+    for value in left:
+        position = bisect_left(right, value, position)
+        if position == len(right):
+            break
+        if right[position] == value:
+            result.append(value)
+    return result
+
+def union_sorted(postings: Iterable[List[int]]) -> List[int]:
+    """Merge sorted id lists into one sorted list without duplicates."""
+    result = []
+    for value in heapq.merge(*postings):
+        if not result or result[-1] != value:
+            result.append(value)
+    return result
+
+class TagIndex(CatalogIndex):
+    """In-process index of sorted intent-id posting lists per tag name."""
+
+    def __init__(self):
+        super().__init__()
+        self._postings: Dict[str, List[int]] = {}
+        self._doc_tags: Dict[int, Tuple[str, ...]] = {}
+
+    def match(self, tags: Iterable[str], match_all: bool = False) -> List[int]:
+        """Return the sorted ids of intents with all (or any) of the given tags."""
+        with self._lock:
+            postings = [self._postings.get(tag, []) for tag in dict.fromkeys(tags)]
+            if not postings:
+                return []
+            if not match_all:
+                return union_sorted(postings)
+            postings.sort(key=len)
+            result = postings[0]
+            for posting in postings[1:]:
+                if not result:
+                    break
+                result = intersect_sorted(result, posting)
+            return list(result)
+
+    def _add(self, doc: IntentDocument):
+        self._doc_tags[doc.id] = doc.tags
+        for tag in doc.tags:
+            insort(self._postings.setdefault(tag, []), doc.id)
+
+    def _remove(self, intent_id: int):
+        for tag in self._doc_tags.pop(intent_id, ()):
+            posting = self._postings.get(tag)
+            if posting is None:
+                continue
+            position = bisect_left(posting, intent_id)
+            if position < len(posting) and posting[position] == intent_id:
+                del posting[position]
+            if not posting:
+                del self._postings[tag]
+
+    def _clear(self):
+        self._postings = {}
+        self._doc_tags = {}
+
+tag_index = register_index(TagIndex())
@@ -0,0 +1,91 @@
+# app/search/trigram.py
+
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+from app.search.indexing import CatalogIndex, IntentDocument, register_index
+from app.utils.concurrency import offload
+
+def trigrams(text: str) -> FrozenSet[str]:
+    """Return the set of lowercase character trigrams of a string."""
+    text = (text or "").lower()
+    return frozenset(text[i:i + 3] for i in range(len(text) - 2))
+
+def similarity(left: FrozenSet[str], right: FrozenSet[str]) -> float:
+    """Trigram similarity as computed by pg_trgm: shared over total trigrams."""
+    union = len(left | right)
+    return len(left & right) / union if union else 0.0
+
+class TrigramIndex(CatalogIndex):
+    """In-process trigram posting-list index over one intent field.
+
+    Used as the substring search backend when the database has no pg_trgm.
+    """
+
+    def __init__(self, field: str):
+        super().__init__()
+        self.field = field
+        self._postings: Dict[str, Set[int]] = {}
+        self._doc_trigrams: Dict[int, FrozenSet[str]] = {}
+
+    def search(self, term: str) -> Optional[Dict[int, float]]:
+        """Return candidate ids containing every trigram of term, with their similarity.
+
+        Candidates are a superset of the case-insensitive substring matches and
+        must be rechecked. Returns None if term is too short to be indexed.
+        """
+        query = trigrams(term)
+        if not query:
+            return None
+        with self._lock:
+            postings = sorted((self._postings.get(gram, ()) for gram in query), key=len)
+            if not postings[0]:
+                return {}
+            candidates = set(postings[0]).intersection(*postings[1:])
+            return {
+                intent_id: similarity(query, self._doc_trigrams[intent_id])
+                for intent_id in candidates
+            }
+
+    def _add(self, doc: IntentDocument):
+        grams = trigrams(getattr(doc, self.field))
+        self._doc_trigrams[doc.id] = grams
+        for gram in grams:
+            self._postings.setdefault(gram, set()).add(doc.id)
+
+    def _remove(self, intent_id: int):
+        for gram in self._doc_trigrams.pop(intent_id, ()):
+            posting = self._postings.get(gram)
+            if posting is not None:
+                posting.discard(intent_id)
+                if not posting:
+                    del self._postings[gram]
+
+    def _clear(self):
+        self._postings = {}
+        self._doc_trigrams = {}
+
+intent_name_index = register_index(TrigramIndex("intent_name"))
+description_index = register_index(TrigramIndex("description"))
+_INDEXES = {"intent_name": intent_name_index, "description": description_index}
+
+def rank_candidates(db, terms: Dict[str, str]) -> Optional[List[Tuple[int, float]]]:
+    """Intersect the trigram candidates of each field filter and rank them.
+
+    Returns (intent_id, score) pairs ordered by descending summed similarity,
+    or None if some term is too short for the index.
+    """
+    for field in terms:
+        _INDEXES[field].ensure_loaded(db)
+    return offload(_rank, terms)
+
+def _rank(terms: Dict[str, str]) -> Optional[List[Tuple[int, float]]]:
+    scores: Optional[Dict[int, float]] = None
+    for field, term in terms.items():
+        matches = _INDEXES[field].search(term)
+        if matches is None:
+            return None
+        if scores is None:
+            scores = matches
+        else:
+            scores = {i: scores[i] + matches[i] for i in scores.keys() & matches.keys()}
+    ranked = sorted((scores or {}).items(), key=lambda item: (-item[1], item[0]))
+    return ranked
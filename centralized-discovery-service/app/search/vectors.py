@@ -0,0 +1,258 @@
+# app/search/vectors.py
+
+import logging
+import re
+import threading
+import zlib
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models.intent import Intent, build_search_document
+from app.search.indexing import CatalogIndex, IntentDocument, fetch_ranked_intents, register_index, top_hits
+from app.utils.concurrency import offload
+from app.utils.pagination import Cursor
+
+try:
+    import hnswlib
+except ImportError:  # optional: exact NumPy search is used instead
+    hnswlib = None
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """Scale rows to unit length so that dot products are cosine similarities."""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+class HashingEncoder:
+    """Dependency-free encoder: signed feature hashing of words and character trigrams.
+
+    Trigrams let "flights" match "SearchFlights"; used when no spaCy model
+    with word vectors is configured.
+    """
+
+    def __init__(self, dim: int):
+        self.dim = dim
+
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, weight in self._features(text):
+                code = zlib.crc32(feature.encode())
+                vectors[row, code % self.dim] += weight if code & 0x80000000 else -weight
+        return normalize(vectors)
+
+    @staticmethod
+    def _features(text: str):
+        for word in _TOKEN_RE.findall((text or "").lower()):
+            yield "w:" + word, 1.0
+            padded = f"<{word}>"
+            for i in range(len(padded) - 2):
+                yield padded[i:i + 3], 0.5
+
+class SpacyEncoder:
+    """Average of the static word vectors of a spaCy model."""
+
+    def __init__(self, nlp):
+        self.nlp = nlp
+        self.dim = nlp.vocab.vectors_length
+
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        docs = self.nlp.pipe(texts, batch_size=settings.EMBEDDING_BATCH_SIZE)
+        vectors = np.array([doc.vector for doc in docs], dtype=np.float32).reshape(len(texts), self.dim)
+        return normalize(vectors)
+
+_encoder = None
+_encoder_lock = threading.Lock()
+
+def get_encoder():
+    """Return the configured encoder, loading the spaCy model on first use."""
+    global _encoder
+    if _encoder is None:
+        with _encoder_lock:
+            if _encoder is None:
+                _encoder = _load_encoder()
+    return _encoder
+
+def _load_encoder():
+    if settings.EMBEDDING_MODEL:
+        try:
+            import spacy
+            # Only the tokenizer and the static vectors are needed
+            nlp = spacy.load(settings.EMBEDDING_MODEL, exclude=[
+                "tok2vec", "tagger", "morphologizer", "parser", "senter",
+                "attribute_ruler", "lemmatizer", "ner"
+            ])
+            if nlp.vocab.vectors_length:
+                return SpacyEncoder(nlp)
+            logger.warning(f"spaCy model {settings.EMBEDDING_MODEL} has no word vectors")
+        except Exception as e:
+            logger.warning(f"Cannot load spaCy model {settings.EMBEDDING_MODEL}: {e}")
+    return HashingEncoder(settings.EMBEDDING_DIM)
+
+def encode_texts(texts: Sequence[str]) -> np.ndarray:
+    """Embed texts in batches of EMBEDDING_BATCH_SIZE; returns unit-length float32 rows."""
+    encoder = get_encoder()
+    batch = settings.EMBEDDING_BATCH_SIZE
+    if not texts:
+        return np.zeros((0, encoder.dim), dtype=np.float32)
+    return np.vstack([encoder.encode(texts[i:i + batch]) for i in range(0, len(texts), batch)])
+
+@event.listens_for(Session, "before_flush")
+def _embed_changed_intents(session, flush_context, instances):
+    # Registered after the search_document listener of app.models.intent, so
+    # documents are already up to date; all changed intents are encoded at once
+    changed = [
+        obj for obj in session.new if isinstance(obj, Intent)
+    ] + [
+        obj for obj in session.dirty
+        if isinstance(obj, Intent) and inspect(obj).attrs.search_document.history.has_changes()
+    ]
+    if not changed:
+        return
+    vectors = offload(encode_texts, [obj.search_document or "" for obj in changed])
+    for obj, vector in zip(changed, vectors):
+        obj.embedding = vector.tobytes()
+
+class VectorIndex(CatalogIndex):
+    """In-process nearest-neighbour index over intent embeddings.
+
+    Vectors live in one contiguous float32 matrix searched exactly with a
+    single matrix-vector product. Past EMBEDDING_HNSW_MIN_SIZE intents an
+    HNSW graph is used instead when hnswlib is installed.
+    """
+
+    needs_embeddings = True
+
+    def __init__(self):
+        super().__init__()
+        self._clear()
+
+    def search(self, vector: np.ndarray, k: int, after: Optional[Cursor] = None) -> List[Tuple[int, float]]:
+        """Return the k most similar (intent_id, score) pairs ordered by (-score, id), after a cursor."""
+        with self._lock:
+            if not self._size or k <= 0:
+                return []
+            vector = np.asarray(vector, dtype=np.float32)
+            hnsw = self._hnsw_index()
+            if hnsw is not None:
+                return self._search_hnsw(hnsw, vector, k, after)
+            return top_hits(self._ids[:self._size], self._matrix[:self._size] @ vector, k, after)
+
+    def _search_hnsw(self, hnsw, vector, k, after):
+        wanted = k
+        while True:
+            count = min(wanted + (0 if after is None else wanted), self._size)
+            hnsw.set_ef(max(count, 64))
+            labels, distances = hnsw.knn_query(vector, k=count)
+            hits = sorted(
+                ((int(label), float(1 - distance)) for label, distance in zip(labels[0], distances[0])
+                 if int(label) in self._rows),
+                key=lambda hit: (-hit[1], hit[0])
+            )
+            hits = [
+                hit for hit in hits
+                if hit[1] > 0 and (after is None or (hit[1], -hit[0]) < (after.rank, -after.id))
+            ]
+            if len(hits) >= k or count >= self._size:
+                return hits[:k]
+            wanted *= 2
+
+    def _hnsw_index(self):
+        if hnswlib is None or self._size < settings.EMBEDDING_HNSW_MIN_SIZE:
+            return None
+        if self._hnsw is None or len(self._hnsw_deleted) > self._size:
+            # Built once, then rebuilt when deleted labels outnumber live ones
+            index = hnswlib.Index(space="ip", dim=self._matrix.shape[1])
+            index.init_index(max_elements=2 * self._size, ef_construction=200, M=16)
+            index.add_items(self._matrix[:self._size], self._ids[:self._size])
+            self._hnsw = index
+            self._hnsw_deleted = set()
+        return self._hnsw
+
+    def _add_all(self, docs):
+        docs = list(docs)
+        dim = get_encoder().dim
+        vectors: Dict[int, np.ndarray] = {}
+        missing = []
+        for doc in docs:
+            if doc.embedding is not None and len(doc.embedding) == dim * 4:
+                vectors[doc.id] = np.frombuffer(doc.embedding, dtype=np.float32)
+            else:
+                # Stored before embeddings existed, or by another encoder
+                missing.append(doc)
+        if missing:
+            encoded = encode_texts([_document_text(doc) for doc in missing])
+            vectors.update((doc.id, vector) for doc, vector in zip(missing, encoded))
+        for doc in docs:
+            self._append(doc.id, vectors[doc.id])
+
+    def _add(self, doc: IntentDocument):
+        self._add_all([doc])
+
+    def _append(self, intent_id: int, vector: np.ndarray):
+        if not self._size and self._matrix.shape[1] != len(vector):
+            self._matrix = np.zeros((0, len(vector)), dtype=np.float32)
+        if self._size == len(self._matrix):
+            capacity = max(2 * self._size, 1024)
+            matrix = np.zeros((capacity, len(vector)), dtype=np.float32)
+            matrix[:self._size] = self._matrix[:self._size]
+            ids = np.zeros(capacity, dtype=np.int64)
+            ids[:self._size] = self._ids[:self._size]
+            self._matrix, self._ids = matrix, ids
+        self._matrix[self._size] = vector
+        self._ids[self._size] = intent_id
+        self._rows[intent_id] = self._size
+        self._size += 1
+        if self._hnsw is not None:
+            if intent_id in self._hnsw_deleted:
+                # An updated intent keeps its own slot; reusing another deleted
+                # slot would silently drop that slot's label from the graph
+                self._hnsw.unmark_deleted(intent_id)
+                self._hnsw_deleted.discard(intent_id)
+            elif self._hnsw.get_current_count() >= self._hnsw.get_max_elements():
+                self._hnsw.resize_index(2 * self._hnsw.get_max_elements())
+            self._hnsw.add_items(vector[np.newaxis], [intent_id])
+
+    def _remove(self, intent_id: int):
+        row = self._rows.pop(intent_id, None)
+        if row is None:
+            return
+        last = self._size - 1
+        if row != last:
+            # Keep the matrix dense by moving the last row into the gap
+            self._matrix[row] = self._matrix[last]
+            self._ids[row] = self._ids[last]
+            self._rows[int(self._ids[row])] = row
+        self._size = last
+        if self._hnsw is not None:
+            self._hnsw.mark_deleted(intent_id)
+            self._hnsw_deleted.add(intent_id)
+
+    def _clear(self):
+        self._matrix = np.zeros((0, 0), dtype=np.float32)
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._rows: Dict[int, int] = {}
+        self._size = 0
+        self._hnsw = None
+        self._hnsw_deleted = set()
+
+def _document_text(doc: IntentDocument) -> str:
+    return build_search_document(doc.intent_name, doc.description, doc.tags)
+
+vector_index = register_index(VectorIndex())
+
+def _search_query(query: str, k: int, cursor: Cursor) -> List[Tuple[int, float]]:
+    return vector_index.search(encode_texts([query])[0], k, after=cursor)
+
+def rank_semantic_query(
+    db: Session, query: str, skip: int = 0, limit: int = 10, cursor: Cursor = None
+) -> List[Tuple[Intent, float]]:
+    """Return (intent, similarity) pairs nearest to the query embedding, after an optional keyset cursor."""
+    vector_index.ensure_loaded(db)
+    hits = offload(_search_query, query, skip + limit, cursor)
+    return fetch_ranked_intents(db, hits[skip:])
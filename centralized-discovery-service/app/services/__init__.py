@@ -1,5 +1,6 @@
 # app/services/__init__.py
 
 from .crawler import start_crawler
+from .scheduler import CrawlScheduler
 from .dns_utils import get_agents_json_url_from_dns
-from .nlp import process_natural_language_query  # If NLP is implemented
\ No newline at end of file
+from .nlp import process_natural_language_query  # If NLP is implemented
@@ -2,80 +2,527 @@
 
 import asyncio
 import aiohttp
+import os
+import hashlib
+import json
 import logging
-from typing import List, Dict, Any
+import multiprocessing
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+from urllib.parse import urlparse
+from sqlalchemy import select, update
 from sqlalchemy.orm import Session
-from app.crud.service import create_service, get_service_by_name
-from app.crud.intent import create_intent
-from app.schemas.service import ServiceCreate
-from app.schemas.intent import IntentCreate
-from app.models import Service, Intent
+from app.crud.service import get_service_by_name, reconcile_service_intents
+from app.schemas.service import AgentsJson
+from app.models import Service
 from app.config import settings
-import dns.asyncresolver
+from app.services.dns_utils import get_agents_json_url_from_dns
+from app.services.hosts import CircuitBreaker, HostRateLimiter, backoff_delay
 
 logger = logging.getLogger(__name__)
 
+# Size of the chunks an agents.json body is streamed in
+_CHUNK_SIZE = 64 * 1024
+
+# Responses worth retrying: throttling and temporary server or gateway failures
+_TRANSIENT_STATUSES = {408, 429, 500, 502, 503, 504}
+
+# Start method of the validation processes: never fork a threaded process
+_POOL_CONTEXT = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+def _unreachable(error: Exception) -> bool:
+    """Whether a connection error means the host is not there at all: unresolvable or refusing connections."""
+    return isinstance(error, aiohttp.ClientConnectorDNSError) or (
+        isinstance(error, aiohttp.ClientConnectorError) and isinstance(error.os_error, ConnectionRefusedError)
+    )
+
+class TransientFetchError(Exception):
+    """A fetch failure that may succeed on retry."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+def _retry_after(value: Optional[str]) -> Optional[float]:
+    # Only the delay-seconds form; HTTP dates fall back to exponential backoff
+    try:
+        return max(float(value), 0.0) if value is not None else None
+    except ValueError:
+        return None
+
+class BodyTooLarge(Exception):
+    """The agents.json body exceeds CRAWLER_MAX_BODY_BYTES."""
+
+async def read_capped(response: aiohttp.ClientResponse, limit: int) -> Tuple[bytes, str]:
+    """Stream a response body, hashing it on the way, and stop once it exceeds limit bytes."""
+    if response.content_length is not None and response.content_length > limit:
+        raise BodyTooLarge(f"Content-Length {response.content_length} exceeds {limit} bytes")
+    digest, chunks, size = hashlib.sha256(), [], 0
+    async for chunk in response.content.iter_chunked(_CHUNK_SIZE):
+        size += len(chunk)
+        if size > limit:
+            raise BodyTooLarge(f"body exceeds {limit} bytes")
+        digest.update(chunk)
+        chunks.append(chunk)
+    return b"".join(chunks), digest.hexdigest()
+
+def parse_agents_json(body: bytes) -> AgentsJson:
+    """Decode and validate an agents.json body in one pass; runs in the validation processes."""
+    return AgentsJson.model_validate_json(body)
+
+@dataclass
+class FetchResult:
+    """Outcome of a conditional agents.json fetch.
+
+    body is None when the document did not change since the last crawl,
+    either because the server answered 304 or because the body hashes the same.
+    """
+    status: int
+    body: Optional[bytes] = None
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    content_hash: Optional[str] = None
+    # Bytes downloaded, also for an unchanged body
+    size: int = 0
+    # Parsed document, when it was already decoded
+    data: Optional[Dict[str, Any]] = None
+
+    @property
+    def changed(self) -> bool:
+        return self.body is not None or self.data is not None
+
+    def document(self) -> Dict[str, Any]:
+        if self.data is None:
+            self.data = json.loads(self.body)
+        return self.data
+
+class Validators(NamedTuple):
+    """Cache validators of the last stored crawl of an agents.json URL."""
+    etag: Optional[str]
+    last_modified: Optional[str]
+    content_hash: Optional[str]
+
+class CrawlStats:
+    """Throughput counters and a latency sample of a crawl, readable while it runs."""
+
+    def __init__(self, sample_size: int = 10000):
+        self.started = time.monotonic()
+        self.domains = 0
+        self.failed = 0
+        self.invalid = 0
+        self.changed = 0
+        self.bytes = 0
+        self._sample_size = sample_size
+        self._latencies: List[float] = []
+
+    def record(self, seconds: float, result: Optional[FetchResult]):
+        self.domains += 1
+        if result is None:
+            self.failed += 1
+        else:
+            self.bytes += result.size
+            self.changed += result.changed
+        # Reservoir sampling keeps the percentiles representative in bounded memory
+        if len(self._latencies) < self._sample_size:
+            self._latencies.append(seconds)
+        else:
+            slot = random.randrange(self.domains)
+            if slot < self._sample_size:
+                self._latencies[slot] = seconds
+
+    def snapshot(self) -> Dict[str, float]:
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        return {
+            "domains": self.domains,
+            "domains_per_second": self.domains / elapsed,
+            "bytes_per_second": self.bytes / elapsed,
+            "changed": self.changed,
+            "error_rate": (self.failed + self.invalid) / self.domains if self.domains else 0.0
+        }
+
+    def latency_summary(self) -> Dict[str, float]:
+        """Per-domain DNS + fetch latency percentiles, in milliseconds."""
+        latencies = sorted(self._latencies)
+        if not latencies:
+            return {}
+        def percentile(fraction):
+            return 1000 * latencies[min(len(latencies) - 1, int(len(latencies) * fraction))]
+        return {
+            "mean_ms": 1000 * sum(latencies) / len(latencies),
+            "p50_ms": percentile(0.5),
+            "p90_ms": percentile(0.9),
+            "p99_ms": percentile(0.99),
+            "max_ms": 1000 * latencies[-1]
+        }
+
+def client_session(concurrency: int = None) -> aiohttp.ClientSession:
+    """Create an HTTP session with the crawler's connection limits and timeouts."""
+    concurrency = concurrency or settings.CRAWLER_CONCURRENCY
+    connector = aiohttp.TCPConnector(
+        limit=concurrency,
+        limit_per_host=settings.CRAWLER_LIMIT_PER_HOST,
+        ttl_dns_cache=settings.CRAWLER_DNS_CACHE_TTL,
+        enable_cleanup_closed=True
+    )
+    timeout = aiohttp.ClientTimeout(
+        total=settings.CRAWLER_TOTAL_TIMEOUT,
+        connect=settings.CRAWLER_CONNECT_TIMEOUT,
+        sock_read=settings.CRAWLER_READ_TIMEOUT
+    )
+    return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
 class Crawler:
-    def __init__(self, domains: List[str], db_session: Session):
+    def __init__(self, domains: Iterable[str], db_session: Session, concurrency: Optional[int] = None):
         self.domains = domains
         self.db_session = db_session
+        self.concurrency = concurrency or settings.CRAWLER_CONCURRENCY
+        self.session: Optional[aiohttp.ClientSession] = None
+        # Intent rows inserted, updated, deleted and left unchanged during this crawl
+        self.changes = Counter()
+        self.stats = CrawlStats()
+        self.rate_limiter = HostRateLimiter()
+        self.breaker = CircuitBreaker()
+        # Called by the writer, inside each batch's transaction, with the
+        # outcome of every crawled domain; see CrawlScheduler.record
+        self.on_crawled: Optional[Callable[[str, Optional[bool]], Any]] = None
+        # Held while a worker thread uses db_session, which is not thread-safe
+        self.db_lock = asyncio.Lock()
+        # Set while pipeline() runs the fetch -> parse -> write stages
+        self._parse_queue: Optional[asyncio.Queue] = None
+        self._write_queue: Optional[asyncio.Queue] = None
+        self._crawl_state: Dict[str, Validators] = {}
+        self._validation_pool: Optional[ProcessPoolExecutor] = None
 
     async def start(self):
-        tasks = [self.process_domain(domain) for domain in self.domains]
-        await asyncio.gather(*tasks)
+        """Crawl every domain through a fetch -> parse -> write pipeline.
+
+        A fixed set of fetch workers pulls domains from a shared iterator, so
+        the domain list may be a lazy iterable of any length.
+        """
+        domains = iter(self.domains)
+        async with self.pipeline():
+            await asyncio.gather(*(self._worker(domains) for _ in range(self.concurrency)))
+        logger.info(f"Crawl finished, intent changes: {dict(self.changes)}")
+
+    @asynccontextmanager
+    async def pipeline(self):
+        """Run the parse and write stages, and one HTTP session, around a block of fetches.
+
+        process_domain() only works inside this block. Fetched documents are
+        parsed and validated, then written CRAWLER_WRITE_BATCH_SIZE services
+        per transaction by a single writer running in a worker thread, so the
+        event loop never waits on the database. The bounded queues between
+        the stages apply backpressure to the fetchers when writing falls
+        behind. Large documents are validated in a process pool so parsing
+        scales across cores. Leaving the block drains the queues.
+        """
+        async with self.db_lock:
+            self._crawl_state = await asyncio.to_thread(self._load_crawl_state)
+        processes = settings.CRAWLER_VALIDATION_PROCESSES
+        if processes is None:
+            processes = os.cpu_count() or 1
+        if processes > 0:
+            # Forked children would inherit locks held by the writer and other threads
+            self._validation_pool = ProcessPoolExecutor(max_workers=processes, mp_context=_POOL_CONTEXT)
+        self._parse_queue = asyncio.Queue(maxsize=settings.CRAWLER_QUEUE_SIZE)
+        self._write_queue = asyncio.Queue(maxsize=settings.CRAWLER_QUEUE_SIZE)
+        parsers = [asyncio.create_task(self._parser()) for _ in range(settings.CRAWLER_PARSE_WORKERS)]
+        writer = asyncio.create_task(self._writer())
+        try:
+            async with client_session(self.concurrency) as session:
+                self.session = session
+                try:
+                    yield
+                finally:
+                    self.session = None
+            for _ in parsers:
+                await self._parse_queue.put(None)
+            await asyncio.gather(*parsers)
+            await self._write_queue.put(None)
+            await writer
+        finally:
+            for task in (*parsers, writer):
+                task.cancel()
+            self._parse_queue = self._write_queue = None
+            self._crawl_state = {}
+            if self._validation_pool is not None:
+                self._validation_pool.shutdown(cancel_futures=True)
+                self._validation_pool = None
 
-    async def process_domain(self, domain: str):
+    async def _worker(self, domains):
+        for domain in domains:
+            try:
+                await self.process_domain(domain)
+            except Exception as e:
+                logger.error(f"Error crawling {domain}: {e}")
+
+    def _load_crawl_state(self) -> Dict[str, Validators]:
+        """Cache validators of every crawled service, keyed by agents.json URL."""
+        rows = self.db_session.execute(
+            select(Service.agents_json_url, Service.etag, Service.last_modified, Service.content_hash)
+            .where(Service.agents_json_url.is_not(None))
+        )
+        state = {row.agents_json_url: Validators(row.etag, row.last_modified, row.content_hash) for row in rows}
+        # Release the read transaction before the writer thread takes the session over
+        self.db_session.commit()
+        return state
+
+    async def process_domain(self, domain: str) -> Optional[bool]:
+        """Fetch one domain inside pipeline(); returns whether its document changed, or None if the fetch failed.
+
+        A changed document is handed to the parse stage and written later.
+        """
+        started = time.monotonic()
         agents_json_url = await get_agents_json_url_from_dns(domain)
         if not agents_json_url:
             agents_json_url = f"https://{domain}/agents.json"
 
-        agents_json_data = await self.fetch_agents_json(agents_json_url)
-        if agents_json_data:
-            self.process_agents_json(agents_json_data)
+        service = self._crawl_state.get(agents_json_url)
+        result = await self.fetch(agents_json_url, service)
+        self.stats.record(time.monotonic() - started, result)
+        if result is not None and (result.changed or _validators_rotated(service, result)):
+            await self._parse_queue.put((domain, agents_json_url, result))
+        elif self.on_crawled is not None:
+            # Nothing to write, but the outcome is still recorded
+            await self._write_queue.put((domain, agents_json_url, result, None))
+        return None if result is None else result.changed
+
+    async def _parser(self):
+        """Decode and validate fetched documents and queue them for writing."""
+        while (item := await self._parse_queue.get()) is not None:
+            domain, url, result = item
+            document = None
+            if result.changed:
+                try:
+                    document = await self.validate(result)
+                except Exception as e:
+                    logger.error(f"Invalid agents.json at {url}: {e}")
+                    self.stats.invalid += 1
+                    if self.on_crawled is None:
+                        continue
+                    # Recorded as a failed crawl
+                    result = None
+            await self._write_queue.put((domain, url, result, document))
+
+    async def validate(self, result: FetchResult) -> AgentsJson:
+        """Validate a fetched document, in the process pool when it is large."""
+        if result.data is not None:
+            return AgentsJson.model_validate(result.data)
+        if self._validation_pool is not None and len(result.body) >= settings.CRAWLER_OFFLOAD_BYTES:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._validation_pool, parse_agents_json, result.body)
+        return parse_agents_json(result.body)
+
+    async def _writer(self):
+        """Write queued documents in batches, one transaction per batch, off the event loop."""
+        done = False
+        while not done:
+            item = await self._write_queue.get()
+            if item is None:
+                break
+            batch = [item]
+            while len(batch) < settings.CRAWLER_WRITE_BATCH_SIZE and not self._write_queue.empty():
+                item = self._write_queue.get_nowait()
+                if item is None:
+                    done = True
+                    break
+                batch.append(item)
+            async with self.db_lock:
+                await asyncio.to_thread(self.write_batch, batch)
+
+    def write_batch(
+        self, batch: List[Tuple[str, str, Optional[FetchResult], Optional[AgentsJson]]]
+    ) -> Dict[str, int]:
+        """Apply validated documents in one transaction; a failing document only skips itself.
+
+        Items are (domain, url, fetched, document): a document to store, or
+        just the fetch result when the body did not change; fetched is None
+        for a failed crawl, which has nothing to write.
+        """
+        counts, written = Counter(), {}
+        try:
+            for domain, url, fetched, document in batch:
+                changed = None
+                try:
+                    with self.db_session.begin_nested():
+                        if document is not None:
+                            counts.update(self._apply_document(document, url, fetched))
+                            written[url] = Validators(fetched.etag, fetched.last_modified, fetched.content_hash)
+                            changed = True
+                        elif fetched is not None:
+                            if _validators_rotated(self._crawl_state.get(url), fetched):
+                                self.update_validators(url, fetched)
+                                written[url] = Validators(fetched.etag, fetched.last_modified, fetched.content_hash)
+                            changed = False
+                except Exception as e:
+                    logger.error(f"Error saving agents.json from {url}: {e}")
+                if self.on_crawled is not None:
+                    try:
+                        with self.db_session.begin_nested():
+                            self.on_crawled(domain, changed)
+                    except Exception as e:
+                        logger.error(f"Error recording the crawl of {domain}: {e}")
+            self.db_session.commit()
+        except Exception as e:
+            logger.error(f"Error committing crawl batch: {e}")
+            self.db_session.rollback()
+            return {}
+        # Later fetches in the same pipeline are conditional on what was just stored
+        if self._parse_queue is not None:
+            self._crawl_state.update(written)
+        self.changes.update(counts)
+        return dict(counts)
 
     async def fetch_agents_json(self, url: str) -> Dict[str, Any]:
+        result = await self.fetch(url)
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url) as response:
-                    if response.status == 200:
-                        return await response.json()
-                    else:
-                        logger.error(f"Failed to fetch {url}, status code: {response.status}")
-                        return None
+            return result.document() if result else None
+        except ValueError as e:
+            logger.error(f"Invalid agents.json at {url}: {e}")
+            return None
+
+    async def fetch(self, url: str, service: Optional[Validators] = None) -> Optional[FetchResult]:
+        """Fetch an agents.json document, conditionally on the service's last crawl."""
+        if self.session is None:
+            # Called outside start(): use a short-lived session
+            async with client_session(1) as session:
+                return await self._fetch(session, url, service)
+        return await self._fetch(self.session, url, service)
+
+    async def _fetch(
+        self, session: aiohttp.ClientSession, url: str, service: Optional[Validators]
+    ) -> Optional[FetchResult]:
+        """Fetch politely: paced per host, retried on transient errors, skipped while the host is parked.
+
+        Only a 200 or 304 response counts as a success for the circuit
+        breaker; transient errors that outlast the retries and permanent
+        failures, such as a 404 or an unresolvable host, count as failures.
+        """
+        headers = {}
+        if service is not None:
+            if service.etag:
+                headers["If-None-Match"] = service.etag
+            if service.last_modified:
+                headers["If-Modified-Since"] = service.last_modified
+        host = urlparse(url).hostname or url
+        if not self.breaker.allow(host):
+            logger.debug(f"Skipping {url}, circuit open for {host}")
+            return None
+        for attempt in range(settings.CRAWLER_RETRIES + 1):
+            await self.rate_limiter.wait(host)
+            try:
+                result = await self._request(session, url, headers, service)
+            except TransientFetchError as e:
+                if attempt == settings.CRAWLER_RETRIES:
+                    logger.error(f"Error fetching {url} after {attempt + 1} attempts: {e}")
+                    break
+                await asyncio.sleep(backoff_delay(attempt, e.retry_after))
+                continue
+            if result is None:
+                break
+            self.breaker.success(host)
+            return result
+        self.breaker.failure(host)
+        return None
+
+    async def _request(
+        self, session: aiohttp.ClientSession, url: str, headers: Dict[str, str], service: Optional[Validators]
+    ) -> Optional[FetchResult]:
+        """Send one GET; transient failures raise TransientFetchError, permanent ones return None."""
+        try:
+            async with session.get(url, headers=headers) as response:
+                if response.status == 304:
+                    return FetchResult(status=304)
+                if response.status in _TRANSIENT_STATUSES:
+                    raise TransientFetchError(
+                        f"status code {response.status}", _retry_after(response.headers.get("Retry-After"))
+                    )
+                if response.status != 200:
+                    logger.error(f"Failed to fetch {url}, status code: {response.status}")
+                    return None
+                body, content_hash = await read_capped(response, settings.CRAWLER_MAX_BODY_BYTES)
+                result = FetchResult(
+                    status=200,
+                    etag=response.headers.get("ETag"),
+                    last_modified=response.headers.get("Last-Modified"),
+                    content_hash=content_hash,
+                    size=len(body)
+                )
+                if service is None or result.content_hash != service.content_hash:
+                    result.body = body
+                return result
+        except TransientFetchError:
+            raise
+        except (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError) as e:
+            if _unreachable(e):
+                logger.error(f"Cannot connect to {url}: {e}")
+                return None
+            raise TransientFetchError(str(e) or type(e).__name__)
         except Exception as e:
             logger.error(f"Error fetching {url}: {e}")
             return None
 
-    def process_agents_json(self, agents_json_data: Dict[str, Any]):
-        """Process the agents.json data."""
+    def update_validators(self, url: str, result: FetchResult):
+        """Store the rotated cache validators of an unchanged document (not committed)."""
+        self.db_session.execute(
+            update(Service).where(Service.agents_json_url == url).values(
+                etag=result.etag, last_modified=result.last_modified
+            )
+        )
+
+    def process_agents_json(
+        self, agents_json_data: Dict[str, Any], url: Optional[str] = None, fetched: Optional[FetchResult] = None
+    ) -> Optional[Dict[str, int]]:
+        """Process the agents.json data, recording the crawl state when it was fetched from url.
+
+        The service and its intents are reconciled with the document in a
+        single transaction; returns the per-row change counts.
+        """
         try:
-            service_info = agents_json_data['service_info']
-            service_data = ServiceCreate(**service_info)
-            service = get_service_by_name(self.db_session, service_info['name'])
-            if not service:
-                service = create_service(self.db_session, service_data)
-            for intent_data in agents_json_data['intents']:
-                create_intent(self.db_session, IntentCreate(**intent_data), service.id)
+            counts = self._apply_document(AgentsJson.model_validate(agents_json_data), url, fetched)
             self.db_session.commit()
         except Exception as e:
             logger.error(f"Error saving agents.json data: {e}")
             self.db_session.rollback()
+            return None
+        self.changes.update(counts)
+        return counts
 
-async def get_agents_json_url_from_dns(domain: str) -> str:
-    """Fetch the agents.json URL from DNS TXT records."""
-    try:
-        resolver = dns.asyncresolver.Resolver()
-        answers = await resolver.resolve(domain, 'TXT')
-        for rdata in answers:
-            for txt_string in rdata.strings:
-                if txt_string.startswith(b"agents_json_url="):
-                    return txt_string.decode().split("=", 1)[1]
-        return None
-    except Exception as e:
-        logger.error(f"Error fetching DNS TXT records for {domain}: {e}")
-        return None
+    def _apply_document(
+        self, document: AgentsJson, url: Optional[str], fetched: Optional[FetchResult]
+    ) -> Dict[str, int]:
+        service_data = document.service_info
+        service = get_service_by_name(self.db_session, service_data.name)
+        if not service:
+            service = Service(name=service_data.name)
+            self.db_session.add(service)
+        for key, value in service_data.model_dump().items():
+            if getattr(service, key) != value:
+                setattr(service, key, value)
+        if url is not None:
+            service.agents_json_url = url
+        if fetched is not None:
+            service.etag = fetched.etag
+            service.last_modified = fetched.last_modified
+            service.content_hash = fetched.content_hash
+        self.db_session.flush()
+        return reconcile_service_intents(self.db_session, service, document.intents)
+
+def _validators_rotated(service, result: FetchResult) -> bool:
+    # A 200 with an unchanged body may still carry new validators worth keeping
+    return (
+        service is not None and result.status == 200
+        and (service.etag, service.last_modified) != (result.etag, result.last_modified)
+    )
 
-async def start_crawler(domains: List[str], db_session: Session):
+async def start_crawler(domains: Iterable[str], db_session: Session):
     """Start the crawler for a list of domains."""
     crawler = Crawler(domains=domains, db_session=db_session)
-    await crawler.start()
\ No newline at end of file
+    await crawler.start()
@@ -1,20 +1,129 @@
 # app/services/dns_utils.py
 
-import dns.resolver
-from functools import lru_cache
+import asyncio
 import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+import dns.asyncresolver
+import dns.exception
+import dns.resolver
+from app.config import settings
 
 logger = logging.getLogger(__name__)
 
-@lru_cache(maxsize=1024)
-def get_agents_json_url_from_dns(domain):
-    """Retrieve agents.json URL from DNS TXT records."""
-    try:
-        answers = dns.resolver.resolve(domain, 'TXT')
-        for rdata in answers:
-            txt_record = rdata.to_text().strip('"')
-            if 'uim-agents-file=' in txt_record:
-                return txt_record.split('=')[1]
-    except Exception as e:
-        logger.error(f"DNS lookup failed for {domain}: {e}")
-    return None
\ No newline at end of file
+# TXT record keys announcing the agents.json URL; the first is the one from the spec
+AGENTS_FILE_KEYS = (b"uim-agents-file=", b"agents_json_url=")
+
+def agents_json_url_from_txt(answers) -> Optional[str]:
+    """Return the agents.json URL announced by a TXT answer, if any."""
+    for rdata in answers:
+        # Long TXT values are split into several strings
+        txt = b"".join(rdata.strings).strip()
+        for key in AGENTS_FILE_KEYS:
+            if txt.startswith(key):
+                return txt[len(key):].decode()
+    return None
+
+class _LeaderCancelled(Exception):
+    """The lookup that coalesced waiters were sharing was cancelled."""
+
+class DnsCache:
+    """Async TXT lookups of agents.json URLs with TTL-based caching.
+
+    Answers are kept for their record TTL (capped by DNS_MAX_TTL), NXDOMAIN
+    and empty answers for DNS_NEGATIVE_TTL, timeouts and other failures for
+    DNS_ERROR_TTL. Concurrent lookups of one name share a single query and
+    at most DNS_MAX_IN_FLIGHT queries run at once.
+    """
+
+    def __init__(self, resolver=None, max_entries: int = None):
+        self._resolver = resolver
+        self.max_entries = max_entries or settings.DNS_CACHE_MAX_ENTRIES
+        self._entries: "OrderedDict[str, Tuple[float, Optional[str]]]" = OrderedDict()
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._semaphore_loop = None
+        self.hits = self.misses = self.coalesced = 0
+
+    async def lookup(self, domain: str) -> Optional[str]:
+        domain = domain.lower().rstrip(".")
+        while True:
+            entry = self._entries.get(domain)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._entries.move_to_end(domain)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[domain]
+            pending = self._pending.get(domain)
+            if pending is None:
+                return await self._lead(domain)
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(pending)
+            except _LeaderCancelled:
+                # The query was abandoned by its caller; one of the waiters takes it over
+                continue
+
+    async def _lead(self, domain: str) -> Optional[str]:
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._pending[domain] = future
+        try:
+            url, ttl = await self._query(domain)
+            self._store(domain, url, ttl)
+            future.set_result(url)
+        except BaseException:
+            # Only cancellation gets here; _query turns DNS errors into cached misses.
+            # Waiters were not cancelled themselves, so they retry instead
+            future.set_exception(_LeaderCancelled())
+            future.exception()  # retrieved, so an unawaited future logs nothing
+            raise
+        finally:
+            del self._pending[domain]
+        return url
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = self.misses = self.coalesced = 0
+
+    async def _query(self, domain: str) -> Tuple[Optional[str], float]:
+        async with self._limit():
+            try:
+                if self._resolver is None:
+                    self._resolver = dns.asyncresolver.Resolver()
+                    self._resolver.lifetime = settings.DNS_TIMEOUT
+                answers = await self._resolver.resolve(domain, "TXT")
+            except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer):
+                return None, settings.DNS_NEGATIVE_TTL
+            except (dns.exception.Timeout, dns.resolver.NoNameservers) as e:
+                logger.warning(f"DNS TXT lookup failed for {domain}: {e}")
+                return None, settings.DNS_ERROR_TTL
+            except Exception as e:
+                logger.error(f"Error fetching DNS TXT records for {domain}: {e}")
+                return None, settings.DNS_ERROR_TTL
+        ttl = answers.rrset.ttl if answers.rrset is not None else settings.DNS_NEGATIVE_TTL
+        return agents_json_url_from_txt(answers), min(ttl, settings.DNS_MAX_TTL)
+
+    def _store(self, domain: str, url: Optional[str], ttl: float):
+        if ttl <= 0:
+            return
+        self._entries[domain] = (time.monotonic() + ttl, url)
+        self._entries.move_to_end(domain)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _limit(self) -> asyncio.Semaphore:
+        # Semaphores belong to one event loop; tests and scripts may run several
+        loop = asyncio.get_running_loop()
+        if self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(settings.DNS_MAX_IN_FLIGHT)
+            self._semaphore_loop = loop
+        return self._semaphore
+
+dns_cache = DnsCache()
+
+async def get_agents_json_url_from_dns(domain: str) -> Optional[str]:
+    """Retrieve the agents.json URL from DNS TXT records, through the shared cache."""
+    return await dns_cache.lookup(domain)
@@ -0,0 +1,82 @@
+# app/services/hosts.py
+
+# Per-host politeness for the crawler: request pacing, retry backoff and circuit breaking
+
+import asyncio
+import random
+import time
+from typing import Dict, Optional, Tuple
+from app.config import settings
+
+# Hosts tracked before idle entries are pruned
+_MAX_TRACKED_HOSTS = 100000
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """Exponential backoff with full jitter, or the server's Retry-After when it gave one."""
+    if retry_after is not None:
+        return min(retry_after, settings.CRAWLER_BACKOFF_MAX)
+    return random.uniform(0, min(settings.CRAWLER_BACKOFF_MAX, settings.CRAWLER_BACKOFF_BASE * 2 ** attempt))
+
+class HostRateLimiter:
+    """Space requests to one host at least 1 / rate seconds apart."""
+
+    def __init__(self, rate: float = None):
+        self.rate = settings.CRAWLER_HOST_RATE if rate is None else rate
+        self._next_slot: Dict[str, float] = {}
+
+    async def wait(self, host: str):
+        if self.rate <= 0:
+            return
+        now = time.monotonic()
+        slot = max(now, self._next_slot.get(host, now))
+        self._next_slot[host] = slot + 1 / self.rate
+        if len(self._next_slot) > _MAX_TRACKED_HOSTS:
+            self._next_slot = {key: value for key, value in self._next_slot.items() if value > now}
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+class CircuitBreaker:
+    """Park hosts after repeated failures.
+
+    After `threshold` consecutive failures a host is open (skipped) for
+    `cooldown` seconds, then half-open: one request is let through, and
+    its failure reopens the circuit for twice as long while a success
+    closes it.
+    """
+
+    def __init__(self, threshold: int = None, cooldown: float = None):
+        self.threshold = threshold or settings.CRAWLER_BREAKER_THRESHOLD
+        self.cooldown = cooldown or settings.CRAWLER_BREAKER_COOLDOWN
+        # host -> (consecutive failures, open until, current cooldown)
+        self._hosts: Dict[str, Tuple[int, float, float]] = {}
+        self._trials = set()
+
+    def allow(self, host: str) -> bool:
+        state = self._hosts.get(host)
+        if state is None or state[0] < self.threshold:
+            return True
+        if time.monotonic() < state[1] or host in self._trials:
+            return False
+        self._trials.add(host)
+        return True
+
+    def success(self, host: str):
+        self._hosts.pop(host, None)
+        self._trials.discard(host)
+
+    def failure(self, host: str):
+        failures, _, cooldown = self._hosts.get(host, (0, 0.0, self.cooldown / 2))
+        failures += 1
+        if failures >= self.threshold:
+            cooldown = min(cooldown * 2, settings.CRAWL_MAX_INTERVAL)
+            self._hosts[host] = (failures, time.monotonic() + cooldown, cooldown)
+        else:
+            self._hosts[host] = (failures, 0.0, cooldown)
+        self._trials.discard(host)
+        if len(self._hosts) > _MAX_TRACKED_HOSTS:
+            now = time.monotonic()
+            self._hosts = {key: value for key, value in self._hosts.items() if value[1] > now}
+
+    def is_open(self, host: str) -> bool:
+        state = self._hosts.get(host)
+        return state is not None and state[0] >= self.threshold and time.monotonic() < state[1]
@@ -0,0 +1,123 @@
+# app/services/hybrid.py
+
+import asyncio
+import logging
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.crud import aio
+from app.crud.intent import get_ranked_intents_by_filters
+from app.models.intent import Intent
+from app.search.indexing import fetch_ranked_intents
+from app.search.vectors import rank_semantic_query
+from app.services.nlp import rank_natural_language_query
+from app.utils.pagination import Cursor, is_after_cursor
+
+logger = logging.getLogger(__name__)
+
+class HybridResult(NamedTuple):
+    """A fused page, the milliseconds spent per stage and the stages cut off by the budget."""
+    ranked: List[Tuple[Intent, float]]
+    timings: Dict[str, float]
+    timed_out: List[str]
+
+def reciprocal_rank_fusion(rankings: Iterable[Sequence[int]], k: int = 60) -> List[Tuple[int, float]]:
+    """Fuse ranked id lists: each id scores the sum of 1 / (k + rank) over the lists it appears in.
+
+    Returns (id, score) pairs ordered by descending score, then id.
+    """
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, item_id in enumerate(ranking, start=1):
+            scores[item_id] = scores.get(item_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+
+def server_timing(timings: Dict[str, float], timed_out: Sequence[str] = ()) -> str:
+    """Format stage durations in milliseconds as a Server-Timing header value."""
+    return ", ".join(
+        f'{name};dur={duration:.1f}' + (';desc="timeout"' if name in timed_out else "")
+        for name, duration in timings.items()
+    )
+
+def _ids_only(rank, **kwargs):
+    # Retrievers run on sessions of their own; only ids cross back
+    def retrieve(db: Session) -> List[int]:
+        return [intent.id for intent, _ in rank(db, **kwargs)]
+    return retrieve
+
+async def hybrid_search(
+    db,
+    query: Optional[str] = None,
+    intent_name: Optional[str] = None,
+    description: Optional[str] = None,
+    tags: Optional[List[str]] = None,
+    tag_match: str = "any",
+    skip: int = 0,
+    limit: int = 10,
+    cursor: Cursor = None,
+    budget_ms: Optional[float] = None
+) -> HybridResult:
+    """Run lexical filters, full-text and vector retrieval concurrently and fuse them with RRF.
+
+    Retrievers still running when the time budget is spent are cancelled
+    and left out of the fusion; their running statement is interrupted, so
+    they give back their connection and worker thread without finishing.
+
+    Each retriever contributes its top HYBRID_CANDIDATES (or skip + limit)
+    ids, so paging through the fused results ends after at most that many
+    per retriever.
+    """
+    started = time.perf_counter()
+    budget = (settings.HYBRID_TIME_BUDGET_MS if budget_ms is None else budget_ms) / 1000
+    candidates = max(settings.HYBRID_CANDIDATES, skip + limit)
+    retrievers = {}
+    if intent_name or description or tags:
+        retrievers["filters"] = _ids_only(
+            get_ranked_intents_by_filters, intent_name=intent_name, description=description,
+            tags=tags, tag_match=tag_match, limit=candidates
+        )
+    if query:
+        retrievers["fulltext"] = _ids_only(rank_natural_language_query, query=query, limit=candidates)
+        retrievers["vector"] = _ids_only(rank_semantic_query, query=query, limit=candidates)
+
+    async def timed(retrieve):
+        stage_started = time.perf_counter()
+        ids = await aio.run_isolated(db, retrieve)
+        return ids, 1000 * (time.perf_counter() - stage_started)
+
+    tasks = {name: asyncio.ensure_future(timed(retrieve)) for name, retrieve in retrievers.items()}
+    if tasks:
+        await asyncio.wait(tasks.values(), timeout=budget)
+    timings: Dict[str, float] = {}
+    timed_out = []
+    rankings = []
+    for name, task in tasks.items():
+        if not task.done():
+            timed_out.append(name)
+            timings[name] = 1000 * budget
+            task.cancel()
+            task.add_done_callback(_discard_result)
+        elif task.exception() is not None:
+            logger.error(f"Hybrid retriever {name} failed: {task.exception()}")
+        else:
+            ids, timings[name] = task.result()
+            rankings.append(ids)
+
+    fusion_started = time.perf_counter()
+    fused = [
+        (intent_id, score)
+        for intent_id, score in reciprocal_rank_fusion(rankings, settings.HYBRID_RRF_K)
+        if is_after_cursor(score, intent_id, cursor)
+    ][skip:skip + limit]
+    timings["fusion"] = 1000 * (time.perf_counter() - fusion_started)
+
+    fetch_started = time.perf_counter()
+    ranked = await aio.run_isolated(db, fetch_ranked_intents, fused) if fused else []
+    timings["fetch"] = 1000 * (time.perf_counter() - fetch_started)
+    timings["total"] = 1000 * (time.perf_counter() - started)
+    return HybridResult(ranked, timings, timed_out)
+
+def _discard_result(task: asyncio.Future):
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning(f"Hybrid retriever failed after the time budget: {task.exception()}")
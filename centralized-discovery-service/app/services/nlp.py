@@ -1,21 +1,231 @@
 # app/services/nlp.py
 
+import json
 import logging
-from typing import List
-from app.models.intent import Intent
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+import re
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from app.config import settings
+from app.models.intent import Intent, intents_fts
+from app.utils.concurrency import offload
+from app.utils.pagination import Cursor, keyset_condition
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import REAL, Float, func, literal_column
 
 logger = logging.getLogger(__name__)
 
-def process_natural_language_query(db: Session, query: str, skip: int = 0, limit: int = 10) -> List[Intent]:
-    """Process a natural language query to search for intents."""
-    try:
-        # Using PostgreSQL full-text search
-        intents = db.query(Intent).filter(
-            func.to_tsvector('english', Intent.description).match(query)
-        ).offset(skip).limit(limit).all()
-        return intents
-    except Exception as e:
-        logger.error(f"Error processing natural language query: {e}")
-        return []
\ No newline at end of file
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+# Used when no spaCy model is available
+_STOP_WORDS = frozenset(
+    "a an and are as at be by can do for from how i in is it me my of on or please "
+    "that the this to want what which with".split()
+)
+
+# Only the components needed for lemmas (and entities) are loaded
+_EXCLUDED_COMPONENTS = ["parser", "senter", "textcat"]
+
+class ProcessedQuery(NamedTuple):
+    """Normalized form of a query: groups of alternative terms, all required, and named entities."""
+    terms: Tuple[Tuple[str, ...], ...]
+    entities: Tuple[Tuple[str, str], ...] = ()
+
+    @property
+    def text(self) -> str:
+        return " ".join(group[0] for group in self.terms)
+
+    @property
+    def match_groups(self) -> Tuple[Tuple[str, ...], ...]:
+        """Terms to match, plus each multi-word entity as a phrase so its words must be adjacent."""
+        phrases = dict.fromkeys(
+            " ".join(words) for words in (_WORD_RE.findall(text.lower()) for text, _ in self.entities)
+            if len(words) > 1
+        )
+        return self.terms + tuple((phrase,) for phrase in phrases)
+
+class QueryPreprocessor:
+    """Lemmatize queries, drop stop words, extract entities and expand synonyms.
+
+    The spaCy model NLP_MODEL is loaded on first use, or ahead of time by
+    warmup() in a background thread, with unused components excluded.
+    Without spaCy or the model, queries are only lowercased and stripped of
+    common stop words. Recent queries are kept in an LRU of NLP_CACHE_SIZE
+    entries, keyed by their whitespace-normalized text.
+    """
+
+    def __init__(self, model: Optional[str] = None, cache_size: Optional[int] = None):
+        self.model = settings.NLP_MODEL if model is None else model
+        self._nlp = None
+        self._synonyms: Dict[str, Tuple[str, ...]] = {}
+        self._loaded = False
+        self._load_lock = threading.Lock()
+        self.backend = None
+        self.load_seconds = None
+        self.processed = 0
+        self.process_seconds = 0.0
+        self.max_process_seconds = 0.0
+        self._cached = lru_cache(maxsize=settings.NLP_CACHE_SIZE if cache_size is None else cache_size)(
+            self._process
+        )
+
+    def process(self, query: str) -> ProcessedQuery:
+        # Case is kept: it helps entity recognition
+        return self._cached(" ".join(query.split()))
+
+    def warmup(self) -> Optional[threading.Thread]:
+        """Load the pipeline in a background thread, unless it is loaded already."""
+        if self._loaded:
+            return None
+        thread = threading.Thread(target=self.load, name="nlp-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def load(self):
+        if self._loaded:
+            return
+        with self._load_lock:
+            if self._loaded:
+                return
+            started = time.perf_counter()
+            self._nlp = self._load_model()
+            self._synonyms = self._load_synonyms()
+            self.backend = f"spacy:{self.model}" if self._nlp is not None else "fallback"
+            self.load_seconds = time.perf_counter() - started
+            self._loaded = True
+            logger.info(f"Query preprocessing ready ({self.backend}) in {self.load_seconds:.3f}s")
+
+    def stats(self) -> dict:
+        cache = self._cached.cache_info()
+        return {
+            "backend": self.backend,
+            "load_seconds": self.load_seconds,
+            "processed": self.processed,
+            "average_ms": 1000 * self.process_seconds / self.processed if self.processed else 0.0,
+            "max_ms": 1000 * self.max_process_seconds,
+            "cache_hits": cache.hits,
+            "cache_misses": cache.misses,
+            "cache_entries": cache.currsize
+        }
+
+    def clear(self):
+        self._cached.cache_clear()
+        self.processed = 0
+        self.process_seconds = self.max_process_seconds = 0.0
+
+    def _process(self, query: str) -> ProcessedQuery:
+        self.load()
+        started = time.perf_counter()
+        if self._nlp is not None:
+            doc = self._nlp(query)
+            words = [
+                (_word_or(token.lemma_.lower(), token.lower_), token.lower_, token.is_stop)
+                for token in doc if _WORD_RE.fullmatch(token.text)
+            ]
+            entities = tuple((ent.text, ent.label_) for ent in doc.ents)
+        else:
+            words = [(word, word, word in _STOP_WORDS) for word in _WORD_RE.findall(query.lower())]
+            entities = ()
+        # A query made only of stop words is kept as it is
+        kept = [word for word in words if not word[2]] or words
+        terms = []
+        for lemma, word in dict.fromkeys((lemma, word) for lemma, word, _ in kept):
+            group = dict.fromkeys([lemma, word, *self._synonyms.get(lemma, ()), *self._synonyms.get(word, ())])
+            terms.append(tuple(group))
+        elapsed = time.perf_counter() - started
+        self.processed += 1
+        self.process_seconds += elapsed
+        self.max_process_seconds = max(self.max_process_seconds, elapsed)
+        return ProcessedQuery(tuple(terms), entities)
+
+    def _load_model(self):
+        if not self.model:
+            return None
+        try:
+            import spacy
+            return spacy.load(self.model, exclude=_EXCLUDED_COMPONENTS)
+        except Exception as e:
+            logger.warning(f"Cannot load spaCy model {self.model}, using plain tokenization: {e}")
+            return None
+
+    def _load_synonyms(self) -> Dict[str, Tuple[str, ...]]:
+        if not settings.NLP_SYNONYMS_FILE:
+            return {}
+        try:
+            with open(settings.NLP_SYNONYMS_FILE, encoding="utf-8") as f:
+                mapping = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Cannot read synonyms from {settings.NLP_SYNONYMS_FILE}: {e}")
+            return {}
+        # Multi-word synonyms become phrases; anything but words is dropped
+        return {
+            term.lower(): tuple(
+                phrase for phrase in (" ".join(_WORD_RE.findall(synonym.lower())) for synonym in synonyms) if phrase
+            )
+            for term, synonyms in mapping.items()
+        }
+
+def _word_or(lemma: str, word: str) -> str:
+    return lemma if _WORD_RE.fullmatch(lemma) else word
+
+query_preprocessor = QueryPreprocessor()
+
+def process_natural_language_query(
+    db: Session, query: str, skip: int = 0, limit: int = 10, cursor: Cursor = None
+) -> List[Intent]:
+    """Process a natural language query to search for intents, best matches first."""
+    return [intent for intent, _ in rank_natural_language_query(db, query, skip, limit, cursor)]
+
+def rank_natural_language_query(
+    db: Session, query: str, skip: int = 0, limit: int = 10, cursor: Cursor = None
+) -> List[Tuple[Intent, float]]:
+    """Return (intent, rank) pairs for a natural language query, after an optional keyset cursor."""
+    if db.get_bind().dialect.name == "postgresql":
+        return _search_tsvector(db, query, skip, limit, cursor)
+    return _search_fts5(db, query, skip, limit, cursor)
+
+def _search_tsvector(db: Session, query: str, skip: int, limit: int, cursor: Cursor):
+    """Match the GIN-indexed search_vector column and order by ts_rank_cd."""
+    processed = offload(query_preprocessor.process, query)
+    if not processed.terms:
+        return []
+    # Terms hold only word characters, so they are safe in to_tsquery syntax
+    expression = " & ".join(
+        "(" + " | ".join(" <-> ".join(alternative.split()) for alternative in group) + ")"
+        for group in processed.match_groups
+    )
+    tsquery = func.to_tsquery('english', expression)
+    rank = func.ts_rank_cd(Intent.search_vector, tsquery, type_=REAL)
+    return _ranked_page(
+        db.query(Intent, rank).options(
+            selectinload(Intent.tags)
+        ).filter(Intent.search_vector.op('@@')(tsquery)),
+        rank, skip, limit, cursor
+    )
+
+def _search_fts5(db: Session, query: str, skip: int, limit: int, cursor: Cursor):
+    """Match the intents_fts virtual table and order by bm25, negated so higher is better."""
+    processed = offload(query_preprocessor.process, query)
+    if not processed.terms:
+        return []
+    # Quote every term so user input cannot inject FTS5 query syntax
+    match = " AND ".join(
+        "(" + " OR ".join(f'"{alternative}"' for alternative in group) + ")"
+        for group in processed.match_groups
+    )
+    fts = literal_column(intents_fts.name)
+    rank = -func.bm25(fts, type_=Float)
+    return _ranked_page(
+        db.query(Intent, rank).options(
+            selectinload(Intent.tags)
+        ).join(intents_fts, intents_fts.c.rowid == Intent.id).filter(fts.op('MATCH')(match)),
+        rank, skip, limit, cursor
+    )
+
+def _ranked_page(query, rank, skip: int, limit: int, cursor: Cursor):
+    """Apply keyset and offset pagination in (rank DESC, id ASC) order."""
+    if cursor:
+        query = query.filter(keyset_condition(rank, Intent.id, cursor))
+    rows = query.order_by(rank.desc(), Intent.id).offset(skip).limit(limit).all()
+    return [(intent, intent_rank) for intent, intent_rank in rows]
@@ -0,0 +1,282 @@
+# app/services/scheduler.py
+
+import asyncio
+import heapq
+import logging
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, List, Optional, Tuple
+from sqlalchemy import or_, select, update
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import dialect_insert
+from app.models import CrawlFrontier
+from app.services.crawler import Crawler
+
+logger = logging.getLogger(__name__)
+
+# Longest sleep of an idle worker before it looks at the queue again
+_IDLE_POLL_SECONDS = 60.0
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+def _aware(value: datetime) -> datetime:
+    # SQLite returns naive datetimes; they are stored in UTC
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+def next_interval(interval: float, changed: bool) -> float:
+    """Halve the recrawl interval after a change and stretch it after an unchanged crawl."""
+    if changed:
+        return max(settings.CRAWL_MIN_INTERVAL, interval / 2)
+    return min(settings.CRAWL_MAX_INTERVAL, interval * 1.5)
+
+def retry_delay(failures: int) -> float:
+    """Exponential backoff after consecutive failed crawls."""
+    return min(settings.CRAWL_MAX_INTERVAL, settings.CRAWL_MIN_INTERVAL * 2 ** min(failures - 1, 16))
+
+def claim_due_domains(
+    db: Session, owner: str, limit: int, lease_seconds: float, now: Optional[datetime] = None
+) -> List[Tuple[datetime, str]]:
+    """Lease up to limit due, unleased domains to owner; returns (next_due_at, domain) pairs.
+
+    On PostgreSQL, rows locked by a concurrent claim are skipped
+    (FOR UPDATE SKIP LOCKED), so workers never claim the same domain.
+    Expired leases count as free, so a crashed worker's domains come back.
+    """
+    now = now or utcnow()
+    rows = db.execute(
+        select(CrawlFrontier.id, CrawlFrontier.domain, CrawlFrontier.next_due_at)
+        .where(
+            CrawlFrontier.next_due_at <= now,
+            or_(CrawlFrontier.lease_expires_at.is_(None), CrawlFrontier.lease_expires_at <= now)
+        )
+        .order_by(CrawlFrontier.next_due_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    ).all()
+    if rows:
+        db.execute(
+            update(CrawlFrontier).where(CrawlFrontier.id.in_([row.id for row in rows])).values(
+                lease_owner=owner, lease_expires_at=now + timedelta(seconds=lease_seconds)
+            )
+        )
+    db.commit()
+    return [(_aware(row.next_due_at), row.domain) for row in rows]
+
+def renew_leases(db: Session, owner: str, lease_seconds: float, now: Optional[datetime] = None) -> int:
+    """Extend every lease owner still holds; returns how many were renewed.
+
+    Leases are released when a crawl is recorded, so the ones left are
+    domains claimed and not crawled yet.
+    """
+    now = now or utcnow()
+    renewed = db.execute(
+        update(CrawlFrontier)
+        .where(CrawlFrontier.lease_owner == owner, CrawlFrontier.lease_expires_at > now)
+        .values(lease_expires_at=now + timedelta(seconds=lease_seconds))
+    ).rowcount
+    db.commit()
+    return renewed
+
+class CrawlScheduler:
+    """Long-running crawler driven by the persistent crawl frontier.
+
+    Due domains are popped from an in-memory priority queue ordered by
+    next_due_at. After every crawl the frontier row is updated and the
+    domain is queued again, so a restarted scheduler resumes where the
+    previous one stopped.
+
+    With an owner, several schedulers share one frontier: each claims
+    batches of due domains under an expiring lease (see claim_due_domains)
+    instead of loading the whole table. Leases are renewed while the batch
+    is being crawled, and an outcome is only recorded while the lease is
+    still held.
+
+    Domains go through the crawler's fetch -> parse -> write pipeline; the
+    writer records each outcome in the frontier in the same transaction as
+    the document, so the event loop never waits on the database.
+    """
+
+    def __init__(self, db_session: Session, concurrency: Optional[int] = None, owner: Optional[str] = None):
+        self.db_session = db_session
+        self.owner = owner
+        self.crawler = Crawler(domains=(), db_session=db_session, concurrency=concurrency)
+        self.crawler.on_crawled = self.record
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: List[Tuple[datetime, str]] = []
+        # Monotonic time before which claiming again is pointless, after a claim found nothing due
+        self._next_claim_at = 0.0
+        self._wakeup = asyncio.Event()
+        self._stopped = asyncio.Event()
+
+    def add_domains(self, domains: Iterable[str]) -> int:
+        """Add domains to the frontier, due now; known domains keep their schedule."""
+        now = utcnow()
+        rows = [
+            {
+                "domain": domain,
+                "next_due_at": now,
+                "interval_seconds": settings.CRAWL_INITIAL_INTERVAL,
+                "crawl_count": 0,
+                "change_count": 0,
+                "failure_count": 0
+            }
+            for domain in dict.fromkeys(domains)
+        ]
+        if not rows:
+            return 0
+        stmt = dialect_insert(self.db_session, CrawlFrontier).on_conflict_do_nothing(
+            index_elements=["domain"]
+        ).returning(CrawlFrontier.domain)
+        added = list(self.db_session.scalars(stmt, rows))
+        self.db_session.commit()
+        if self.owner is None:
+            for domain in added:
+                heapq.heappush(self._queue, (now, domain))
+        self._next_claim_at = 0.0
+        self._wakeup.set()
+        return len(added)
+
+    def load(self):
+        """Fill the queue from the frontier table."""
+        self._queue = [
+            (_aware(due_at), domain)
+            for domain, due_at in self.db_session.execute(select(CrawlFrontier.domain, CrawlFrontier.next_due_at))
+        ]
+        heapq.heapify(self._queue)
+
+    async def run(self):
+        """Crawl due domains until stop() is called."""
+        self._stopped.clear()
+        self._loop = asyncio.get_running_loop()
+        if self.owner is None:
+            async with self.crawler.db_lock:
+                await asyncio.to_thread(self.load)
+        renewer = asyncio.create_task(self._renew()) if self.owner is not None else None
+        try:
+            async with self.crawler.pipeline():
+                await asyncio.gather(*(self._worker() for _ in range(self.crawler.concurrency)))
+        finally:
+            if renewer is not None:
+                renewer.cancel()
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+
+    async def _worker(self):
+        while True:
+            domain = await self._next_due()
+            if domain is None:
+                return
+            try:
+                await self.crawler.process_domain(domain)
+            except Exception as e:
+                logger.error(f"Error crawling {domain}: {e}")
+                # Nothing reached the writer, so record the failure here
+                async with self.crawler.db_lock:
+                    await asyncio.to_thread(self._record_failure, domain)
+
+    async def _next_due(self) -> Optional[str]:
+        while not self._stopped.is_set():
+            delay = _IDLE_POLL_SECONDS
+            if not self._queue and self.owner is not None and time.monotonic() >= self._next_claim_at:
+                await self._claim()
+            if self._queue:
+                due_at, domain = self._queue[0]
+                delay = (due_at - utcnow()).total_seconds()
+                if delay <= 0:
+                    heapq.heappop(self._queue)
+                    return domain
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=min(delay, _IDLE_POLL_SECONDS))
+            except asyncio.TimeoutError:
+                pass
+        return None
+
+    async def _claim(self):
+        async with self.crawler.db_lock:
+            # Another worker may have claimed a batch, or found none, while this one waited
+            if self._queue or time.monotonic() < self._next_claim_at:
+                return
+            claimed = await asyncio.to_thread(self._claim_batch)
+            if not claimed:
+                # The other idle workers wait for the next poll instead of claiming in turn
+                self._next_claim_at = time.monotonic() + _IDLE_POLL_SECONDS
+        heapq.heapify(claimed)
+        self._queue = claimed
+
+    def _claim_batch(self) -> List[Tuple[datetime, str]]:
+        try:
+            return claim_due_domains(
+                self.db_session, self.owner, settings.CRAWL_CLAIM_BATCH_SIZE, settings.CRAWL_LEASE_SECONDS
+            )
+        except Exception as e:
+            logger.error(f"Error claiming due domains: {e}")
+            self.db_session.rollback()
+            return []
+
+    async def _renew(self):
+        # Renewing at a third of the lease leaves room for a slow round trip
+        while True:
+            await asyncio.sleep(settings.CRAWL_LEASE_SECONDS / 3)
+            async with self.crawler.db_lock:
+                await asyncio.to_thread(self._renew_leases)
+
+    def _renew_leases(self):
+        try:
+            renew_leases(self.db_session, self.owner, settings.CRAWL_LEASE_SECONDS)
+        except Exception as e:
+            logger.error(f"Error renewing leases: {e}")
+            self.db_session.rollback()
+
+    def record(self, domain: str, changed: Optional[bool]):
+        """Store the outcome of a crawl and schedule the domain's next one (not committed).
+
+        Called by the crawler's writer thread inside the batch transaction.
+        changed is None for a failed crawl, which backs off without touching
+        the learned interval. With an owner, nothing is recorded once the
+        lease was lost to another scheduler, which now owns the domain.
+        """
+        query = select(CrawlFrontier).where(CrawlFrontier.domain == domain)
+        if self.owner is not None:
+            query = query.where(CrawlFrontier.lease_owner == self.owner)
+        row = self.db_session.scalars(query).one_or_none()
+        if row is None:
+            logger.warning(f"{domain} is no longer leased to {self.owner}, not recording its crawl")
+            return
+        now = utcnow()
+        if changed is None:
+            row.failure_count += 1
+            delay = retry_delay(row.failure_count)
+        else:
+            row.failure_count = 0
+            row.crawl_count += 1
+            row.last_crawled_at = now
+            if changed:
+                row.change_count += 1
+                row.last_changed_at = now
+            row.interval_seconds = next_interval(row.interval_seconds, changed)
+            delay = row.interval_seconds
+        # Jitter spreads domains that were added together over time
+        next_due_at = now + timedelta(seconds=delay * random.uniform(0.9, 1.1))
+        row.next_due_at = next_due_at
+        row.lease_owner = None
+        row.lease_expires_at = None
+        if self.owner is None and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._reschedule, next_due_at, domain)
+
+    def _record_failure(self, domain: str):
+        try:
+            self.record(domain, None)
+            self.db_session.commit()
+        except Exception as e:
+            logger.error(f"Error scheduling {domain}: {e}")
+            self.db_session.rollback()
+
+    def _reschedule(self, due_at: datetime, domain: str):
+        heapq.heappush(self._queue, (due_at, domain))
+        self._wakeup.set()
@@ -1,3 +1,6 @@
 # app/utils/__init__.py
 
-from .logging import setup_logging
\ No newline at end of file
+from .logging import setup_logging
+from .pagination import Cursor, encode_cursor, decode_cursor, keyset_condition, is_after_cursor
+from .db_pool import PoolMetrics, engine_options
+from .concurrency import offload
@@ -0,0 +1,20 @@
+# app/utils/concurrency.py
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.util.concurrency import await_only, in_greenlet
+
+def on_event_loop() -> bool:
+    """Whether sync code runs inside AsyncSession.run_sync(), i.e. on the event loop."""
+    return in_greenlet()
+
+def offload(fn, *args, **kwargs):
+    """Run CPU-bound fn without blocking the event loop, and return its result.
+
+    AsyncSession.run_sync() runs sync code on the event loop, in a greenlet
+    that only yields while awaiting the database; there fn runs in the
+    threadpool instead. Anywhere else, such as in a threadpool worker, it
+    runs inline.
+    """
+    if on_event_loop():
+        return await_only(run_in_threadpool(fn, *args, **kwargs))
+    return fn(*args, **kwargs)
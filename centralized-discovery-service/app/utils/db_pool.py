@@ -0,0 +1,145 @@
+# app/utils/db_pool.py
+
+import threading
+import time
+from collections import deque
+from sqlalchemy import event, make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+class PoolMetrics:
+    """Connection pool counters fed by SQLAlchemy pool events."""
+
+    def __init__(self, name: str, window: int = 1024):
+        self.name = name
+        self._lock = threading.Lock()
+        self._waits = deque(maxlen=window)
+        self.engine = None
+        self.checked_out = 0
+        self.checkouts = 0
+        self.connections_opened = 0
+        self.connections_closed = 0
+        self.invalidations = 0
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    @property
+    def pool(self):
+        # Engine.dispose() replaces the pool, so it is looked up every time
+        return self.engine.pool if self.engine is not None else None
+
+    def instrument(self, engine):
+        """Listen to the pool events of a (sync) engine, including pools it recreates."""
+        self.engine = engine
+        engine.pool.metrics = self
+        # Pool listeners are carried over to the recreated pool; the wait timer is not
+        event.listen(engine, "engine_disposed", self._on_engine_disposed)
+        event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "close", self._on_close)
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "checkin", self._on_checkin)
+        event.listen(engine, "invalidate", self._on_invalidate)
+        return self
+
+    def observe_wait(self, seconds: float):
+        """Record how long a caller waited to acquire a connection."""
+        with self._lock:
+            self._waits.append(seconds)
+            self.wait_count += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+
+    def snapshot(self) -> dict:
+        """Return current pool occupancy and cumulative counters."""
+        pool = self.pool
+        with self._lock:
+            waits = sorted(self._waits)
+            stats = {
+                "pool_class": type(pool).__name__ if pool is not None else None,
+                "checked_out": self.checked_out,
+                "checkouts": self.checkouts,
+                "connections_opened": self.connections_opened,
+                "connections_closed": self.connections_closed,
+                "invalidations": self.invalidations,
+                "wait": {
+                    "count": self.wait_count,
+                    "mean_ms": 1000 * self.wait_total / self.wait_count if self.wait_count else 0.0,
+                    "p50_ms": 1000 * waits[len(waits) // 2] if waits else 0.0,
+                    "p99_ms": 1000 * waits[min(len(waits) - 1, int(len(waits) * 0.99))] if waits else 0.0,
+                    "max_ms": 1000 * self.wait_max
+                }
+            }
+        if isinstance(pool, QueuePool):
+            stats.update(
+                size=pool.size(),
+                idle=pool.checkedin(),
+                overflow=max(pool.overflow(), 0),
+                max_overflow=pool._max_overflow
+            )
+        else:
+            stats.update(idle=max(self.connections_opened - self.connections_closed - self.checked_out, 0))
+        return stats
+
+    def _on_engine_disposed(self, engine):
+        engine.pool.metrics = self
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.connections_opened += 1
+
+    def _on_close(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.connections_closed += 1
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self._lock:
+            self.checked_out += 1
+            self.checkouts += 1
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.checked_out = max(self.checked_out - 1, 0)
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception):
+        with self._lock:
+            self.invalidations += 1
+
+class _TimedCheckout:
+    """Pool mixin timing connect(), i.e. the wait for a free or new connection."""
+
+    metrics = None
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            if self.metrics is not None:
+                self.metrics.observe_wait(time.perf_counter() - start)
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+class TimedAsyncAdaptedQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+def engine_options(url: str, settings, is_async: bool = False) -> dict:
+    """Build create_engine() keyword arguments from the DB_* settings."""
+    backend = make_url(url).get_backend_name()
+    options = {"pool_pre_ping": settings.DB_POOL_PRE_PING, "pool_recycle": settings.DB_POOL_RECYCLE}
+    if backend == "sqlite":
+        # SQLite picks its own pool class; sizing and server timeouts do not apply
+        return options
+    options.update(
+        poolclass=TimedAsyncAdaptedQueuePool if is_async else TimedQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT
+    )
+    if backend == "postgresql" and settings.DB_STATEMENT_TIMEOUT_MS:
+        timeout = str(settings.DB_STATEMENT_TIMEOUT_MS)
+        if is_async:
+            options["connect_args"] = {"server_settings": {"statement_timeout": timeout}}
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={timeout}"}
+    return options
@@ -0,0 +1,66 @@
+# app/utils/pagination.py
+
+import base64
+import binascii
+import json
+from typing import List, NamedTuple, Optional, Tuple
+from fastapi import Response
+from pydantic import TypeAdapter
+from sqlalchemy import REAL, and_, cast, or_
+from app import schemas
+
+class Cursor(NamedTuple):
+    """Keyset position: the rank and id of the last item of a page."""
+    rank: float
+    id: int
+
+def encode_cursor(rank: float, last_id: int) -> str:
+    """Encode a keyset position as an opaque URL-safe token."""
+    payload = json.dumps([rank, last_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).rstrip(b"=").decode()
+
+def decode_cursor(token: Optional[str]) -> Optional[Cursor]:
+    """Decode a token produced by encode_cursor; raises ValueError if it is malformed."""
+    if not token:
+        return None
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        rank, last_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return Cursor(float(rank), int(last_id))
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {token}") from e
+
+def keyset_condition(rank, id_column, cursor: Cursor):
+    """SQL condition for rows after cursor in (rank DESC, id ASC) order.
+
+    The cursor rank is cast to REAL so that it compares equal to the
+    single-precision ranks returned by similarity() and ts_rank_cd().
+    """
+    last_rank = cast(cursor.rank, REAL)
+    return or_(rank < last_rank, and_(rank == last_rank, id_column > cursor.id))
+
+def is_after_cursor(rank: float, item_id: int, cursor: Optional[Cursor]) -> bool:
+    """In-memory counterpart of keyset_condition."""
+    return cursor is None or rank < cursor.rank or (rank == cursor.rank and item_id > cursor.id)
+
+_intent_list = TypeAdapter(List[schemas.Intent])
+
+def render_page(ranked: list, limit: int) -> Tuple[bytes, Optional[str]]:
+    """Serialize up to limit (intent, rank) pairs as JSON, with the cursor of the next page.
+
+    ranked should hold limit + 1 rows; the extra row only signals that a next page exists.
+    """
+    page = ranked[:limit]
+    next_cursor = None
+    if len(ranked) > limit and page:
+        intent, rank = page[-1]
+        next_cursor = encode_cursor(rank, intent.id)
+    body = _intent_list.dump_json([schemas.Intent.model_validate(intent) for intent, _ in page])
+    return body, next_cursor
+
+def page_response(body: bytes, next_cursor: Optional[str], cache_hit: bool, headers: dict = None) -> Response:
+    """Build the JSON response of a rendered page."""
+    headers = {**(headers or {}), "X-Cache": "HIT" if cache_hit else "MISS"}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -1,24 +1,134 @@
 # scripts/crawler.py
-# USAGE: python scripts/crawler.py
+# USAGE: python scripts/crawler.py [domains.txt | -] [--shard i/N] [--concurrency N] [--scheduler [--owner NAME]]
 
 import sys
 import os
+import argparse
 import asyncio
 import logging
+import signal
+import zlib
+from typing import Iterable, Iterator, TextIO, Tuple
 
 # Adjust the import path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from app.services.crawler import start_crawler
+from app import models  # noqa: F401 - registers the tables
+from app.database import Base, SessionLocal, engine
+from app.services.crawler import Crawler
+from app.services.scheduler import CrawlScheduler
 from app.utils.logging import setup_logging
 
-def main():
+def parse_shard(value: str) -> Tuple[int, int]:
+    """Parse an "i/N" shard specification."""
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected i/N, got {value!r}")
+    if count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"shard index must be in [0, {count})")
+    return index, count
+
+def in_shard(domain: str, index: int, count: int) -> bool:
+    """Assign domains to shards by CRC32, stable across processes and hosts."""
+    return zlib.crc32(domain.encode()) % count == index
+
+def read_domains(lines: Iterable[str], index: int = 0, count: int = 1) -> Iterator[str]:
+    """Yield the domains of one shard, one per line, skipping blanks and # comments."""
+    for line in lines:
+        domain = line.split("#", 1)[0].strip().lower().rstrip(".")
+        if domain and in_shard(domain, index, count):
+            yield domain
+
+def format_stats(stats: dict) -> str:
+    return (
+        f"{stats['domains']} domains, {stats['domains_per_second']:.1f} domains/s, "
+        f"{stats['bytes_per_second'] / 1024:.1f} KiB/s, {stats['changed']} changed, "
+        f"{100 * stats['error_rate']:.1f}% errors"
+    )
+
+async def report(crawler: Crawler, interval: float, out: TextIO):
+    """Print live throughput every interval seconds."""
+    while True:
+        await asyncio.sleep(interval)
+        print(format_stats(crawler.stats.snapshot()), file=out, flush=True)
+
+async def crawl(domains: Iterator[str], concurrency: int, interval: float, out: TextIO):
+    Base.metadata.create_all(bind=engine)
+    db_session = SessionLocal()
+    try:
+        crawler = Crawler(domains=domains, db_session=db_session, concurrency=concurrency)
+        reporter = asyncio.create_task(report(crawler, interval, out))
+        try:
+            await crawler.start()
+        finally:
+            reporter.cancel()
+    finally:
+        db_session.close()
+    print(f"done: {format_stats(crawler.stats.snapshot())}", file=out)
+    latency = crawler.stats.latency_summary()
+    if latency:
+        print("latency: " + ", ".join(f"{key} {value:.0f}" for key, value in latency.items()), file=out)
+    print(f"intent changes: {dict(crawler.changes)}", file=out)
+
+async def schedule(domains: Iterator[str], concurrency: int, owner: str, interval: float, out: TextIO):
+    """Run the crawl scheduler over the persistent frontier until SIGINT or SIGTERM."""
+    Base.metadata.create_all(bind=engine)
+    db_session = SessionLocal()
+    try:
+        scheduler = CrawlScheduler(db_session, concurrency=concurrency, owner=owner)
+        added = scheduler.add_domains(domains)
+        print(f"added {added} domains to the frontier", file=out)
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, scheduler.stop)
+        reporter = asyncio.create_task(report(scheduler.crawler, interval, out))
+        try:
+            await scheduler.run()
+        finally:
+            reporter.cancel()
+    finally:
+        db_session.close()
+    print(f"stopped: {format_stats(scheduler.crawler.stats.snapshot())}", file=out)
+
+def main(argv=None):
     """Entry point for the crawler script."""
+    parser = argparse.ArgumentParser(description="Crawl agents.json files of a list of domains.")
+    parser.add_argument(
+        "input", nargs="?", default=None,
+        help="file with one domain per line, or - for stdin (the default, except with --scheduler)"
+    )
+    parser.add_argument("--shard", type=parse_shard, default=(0, 1), metavar="i/N",
+                        help="crawl only the i-th of N disjoint shards of the input")
+    parser.add_argument("--concurrency", type=int, default=None, help="domains crawled at once")
+    parser.add_argument("--stats-interval", type=float, default=5.0, help="seconds between progress lines")
+    parser.add_argument("--scheduler", action="store_true",
+                        help="add the input to the crawl frontier and keep recrawling due domains until stopped")
+    parser.add_argument("--owner", default=None,
+                        help="with --scheduler, claim domains under leases held by this name, "
+                             "so several schedulers can share one frontier")
+    args = parser.parse_args(argv)
+    if args.owner is not None and not args.scheduler:
+        parser.error("--owner requires --scheduler")
+
     setup_logging()
     logger = logging.getLogger(__name__)
-    logger.info("Starting crawler...")
-    asyncio.run(start_crawler())
+    index, count = args.shard
+    logger.info(f"Starting crawler on shard {index}/{count}...")
+    if args.input is None:
+        source = None if args.scheduler else sys.stdin
+    else:
+        source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    domains = read_domains(source or (), index, count)
+    try:
+        if args.scheduler:
+            asyncio.run(schedule(domains, args.concurrency, args.owner, args.stats_interval, sys.stderr))
+        else:
+            asyncio.run(crawl(domains, args.concurrency, args.stats_interval, sys.stderr))
+    finally:
+        if source is not None and source is not sys.stdin:
+            source.close()
     logger.info("Crawler finished.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
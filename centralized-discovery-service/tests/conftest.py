@@ -12,12 +12,15 @@ os.environ['DATABASE_URL'] = "sqlite:///:memory:"
 import pytest
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
-from app.database import Base
+from app.database import Base, enable_sqlite_savepoints
 from app.main import create_app
 from fastapi.testclient import TestClient
 from app.dependencies import get_db
+from app.models import Service, Intent
 from app.config import settings
 from app.utils.logging import setup_logging
+from app.search import reset_indexes, query_cache
+from app.services.nlp import query_preprocessor
 
 # Setup logging for tests
 setup_logging()
@@ -25,10 +28,12 @@ setup_logging()
 @pytest.fixture(scope="session")
 def engine():
     """Create a new database engine for testing."""
-    return create_engine(
+    engine = create_engine(
         os.environ['DATABASE_URL'],
         connect_args={"check_same_thread": False}
     )
+    enable_sqlite_savepoints(engine)
+    return engine
 
 @pytest.fixture(scope="session")
 def tables(engine):
@@ -52,6 +57,17 @@ def db_session(engine, tables):
     transaction.rollback()
     connection.close()
 
+@pytest.fixture(autouse=True)
+def clean_search_indexes():
+    """Rebuild in-process search indexes and caches from each test's own data."""
+    reset_indexes()
+    query_cache.clear()
+    query_preprocessor.clear()
+    yield
+    reset_indexes()
+    query_cache.clear()
+    query_preprocessor.clear()
+
 @pytest.fixture
 def client(db_session):
     """Create a new FastAPI TestClient."""
@@ -65,4 +81,26 @@ def client(db_session):
     app = create_app()
     app.dependency_overrides[get_db] = override_get_db
     with TestClient(app) as c:
-        yield c
\ No newline at end of file
+        yield c
+
+@pytest.fixture
+def create_intents(db_session):
+    """Return a factory committing a service with intents given as (name, description) pairs."""
+    def create(domain, intents):
+        service = Service(name=domain, description=f"Intents of {domain}", service_url=f"https://{domain}")
+        created = [
+            Intent(
+                service=service,
+                intent_uid=f"{domain}:{name}:v1",
+                intent_name=name,
+                description=description,
+                input_parameters=[],
+                output_parameters=[],
+                endpoint=f"https://{domain}/api/execute/{name}"
+            )
+            for name, description in intents
+        ]
+        db_session.add_all(created)
+        db_session.commit()
+        return created
+    return create
@@ -0,0 +1,104 @@
+# tests/test_async.py
+
+import threading
+import pytest
+import pytest_asyncio
+from unittest.mock import patch
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from app.crud import aio
+from app.database import Base, async_database_url
+from app.dependencies import get_db
+from app.main import create_app
+from app.schemas.intent import IntentCreate
+from app.schemas.service import ServiceCreate
+from app.search.bm25 import BM25Index, rank_bm25_query
+from app.search.vectors import VectorIndex, rank_semantic_query
+from app.services.nlp import query_preprocessor, rank_natural_language_query
+
+@pytest_asyncio.fixture
+async def async_db():
+    """Create an AsyncSession on a fresh aiosqlite database."""
+    engine = create_async_engine(async_database_url("sqlite:///:memory:"))
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    async with async_sessionmaker(engine, expire_on_commit=False)() as session:
+        yield session
+    await engine.dispose()
+
+@pytest_asyncio.fixture
+async def async_data(async_db):
+    """Create a service with two tagged intents through the async CRUD functions."""
+    service = await aio.create_service(async_db, ServiceCreate(
+        name="asyncservice.com",
+        description="An async test service",
+        service_url="https://asyncservice.com"
+    ))
+    for name in ("SearchFlights", "BookFlight"):
+        await aio.create_intent(async_db, IntentCreate(
+            intent_uid=f"asyncservice.com:{name}:v1",
+            intent_name=name,
+            description=f"{name} for travellers",
+            input_parameters=[],
+            output_parameters=[],
+            endpoint=f"https://asyncservice.com/api/execute/{name}",
+            tags=["travel", name.lower()]
+        ), service.id)
+
+def test_async_database_url():
+    """Test that sync URLs are mapped to the asyncio drivers."""
+    assert async_database_url("postgresql://u:p@db/uim") == "postgresql+asyncpg://u:p@db/uim"
+    assert async_database_url("sqlite:///:memory:") == "sqlite+aiosqlite:///:memory:"
+
+@pytest.mark.asyncio
+async def test_async_crud(async_db, async_data):
+    """Test async CRUD reads, including the in-process indexes and full-text search."""
+    intent = await aio.get_intent_by_uid(async_db, "asyncservice.com:BookFlight:v1")
+    assert sorted(tag.name for tag in intent.tags) == ["bookflight", "travel"]
+
+    intents = await aio.get_intents_by_filters(async_db, intent_name="flight", tags=["travel"])
+    assert [i.intent_name for i in intents] == ["BookFlight", "SearchFlights"]
+
+    ranked = await aio.run(async_db, rank_natural_language_query, "travellers")
+    assert len(ranked) == 2
+
+@pytest.mark.asyncio
+async def test_async_routes(async_db, async_data):
+    """Test the API routes served from an AsyncSession."""
+    app = create_app()
+
+    async def override_get_db():
+        yield async_db
+
+    app.dependency_overrides[get_db] = override_get_db
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.get("/api/intents/search", params={"tags": "travel", "limit": 1})
+        assert response.status_code == 200
+        assert [i["intent_name"] for i in response.json()] == ["SearchFlights"]
+        assert "X-Next-Cursor" in response.headers
+
+        response = await client.get("/api/search/", params={"query": "searchflights travellers"})
+        assert [i["intent_name"] for i in response.json()] == ["SearchFlights"]
+
+@pytest.mark.asyncio
+async def test_async_search_offloads_cpu_work(async_db, async_data):
+    """Test that index builds, scoring and query preprocessing leave the event loop under run_sync()."""
+    loop_thread = threading.get_ident()
+    threads = []
+
+    def recorded(method):
+        def wrapper(*args, **kwargs):
+            threads.append(threading.get_ident())
+            return method(*args, **kwargs)
+        return wrapper
+
+    with patch.object(BM25Index, "_add_all", recorded(BM25Index._add_all)), \
+            patch.object(BM25Index, "search", recorded(BM25Index.search)), \
+            patch.object(VectorIndex, "search", recorded(VectorIndex.search)), \
+            patch.object(query_preprocessor, "_cached", recorded(query_preprocessor._cached)):
+        assert await aio.run(async_db, rank_bm25_query, "flight")
+        assert await aio.run(async_db, rank_semantic_query, "flight")
+        assert await aio.run(async_db, rank_natural_language_query, "travellers")
+
+    assert len(threads) == 4
+    assert loop_thread not in threads
@@ -3,11 +3,43 @@
 import pytest
 import asyncio
 import aiohttp
+import importlib.util
+import json
+import os
+import socket
+from concurrent.futures import ProcessPoolExecutor
 from unittest.mock import patch, AsyncMock, MagicMock
-from app.services.crawler import Crawler, get_agents_json_url_from_dns
+import dns.resolver
+from app.config import settings
+from app.services.crawler import Crawler, CrawlStats, FetchResult, get_agents_json_url_from_dns
+from app.services.dns_utils import DnsCache
+from app.services.hosts import CircuitBreaker
 from app.models import Service, Intent
+from app.schemas.service import AgentsJson
 from sqlalchemy.orm import Session
 
+def mock_response(status, body=b"", headers=None):
+    """Build a mocked aiohttp response streaming body in chunks."""
+    async def iter_chunked(size):
+        for start in range(0, len(body), size):
+            yield body[start:start + size]
+
+    response = AsyncMock()
+    response.status = status
+    response.headers = headers or {}
+    response.content_length = len(body)
+    response.content.iter_chunked = iter_chunked
+    return response
+
+def mock_get(responses):
+    """Side effect for aiohttp.ClientSession.get returning the response built for each call."""
+    def get(url, headers=None):
+        context = MagicMock()
+        context.__aenter__ = AsyncMock(return_value=responses(url, headers))
+        context.__aexit__ = AsyncMock(return_value=False)
+        return context
+    return get
+
 @pytest.fixture
 def mock_agents_json():
     return {
@@ -42,10 +74,7 @@ async def test_crawler_fetch_agents_json(mock_agents_json):
 
     # Mock aiohttp ClientSession.get
     with patch('aiohttp.ClientSession.get') as mock_get:
-        mock_response = AsyncMock()
-        mock_response.status = 200
-        mock_response.json.return_value = mock_agents_json
-        mock_get.return_value.__aenter__.return_value = mock_response
+        mock_get.return_value.__aenter__.return_value = mock_response(200, json.dumps(mock_agents_json).encode())
 
         data = await crawler.fetch_agents_json(url)
 
@@ -56,10 +85,11 @@ async def test_crawler_process_domain(db_session, mock_agents_json):
     """Test the crawler's process_domain method."""
     # Mock get_agents_json_url_from_dns
     with patch('app.services.crawler.get_agents_json_url_from_dns', return_value=None):
-        # Mock fetch_agents_json
-        with patch.object(Crawler, 'fetch_agents_json', return_value=mock_agents_json):
+        # Mock the conditional fetch
+        with patch.object(Crawler, 'fetch', return_value=FetchResult(status=200, data=mock_agents_json)):
             crawler = Crawler(domains=["testservice.com"], db_session=db_session)
-            await crawler.process_domain("testservice.com")
+            async with crawler.pipeline():
+                assert await crawler.process_domain("testservice.com") is True
 
     # Verify data in the database
     service = db_session.query(Service).filter_by(name="testservice.com").first()
@@ -98,4 +128,356 @@ def test_crawler_process_agents_json(db_session, mock_agents_json):
 
     intent = db_session.query(Intent).filter_by(intent_uid="testservice.com:TestIntent:v1").first()
     assert intent is not None
-    assert intent.intent_name == "TestIntent"
\ No newline at end of file
+    assert intent.intent_name == "TestIntent"
+
+
+@pytest.mark.asyncio
+async def test_crawler_start_bounded_concurrency(db_session):
+    """Domains from a lazy iterable share one session with at most `concurrency` in flight."""
+    in_flight, peak, sessions = 0, 0, set()
+
+    async def process_domain(self, domain):
+        nonlocal in_flight, peak
+        sessions.add(id(self.session))
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0)
+        in_flight -= 1
+
+    domains = (f"service{i}.com" for i in range(50))
+    with patch.object(Crawler, 'process_domain', process_domain):
+        crawler = Crawler(domains=domains, db_session=db_session, concurrency=4)
+        await crawler.start()
+
+    assert peak == 4
+    assert len(sessions) == 1
+    assert crawler.session is None
+
+@pytest.mark.asyncio
+async def test_crawler_conditional_recrawl(db_session, mock_agents_json):
+    """Re-crawls send the stored validators and skip processing on 304 or an unchanged body."""
+    body = json.dumps(mock_agents_json).encode()
+    responses = [
+        (200, {"ETag": '"v1"', "Last-Modified": "Mon, 05 Oct 2026 10:00:00 GMT"}),
+        (304, {}),
+        (200, {"ETag": '"v2"'})
+    ]
+    sent_headers = []
+
+    def respond(url, headers):
+        status, response_headers = responses[len(sent_headers)]
+        sent_headers.append(headers)
+        return mock_response(status, body, response_headers)
+
+    crawler = Crawler(domains=[], db_session=db_session)
+    crawler.rate_limiter.rate = 0
+    with patch('app.services.crawler.get_agents_json_url_from_dns', return_value=None), \
+            patch('aiohttp.ClientSession.get', side_effect=mock_get(respond)):
+        async with crawler.pipeline():
+            await crawler.process_domain("testservice.com")
+        with patch.object(Crawler, '_apply_document') as apply:
+            async with crawler.pipeline():
+                assert await crawler.process_domain("testservice.com") is False
+            async with crawler.pipeline():
+                assert await crawler.process_domain("testservice.com") is False
+        assert not apply.called
+
+    assert sent_headers[0] == {}
+    assert sent_headers[1] == {
+        "If-None-Match": '"v1"',
+        "If-Modified-Since": "Mon, 05 Oct 2026 10:00:00 GMT"
+    }
+    service = db_session.query(Service).filter_by(name="testservice.com").one()
+    assert service.agents_json_url == "https://testservice.com/agents.json"
+    assert len(service.content_hash) == 64
+    # An unchanged body only refreshes the rotated validators
+    assert service.etag == '"v2"'
+
+def test_crawler_reconciles_recrawled_intents(db_session, mock_agents_json):
+    """Re-crawls insert, update and delete only the intents that differ."""
+    crawler = Crawler(domains=[], db_session=db_session)
+    assert crawler.process_agents_json(mock_agents_json) == {
+        "inserted": 1, "updated": 0, "deleted": 0, "unchanged": 0
+    }
+    assert crawler.process_agents_json(mock_agents_json)["unchanged"] == 1
+
+    renamed = dict(mock_agents_json["intents"][0], description="A changed intent", tags=["test"])
+    added = dict(mock_agents_json["intents"][0], intent_uid="testservice.com:OtherIntent:v1", intent_name="OtherIntent")
+    counts = crawler.process_agents_json(dict(mock_agents_json, intents=[renamed, added]))
+    assert counts == {"inserted": 1, "updated": 1, "deleted": 0, "unchanged": 0}
+
+    counts = crawler.process_agents_json(dict(mock_agents_json, intents=[added]))
+    assert counts == {"inserted": 0, "updated": 0, "deleted": 1, "unchanged": 1}
+    assert crawler.changes == {"inserted": 2, "updated": 1, "deleted": 1, "unchanged": 2}
+
+    service = db_session.query(Service).filter_by(name="testservice.com").one()
+    assert [intent.intent_uid for intent in service.intents] == ["testservice.com:OtherIntent:v1"]
+
+@pytest.mark.asyncio
+async def test_crawler_pipeline_batches_writes(db_session, mock_agents_json):
+    """start() writes fetched documents in batched transactions; an invalid one is skipped."""
+    def document(i):
+        intent = dict(mock_agents_json["intents"][0], intent_uid=f"service{i}.com:TestIntent:v1")
+        return dict(service_info=dict(mock_agents_json["service_info"], name=f"service{i}.com"), intents=[intent])
+
+    bodies = {f"https://service{i}.com/agents.json": json.dumps(document(i)).encode() for i in range(6)}
+    bodies["https://broken.com/agents.json"] = b'{"service_info": {}}'
+
+    batches = []
+    write_batch = Crawler.write_batch
+
+    def record_batch(self, batch):
+        batches.append(len(batch))
+        return write_batch(self, batch)
+
+    domains = ["broken.com", *(f"service{i}.com" for i in range(6))]
+    crawler = Crawler(domains=domains, db_session=db_session, concurrency=3)
+    with patch('app.services.crawler.get_agents_json_url_from_dns', return_value=None), \
+            patch('aiohttp.ClientSession.get', side_effect=mock_get(lambda url, headers: mock_response(200, bodies[url]))), \
+            patch.object(Crawler, 'write_batch', record_batch):
+        await crawler.start()
+
+    assert db_session.query(Service).count() == 6
+    assert db_session.query(Intent).count() == 6
+    assert sum(batches) == 6
+    assert crawler.changes["inserted"] == 6
+
+def test_crawler_write_batch_isolates_failures(db_session, mock_agents_json):
+    """A document failing in the database is rolled back alone, the rest of the batch commits."""
+    first = AgentsJson.model_validate(mock_agents_json)
+    clash = AgentsJson.model_validate(
+        dict(mock_agents_json, service_info=dict(mock_agents_json["service_info"], name="other.com"))
+    )
+    crawler = Crawler(domains=[], db_session=db_session)
+    fetched = FetchResult(status=200, content_hash="0" * 64)
+    counts = crawler.write_batch([
+        ("testservice.com", "https://testservice.com/agents.json", fetched, first),
+        ("other.com", "https://other.com/agents.json", fetched, clash)
+    ])
+
+    assert counts["inserted"] == 1
+    assert [service.name for service in db_session.query(Service)] == ["testservice.com"]
+    assert db_session.query(Intent).count() == 1
+
+@pytest.mark.asyncio
+async def test_crawler_rejects_oversized_body(mock_agents_json):
+    """Bodies over CRAWLER_MAX_BODY_BYTES are dropped, whether announced or streamed."""
+    body = json.dumps(mock_agents_json).encode()
+    streamed = mock_response(200, body)
+    streamed.content_length = None
+    crawler = Crawler(domains=[], db_session=MagicMock(spec=Session))
+    with patch.object(settings, 'CRAWLER_MAX_BODY_BYTES', len(body) - 1):
+        for response in (mock_response(200, body), streamed):
+            with patch('aiohttp.ClientSession.get', side_effect=mock_get(lambda url, headers: response)):
+                assert await crawler.fetch("https://testservice.com/agents.json") is None
+        # At the limit the whole body is read
+        with patch.object(settings, 'CRAWLER_MAX_BODY_BYTES', len(body)), \
+                patch('aiohttp.ClientSession.get', side_effect=mock_get(lambda url, headers: streamed)):
+            assert await crawler.fetch_agents_json("https://testservice.com/agents.json") == mock_agents_json
+
+@pytest.mark.asyncio
+async def test_crawler_validates_large_documents_in_process_pool(mock_agents_json):
+    """Documents over CRAWLER_OFFLOAD_BYTES are validated by the process pool."""
+    crawler = Crawler(domains=[], db_session=MagicMock(spec=Session))
+    result = FetchResult(status=200, body=json.dumps(mock_agents_json).encode())
+    with ProcessPoolExecutor(max_workers=1) as pool, patch.object(settings, 'CRAWLER_OFFLOAD_BYTES', 0):
+        crawler._validation_pool = pool
+        with patch.object(pool, 'submit', wraps=pool.submit) as submit:
+            document = await crawler.validate(result)
+    assert submit.called
+    assert document.service_info.name == "testservice.com"
+    assert document.intents[0].tags == ["test", "intent"]
+
+@pytest.mark.asyncio
+async def test_crawler_validation_pool_does_not_fork(db_session, mock_agents_json):
+    """The pipeline's validation processes are not forked from the threaded crawler."""
+    crawler = Crawler(domains=[], db_session=db_session)
+    with patch.object(settings, 'CRAWLER_VALIDATION_PROCESSES', 1), patch.object(settings, 'CRAWLER_OFFLOAD_BYTES', 0):
+        async with crawler.pipeline():
+            assert crawler._validation_pool._mp_context.get_start_method() in ("forkserver", "spawn")
+            document = await crawler.validate(FetchResult(status=200, body=json.dumps(mock_agents_json).encode()))
+    assert document.service_info.name == "testservice.com"
+
+class FakeResolver:
+    """Resolver answering TXT queries from a table, counting the queries sent."""
+
+    def __init__(self, records, ttl=300):
+        self.records = records
+        self.ttl = ttl
+        self.queries = 0
+
+    async def resolve(self, domain, rdtype):
+        self.queries += 1
+        await asyncio.sleep(0)
+        if domain not in self.records:
+            raise dns.resolver.NXDOMAIN()
+        answers = [MagicMock(strings=strings) for strings in self.records[domain]]
+        result = MagicMock()
+        result.__iter__.return_value = iter(answers)
+        result.rrset.ttl = self.ttl
+        return result
+
+@pytest.mark.asyncio
+async def test_dns_cache_respects_ttl_and_coalesces():
+    """TXT answers are cached for their TTL and concurrent lookups share one query."""
+    resolver = FakeResolver({
+        "spec.com": [(b"v=spf1 -all",), (b"uim-agents-file=", b"https://spec.com/agents.json")],
+        "legacy.com": [(b"agents_json_url=https://legacy.com/uim.json",)]
+    }, ttl=60)
+    cache = DnsCache(resolver=resolver)
+
+    results = await asyncio.gather(*(cache.lookup("spec.com") for _ in range(5)))
+    assert results == ["https://spec.com/agents.json"] * 5
+    assert resolver.queries == 1
+    assert cache.coalesced == 4
+    assert await cache.lookup("legacy.com") == "https://legacy.com/uim.json"
+
+    # Negative answers are cached too
+    assert await cache.lookup("missing.com") is None
+    assert await cache.lookup("missing.com") is None
+    assert resolver.queries == 3
+
+    with patch('app.services.dns_utils.time.monotonic', return_value=10 ** 9):
+        await cache.lookup("spec.com")
+    assert resolver.queries == 4
+
+@pytest.mark.asyncio
+async def test_dns_cache_waiters_survive_cancelled_leader():
+    """Cancelling the lookup that others coalesced on hands the query to a waiter."""
+    resolver = FakeResolver({"spec.com": [(b"uim-agents-file=https://spec.com/agents.json",)]})
+    release = asyncio.Event()
+    resolve = resolver.resolve
+
+    async def slow_first_resolve(domain, rdtype):
+        if resolver.queries == 0:
+            resolver.queries += 1
+            await release.wait()
+        return await resolve(domain, rdtype)
+
+    resolver.resolve = slow_first_resolve
+    cache = DnsCache(resolver=resolver)
+    leader = asyncio.ensure_future(cache.lookup("spec.com"))
+    await asyncio.sleep(0)
+    waiters = [asyncio.ensure_future(cache.lookup("spec.com")) for _ in range(3)]
+    await asyncio.sleep(0)
+    leader.cancel()
+    assert await asyncio.gather(*waiters) == ["https://spec.com/agents.json"] * 3
+    assert leader.cancelled()
+    assert resolver.queries == 2
+
+def test_crawl_stats():
+    """Crawl stats count throughput and errors and summarize latency."""
+    stats = CrawlStats(sample_size=2)
+    stats.record(0.1, FetchResult(status=200, body=b"{}", size=2))
+    stats.record(0.2, FetchResult(status=304))
+    stats.record(0.3, None)
+    snapshot = stats.snapshot()
+    assert snapshot["domains"] == 3
+    assert snapshot["changed"] == 1
+    assert snapshot["error_rate"] == pytest.approx(1 / 3)
+    assert stats.bytes == 2
+    assert len(stats._latencies) == 2
+    assert stats.latency_summary()["max_ms"] <= 300
+
+def test_crawler_cli_shards_partition_input():
+    """--shard i/N splits the input into disjoint shards covering every domain."""
+    path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "scripts", "crawler.py")
+    spec = importlib.util.spec_from_file_location("crawler_cli", path)
+    cli = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(cli)
+
+    lines = [f"Service{i}.com\n" for i in range(100)] + ["\n", "# comment\n"]
+    shards = [list(cli.read_domains(lines, index, 3)) for index in range(3)]
+    assert sorted(sum(shards, [])) == sorted(f"service{i}.com" for i in range(100))
+    assert all(shards)
+    assert cli.parse_shard("2/3") == (2, 3)
+    with pytest.raises(SystemExit):
+        cli.main(["--owner", "worker-a"])
+
+@pytest.mark.asyncio
+async def test_crawler_retries_transient_failures(mock_agents_json):
+    """Throttling and gateway errors are retried with backoff before giving up."""
+    body = json.dumps(mock_agents_json).encode()
+    statuses = [503, 429, 200]
+    delays = []
+
+    async def sleep(seconds):
+        delays.append(seconds)
+
+    crawler = Crawler(domains=[], db_session=MagicMock(spec=Session))
+    crawler.rate_limiter.rate = 0
+    respond = lambda url, headers: mock_response(statuses.pop(0), body, {"Retry-After": "7"})
+    with patch('aiohttp.ClientSession.get', side_effect=mock_get(respond)), \
+            patch('app.services.crawler.asyncio.sleep', sleep):
+        assert await crawler.fetch_agents_json("https://testservice.com/agents.json") == mock_agents_json
+    # Retry-After is honoured
+    assert delays == [7.0, 7.0]
+    assert not crawler.breaker.is_open("testservice.com")
+
+@pytest.mark.asyncio
+async def test_crawler_circuit_breaker_parks_failing_hosts():
+    """After repeated failures a host is skipped without sending requests, until the cooldown ends."""
+    calls = []
+
+    def refuse(url, headers=None):
+        calls.append(url)
+        raise aiohttp.ClientConnectionError("connection reset by peer")
+
+    crawler = Crawler(domains=[], db_session=MagicMock(spec=Session))
+    crawler.rate_limiter.rate = 0
+    crawler.breaker = CircuitBreaker(threshold=2, cooldown=60)
+    with patch('aiohttp.ClientSession.get', side_effect=refuse), \
+            patch('app.services.crawler.backoff_delay', return_value=0):
+        for _ in range(3):
+            assert await crawler.fetch("https://down.com/agents.json") is None
+        attempts = len(calls)
+        assert attempts == 2 * 3  # two failed fetches of three attempts each, the third skipped
+        assert crawler.breaker.is_open("down.com")
+
+        # Half-open after the cooldown: a single trial request goes out
+        with patch('app.services.hosts.time.monotonic', return_value=10 ** 9):
+            assert await crawler.fetch("https://down.com/agents.json") is None
+        assert len(calls) == attempts + 3
+        assert crawler.breaker.is_open("down.com")
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("error", [
+    aiohttp.ClientConnectorDNSError(MagicMock(host="gone.invalid", port=443), socket.gaierror(-2, "Name not known")),
+    aiohttp.ClientConnectorError(MagicMock(host="gone.invalid", port=443), ConnectionRefusedError(111, "Refused")),
+])
+async def test_crawler_does_not_retry_unreachable_hosts(error):
+    """Unresolvable and refusing hosts fail at once and count toward the circuit breaker."""
+    calls = []
+
+    def unreachable(url, headers=None):
+        calls.append(url)
+        raise error
+
+    crawler = Crawler(domains=[], db_session=MagicMock(spec=Session))
+    crawler.rate_limiter.rate = 0
+    crawler.breaker = CircuitBreaker(threshold=2, cooldown=60)
+    with patch('aiohttp.ClientSession.get', side_effect=unreachable):
+        for _ in range(3):
+            assert await crawler.fetch("https://gone.invalid/agents.json") is None
+    assert len(calls) == 2
+    assert crawler.breaker.is_open("gone.invalid")
+
+@pytest.mark.asyncio
+async def test_crawler_permanent_failures_count_toward_breaker(mock_agents_json):
+    """Non-200 responses open the circuit; only 200 and 304 close it."""
+    statuses = [404, 200, 404, 404, 200]
+    body = json.dumps(mock_agents_json).encode()
+    crawler = Crawler(domains=[], db_session=MagicMock(spec=Session))
+    crawler.rate_limiter.rate = 0
+    crawler.breaker = CircuitBreaker(threshold=2, cooldown=60)
+    with patch('aiohttp.ClientSession.get',
+               side_effect=mock_get(lambda url, headers: mock_response(statuses.pop(0), body))):
+        assert await crawler.fetch("https://moved.com/agents.json") is None
+        assert (await crawler.fetch("https://moved.com/agents.json")).status == 200
+        # The success reset the count: one more 404 leaves the circuit closed
+        assert await crawler.fetch("https://moved.com/agents.json") is None
+        assert not crawler.breaker.is_open("moved.com")
+        assert await crawler.fetch("https://moved.com/agents.json") is None
+        assert crawler.breaker.is_open("moved.com")
+        assert await crawler.fetch("https://moved.com/agents.json") is None
+    assert statuses == [200]
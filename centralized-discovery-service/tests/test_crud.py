@@ -1,10 +1,14 @@
 # tests/test_crud.py
 
 import pytest
+from sqlalchemy import event
 from app.crud.service import create_service, get_service_by_name
-from app.crud.intent import create_intent, get_intent_by_uid
+from app.crud.intent import (
+    create_intent, get_intent_by_uid, get_intents_by_filters, delete_intent, update_intent
+)
+from app.search import IntentDocument, TrigramIndex
 from app.schemas.service import ServiceCreate
-from app.schemas.intent import IntentCreate
+from app.schemas.intent import IntentCreate, IntentUpdate
 
 @pytest.fixture
 def setup_data(db_session):
@@ -107,4 +111,82 @@ def test_delete_intent(db_session, setup_data):
     db_session.commit()
 
     deleted_intent = get_intent_by_uid(db_session, "testservice.com:TestIntent:v1")
-    assert deleted_intent is None
\ No newline at end of file
+    assert deleted_intent is None
+
+
+def test_get_intents_by_filters_ranks_by_similarity(db_session, create_intents):
+    """Test that substring matches are ranked by trigram similarity."""
+    create_intents("rankservice.com", [
+        (name, f"Intent {name}") for name in ["SearchProductsByCategory", "SearchProducts", "ListOrders"]
+    ])
+    intents = get_intents_by_filters(db_session, intent_name="searchproducts")
+    assert [intent.intent_name for intent in intents] == ["SearchProducts", "SearchProductsByCategory"]
+
+def test_get_intents_by_filters_follows_writes(db_session, create_intents):
+    """Test that the trigram index picks up intents committed after it was built."""
+    service = create_intents("rankservice.com", [("SearchProducts", "Intent SearchProducts")])[0].service
+    assert len(get_intents_by_filters(db_session, intent_name="Orders")) == 0
+    create_intent(db_session, IntentCreate(
+        intent_uid="rankservice.com:ListOrders:v1",
+        intent_name="ListOrders",
+        description="List orders",
+        input_parameters=[],
+        output_parameters=[],
+        endpoint="https://rankservice.com/api/execute/ListOrders"
+    ), service.id)
+    intents = get_intents_by_filters(db_session, intent_name="Orders")
+    assert [intent.intent_name for intent in intents] == ["ListOrders"]
+
+    delete_intent(db_session, intents[0])
+    assert get_intents_by_filters(db_session, intent_name="Orders") == []
+
+def test_trigram_index_candidates():
+    """Test that trigram candidates cover substring matches case-insensitively."""
+    index = TrigramIndex("intent_name")
+    index.loaded = True
+    index.apply([
+        IntentDocument(1, 1, "a:SearchProducts:v1", "SearchProducts", ""),
+        IntentDocument(2, 1, "a:ListOrders:v1", "ListOrders", ""),
+    ], [])
+    assert set(index.search("PRODUCT")) == {1}
+    assert index.search("zzz") == {}
+    assert index.search("ab") is None
+
+def _count_statements(engine, operation):
+    """Run operation and return the number of SQL statements it executed."""
+    statements = []
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        operation()
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    return len(statements)
+
+def test_tag_upsert_statement_count(db_session, engine, setup_data):
+    """Test that creating and updating intents costs the same number of statements for 1 or 5 tags."""
+    service_id = get_service_by_name(db_session, "testservice.com").id
+    counts = {}
+    for size in (1, 5):
+        tags = [f"tag{size}-{i}" for i in range(size)]
+        intent_data = IntentCreate(
+            intent_uid=f"testservice.com:Tagged{size}:v1",
+            intent_name=f"Tagged{size}",
+            description="A tagged intent",
+            input_parameters=[],
+            output_parameters=[],
+            endpoint="https://testservice.com/api/execute/Tagged",
+            tags=tags
+        )
+        created = _count_statements(engine, lambda: create_intent(db_session, intent_data, service_id))
+        intent = get_intent_by_uid(db_session, intent_data.intent_uid)
+        assert sorted(tag.name for tag in intent.tags) == sorted(tags)
+
+        new_tags = [f"new{size}-{i}" for i in range(size)]
+        updated = _count_statements(
+            engine, lambda: update_intent(db_session, intent, IntentUpdate(tags=new_tags))
+        )
+        assert sorted(tag.name for tag in intent.tags) == sorted(new_tags)
+        counts[size] = (created, updated)
+    assert counts[1] == counts[5]
@@ -0,0 +1,107 @@
+# tests/test_database.py
+
+import os
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models import Intent, Service
+from app.search.vectors import rank_semantic_query
+from app.utils.db_pool import PoolMetrics, TimedAsyncAdaptedQueuePool, TimedQueuePool, engine_options
+
+# Schema of the first release, before any migration
+_BASELINE_SCHEMA = [
+    "CREATE TABLE services (id INTEGER PRIMARY KEY, name VARCHAR NOT NULL UNIQUE, description TEXT, "
+    "service_url VARCHAR NOT NULL, service_logo_url VARCHAR, service_terms_of_service_url VARCHAR, "
+    "service_privacy_policy_url VARCHAR)",
+    "CREATE TABLE intents (id INTEGER PRIMARY KEY, service_id INTEGER NOT NULL REFERENCES services (id), "
+    "intent_uid VARCHAR NOT NULL UNIQUE, intent_name VARCHAR NOT NULL, description TEXT, "
+    "input_parameters JSON, output_parameters JSON, endpoint VARCHAR NOT NULL)",
+    "CREATE TABLE tags (id INTEGER PRIMARY KEY, name VARCHAR NOT NULL UNIQUE)",
+    "CREATE TABLE intent_tags (intent_id INTEGER REFERENCES intents (id), tag_id INTEGER REFERENCES tags (id), "
+    "PRIMARY KEY (intent_id, tag_id))",
+    "INSERT INTO services (id, name, service_url) VALUES (1, 'old.com', 'https://old.com')",
+    "INSERT INTO intents (id, service_id, intent_uid, intent_name, description, endpoint) "
+    "VALUES (1, 1, 'old.com:BookHotel:v1', 'BookHotel', 'Reserve a room', 'https://old.com/api/execute/BookHotel')",
+    "INSERT INTO tags (id, name) VALUES (1, 'travel')",
+    "INSERT INTO intent_tags (intent_id, tag_id) VALUES (1, 1)",
+]
+
+def test_migrations_upgrade_a_baseline_database(tmp_path):
+    """alembic upgrade head brings a database of the first release up to the current models."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'baseline.db'}")
+    with engine.begin() as connection:
+        for statement in _BASELINE_SCHEMA:
+            connection.exec_driver_sql(statement)
+        config = Config()
+        config.set_main_option("script_location", os.path.join(os.path.dirname(os.path.dirname(__file__)), "alembic"))
+        config.attributes["connection"] = connection
+        command.upgrade(config, "head")
+    with Session(engine) as db:
+        service = db.query(Service).one()
+        assert service.agents_json_url is None and service.content_hash is None
+        intent = db.query(Intent).one()
+        assert intent.search_document == "BookHotel Reserve a room travel"
+        assert intent.embedding is None
+        assert [hit.intent_name for hit, _ in rank_semantic_query(db, "hotel room")] == ["BookHotel"]
+    engine.dispose()
+
+def test_engine_options_for_postgres():
+    """Pool sizing and the statement timeout are passed to server engines only."""
+    sync = engine_options("postgresql://u:p@db/uim", settings)
+    assert sync["poolclass"] is TimedQueuePool
+    assert sync["pool_size"] == settings.DB_POOL_SIZE
+    assert sync["connect_args"] == {"options": f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}"}
+    async_ = engine_options("postgresql+asyncpg://u:p@db/uim", settings, is_async=True)
+    assert async_["poolclass"] is TimedAsyncAdaptedQueuePool
+    assert async_["connect_args"]["server_settings"]["statement_timeout"] == str(settings.DB_STATEMENT_TIMEOUT_MS)
+    assert "pool_size" not in engine_options("sqlite:///:memory:", settings)
+
+def test_pool_metrics(tmp_path):
+    """Pool events track checked-out, idle and overflow connections and checkout waits."""
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}", poolclass=TimedQueuePool, pool_size=1, max_overflow=1
+    )
+    metrics = PoolMetrics("test").instrument(engine)
+    first, second = engine.connect(), engine.connect()
+    second.execute(text("SELECT 1"))
+    stats = metrics.snapshot()
+    assert stats["checked_out"] == 2
+    assert stats["overflow"] == 1
+    assert stats["idle"] == 0
+    first.close()
+    second.close()
+    stats = metrics.snapshot()
+    assert stats["checked_out"] == 0
+    assert stats["idle"] == 1
+    assert stats["checkouts"] == 2
+    assert stats["wait"]["count"] == 2
+    engine.dispose()
+
+def test_pool_metrics_follow_recreated_pool(tmp_path):
+    """Metrics keep counting after Engine.dispose() replaces the pool."""
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}", poolclass=TimedQueuePool, pool_size=2, max_overflow=0
+    )
+    metrics = PoolMetrics("test").instrument(engine)
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+    engine.dispose()
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+        stats = metrics.snapshot()
+        assert stats["checked_out"] == 1
+        assert stats["size"] == 2
+    stats = metrics.snapshot()
+    assert stats["checkouts"] == 2
+    assert stats["connections_opened"] == 2
+    assert stats["wait"]["count"] == 2
+    assert metrics.pool is engine.pool
+    engine.dispose()
+
+def test_pool_metrics_endpoint(client):
+    """The pool endpoint reports the application engine."""
+    response = client.get("/api/metrics/pool")
+    assert response.status_code == 200
+    assert "checked_out" in response.json()["sync"]
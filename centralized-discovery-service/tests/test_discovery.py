@@ -6,10 +6,12 @@ from app.main import create_app
 from app.dependencies import get_db
 from sqlalchemy.orm import Session
 from app.crud.service import create_service
-from app.crud.intent import create_intent
+from app.crud.intent import create_intent, get_intents_by_filters
 from app.schemas.service import ServiceCreate
 from app.schemas.intent import IntentCreate
 from app.schemas.tag import TagCreate
+from app.models.intent import intent_tags
+from app.search import IntentDocument, SuggestIndex, TagIndex
 
 @pytest.fixture
 def client(db_session):
@@ -87,4 +89,107 @@ def test_search_intents(client, setup_data, query_params, expected_count):
     response = client.get("/api/intents/search", params=query_params)
     assert response.status_code == 200
     data = response.json()
-    assert len(data) == expected_count
\ No newline at end of file
+    assert len(data) == expected_count
+
+
+@pytest.mark.parametrize("query_params,expected_uids", [
+    ({"tags": "test,another"}, ["testservice.com:TestIntent:v1", "testservice.com:AnotherIntent:v1"]),
+    ({"tags": "test,another", "match": "all"}, ["testservice.com:AnotherIntent:v1"]),
+    ({"tags": "intent,another", "match": "all"}, []),
+    ({"tags": "test,intent,another", "limit": 1}, ["testservice.com:TestIntent:v1"]),
+    ({"tags": "test", "intent_name": "Another"}, ["testservice.com:AnotherIntent:v1"]),
+])
+def test_search_intents_tag_match(client, setup_data, query_params, expected_uids):
+    """Test that tag filters support any/all matching and never repeat an intent."""
+    response = client.get("/api/intents/search", params=query_params)
+    assert response.status_code == 200
+    assert [intent["intent_uid"] for intent in response.json()] == expected_uids
+
+def test_tag_index_posting_lists():
+    """Test posting-list intersection and union, including after removals."""
+    index = TagIndex()
+    index.loaded = True
+    index.apply([
+        IntentDocument(i, 1, f"uid{i}", f"Intent{i}", "", tags)
+        for i, tags in [(3, ("a", "b")), (1, ("a",)), (2, ("a", "b", "c")), (4, ("c",))]
+    ], [])
+    assert index.match(["a", "b"], match_all=True) == [2, 3]
+    assert index.match(["b", "c"]) == [2, 3, 4]
+    index.apply([IntentDocument(2, 1, "uid2", "Intent2", "", ("c",))], [3])
+    assert index.match(["a", "b"], match_all=True) == []
+    assert index.match(["a", "c"]) == [1, 2, 4]
+
+def test_suggest_intents(client, setup_data, db_session):
+    """Test prefix suggestions ranked by frequency and refreshed by catalog writes."""
+    response = client.get("/api/intents/suggest", params={"prefix": "t"})
+    assert response.status_code == 200
+    assert response.json()[0] == {"text": "test", "kind": "tag", "count": 2}
+    assert [item["text"] for item in response.json()] == [
+        "test", "TestIntent", "testservice.com:TestIntent:v1", "testservice.com:AnotherIntent:v1"
+    ]
+
+    response = client.get("/api/intents/suggest", params={"prefix": "AN", "kind": "intent_name"})
+    assert response.json() == [{"text": "AnotherIntent", "kind": "intent_name", "count": 1}]
+    assert client.get("/api/intents/suggest", params={"prefix": "t", "kind": "bogus"}).status_code == 422
+
+    create_intent(db_session, IntentCreate(
+        intent_uid="otherservice.com:TestIntent:v1",
+        intent_name="TestIntent",
+        description="A test intent of another service",
+        input_parameters=[],
+        output_parameters=[],
+        endpoint="https://otherservice.com/api/execute/TestIntent"
+    ), 1)
+    db_session.commit()
+    response = client.get("/api/intents/suggest", params={"prefix": "testi", "kind": ["intent_name", "tag"]})
+    assert response.json() == [{"text": "TestIntent", "kind": "intent_name", "count": 2}]
+
+def test_suggest_index_removals():
+    """Test that values disappear from suggestions once no intent carries them."""
+    index = SuggestIndex()
+    index.loaded = True
+    index.apply([
+        IntentDocument(1, 1, "a:Search:v1", "SearchFlights", "", ("search",)),
+        IntentDocument(2, 1, "b:Search:v1", "SearchHotels", "", ("search", "hotels")),
+    ], [])
+    assert index.suggest("sea", kinds=["tag"]) == [("search", "tag", 2)]
+    assert [text for text, _, _ in index.suggest("search", kinds=["intent_name"])] == ["SearchHotels", "SearchFlights"]
+    index.apply([], [2])
+    assert index.suggest("h") == []
+    assert index.suggest("sea", kinds=["tag"]) == [("search", "tag", 1)]
+
+def test_suggest_index_batched_changes():
+    """Test that cached rankings stay sorted when keys sharing a prefix change in one commit."""
+    def docs(name, start, count):
+        return [IntentDocument(i, 1, f"s{i}:x", name, "", ()) for i in range(start, start + count)]
+
+    index = SuggestIndex()
+    index.loaded = True
+    index.apply(docs("hc", 1, 5) + docs("hb", 10, 4), [])
+    index.suggest("h", kinds=["intent_name"])
+    index.apply(docs("ha", 20, 6) + docs("hb", 30, 3), [])
+    expected = [("hb", "intent_name", 7), ("ha", "intent_name", 6), ("hc", "intent_name", 5)]
+    assert index.suggest("h", kinds=["intent_name"]) == expected
+
+    fresh = SuggestIndex()
+    fresh.loaded = True
+    fresh.apply(docs("hc", 1, 5) + docs("hb", 10, 4) + docs("ha", 20, 6) + docs("hb", 30, 3), [])
+    assert fresh.suggest("h", kinds=["intent_name"]) == expected
+
+def test_search_cache_key_matches_query(client, setup_data):
+    """Test that requests sharing a cache key are answered from the same normalized query."""
+    padded = client.get("/api/intents/search", params={"description": "  Another  TEST intent "})
+    assert padded.headers["X-Cache"] == "MISS"
+    assert [intent["intent_name"] for intent in padded.json()] == ["AnotherIntent"]
+    plain = client.get("/api/intents/search", params={"description": "another test intent"})
+    assert plain.headers["X-Cache"] == "HIT"
+    assert plain.json() == padded.json()
+
+def test_tag_filter_rechecks_stale_index(setup_data, db_session):
+    """Test that a tag index missing another process's writes cannot return a non-matching intent."""
+    assert len(get_intents_by_filters(db_session, tags=["another"])) == 1
+    # A raw delete, like one from another process, bypasses the index updates
+    db_session.execute(intent_tags.delete())
+    db_session.commit()
+    assert get_intents_by_filters(db_session, tags=["another"]) == []
+    assert get_intents_by_filters(db_session, intent_name="Another", tags=["another"]) == []
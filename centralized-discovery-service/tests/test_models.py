@@ -1,6 +1,7 @@
 # tests/test_models.py
 
 import pytest
+from sqlalchemy import event
 from app.models import Service, Intent, Tag
 
 def test_service_model(db_session):
@@ -74,4 +75,38 @@ def test_tag_model(db_session):
     db_session.commit()
     db_session.refresh(intent)
     assert len(intent.tags) == 1
-    assert intent.tags[0].name == "test"
\ No newline at end of file
+    assert intent.tags[0].name == "test"
+
+def test_search_documents_load_tags_in_one_query(db_session, engine, create_intents):
+    """Updating many intents reads their stored tags at once and keeps them in search_document."""
+    intents = create_intents("docservice.com", [(f"Intent{i}", "Old") for i in range(5)])
+    travel = Tag(name="travel")
+    for intent in intents:
+        intent.tags = [travel]
+    db_session.commit()
+    db_session.expire_all()
+
+    statements = []
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    intents = db_session.query(Intent).filter(Intent.intent_uid.like("docservice.com:%")).all()
+    for intent in intents:
+        intent.description = "New"
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        db_session.flush()
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    assert sum("intent_tags" in statement for statement in statements) == 1
+    assert all(intent.search_document == f"{intent.intent_name} New travel" for intent in intents)
+
+    # Untouched searchable fields do not rebuild the document
+    statements.clear()
+    intents[0].endpoint = "https://docservice.com/api/v2"
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        db_session.flush()
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    assert not any("intent_tags" in statement for statement in statements)
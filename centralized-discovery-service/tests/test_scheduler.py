@@ -0,0 +1,140 @@
+# tests/test_scheduler.py
+
+import asyncio
+import pytest
+from datetime import timedelta
+from unittest.mock import patch
+from app.config import settings
+from app.models import CrawlFrontier, Service
+from app.services.crawler import Crawler, FetchResult
+from app.services.scheduler import (
+    CrawlScheduler, claim_due_domains, next_interval, renew_leases, retry_delay, utcnow
+)
+
+def test_next_interval_adapts_to_change_frequency():
+    """Changing domains are recrawled sooner, stable ones later, within bounds."""
+    assert next_interval(8 * 3600, changed=True) == 4 * 3600
+    assert next_interval(8 * 3600, changed=False) == 12 * 3600
+    assert next_interval(settings.CRAWL_MIN_INTERVAL, changed=True) == settings.CRAWL_MIN_INTERVAL
+    assert next_interval(settings.CRAWL_MAX_INTERVAL, changed=False) == settings.CRAWL_MAX_INTERVAL
+    assert retry_delay(1) < retry_delay(2) < retry_delay(3) <= settings.CRAWL_MAX_INTERVAL
+
+@pytest.mark.asyncio
+async def test_scheduler_records_outcomes_and_resumes(db_session):
+    """Due domains are crawled once, rescheduled from their outcome, and reloaded on restart."""
+    document = {
+        "service_info": {"name": "changing.com", "description": "", "service_url": "https://changing.com"},
+        "intents": []
+    }
+    outcomes = {
+        "changing.com": FetchResult(status=200, data=document),
+        "stable.com": FetchResult(status=304),
+        "down.com": None
+    }
+    crawled = []
+    scheduler = CrawlScheduler(db_session, concurrency=2)
+
+    async def fetch(self, url, service=None):
+        domain = url.split("/")[2]
+        crawled.append(domain)
+        if len(crawled) == len(outcomes):
+            scheduler.stop()
+        return outcomes[domain]
+
+    assert scheduler.add_domains(outcomes) == 3
+    with patch('app.services.crawler.get_agents_json_url_from_dns', return_value=None), \
+            patch.object(Crawler, 'fetch', fetch):
+        await scheduler.run()
+
+    assert sorted(crawled) == sorted(outcomes)
+    # The document and the frontier are written by the crawler's writer
+    service = db_session.query(Service).filter_by(name="changing.com").one()
+    assert service.agents_json_url == "https://changing.com/agents.json"
+    rows = {row.domain: row for row in db_session.query(CrawlFrontier)}
+    initial = settings.CRAWL_INITIAL_INTERVAL
+    assert rows["changing.com"].interval_seconds == initial / 2
+    assert rows["changing.com"].change_count == 1
+    assert rows["stable.com"].interval_seconds == initial * 1.5
+    assert rows["stable.com"].change_count == 0
+    assert rows["down.com"].failure_count == 1
+    assert rows["down.com"].interval_seconds == initial
+
+    # A new scheduler picks up the persisted schedule instead of starting over
+    restarted = CrawlScheduler(db_session)
+    assert restarted.add_domains(["stable.com", "new.com"]) == 1
+    restarted.load()
+    assert sorted(domain for _, domain in restarted._queue) == sorted([*outcomes, "new.com"])
+    assert restarted._queue[0][1] == "new.com"
+
+def test_claim_due_domains_leases_disjoint_batches(db_session):
+    """Workers claim disjoint batches of due domains and reclaim expired leases."""
+    CrawlScheduler(db_session).add_domains(f"service{i}.com" for i in range(5))
+    now = utcnow() + timedelta(seconds=1)
+    first = [domain for _, domain in claim_due_domains(db_session, "worker-a", 3, 60, now=now)]
+    second = [domain for _, domain in claim_due_domains(db_session, "worker-b", 3, 60, now=now)]
+    assert len(first) == 3
+    assert len(second) == 2
+    assert not set(first) & set(second)
+    assert claim_due_domains(db_session, "worker-b", 3, 60, now=now) == []
+
+    # worker-a crashed: its leases expire and worker-b picks the domains up
+    later = now + timedelta(seconds=61)
+    reclaimed = [domain for _, domain in claim_due_domains(db_session, "worker-b", 10, 60, now=later)]
+    assert sorted(reclaimed) == sorted(first + second)
+    owners = {row.lease_owner for row in db_session.query(CrawlFrontier)}
+    assert owners == {"worker-b"}
+
+@pytest.mark.asyncio
+async def test_leased_scheduler_releases_after_crawl(db_session):
+    """A scheduler with an owner crawls claimed domains and releases their leases."""
+    scheduler = CrawlScheduler(db_session, concurrency=1, owner="worker-a")
+    scheduler.add_domains(["a.com", "b.com"])
+    crawled = []
+
+    async def fetch(self, url, service=None):
+        crawled.append(url.split("/")[2])
+        if len(crawled) == 2:
+            scheduler.stop()
+        return FetchResult(status=304)
+
+    with patch('app.services.crawler.get_agents_json_url_from_dns', return_value=None), \
+            patch.object(Crawler, 'fetch', fetch):
+        await scheduler.run()
+
+    assert sorted(crawled) == ["a.com", "b.com"]
+    assert all(row.lease_owner is None for row in db_session.query(CrawlFrontier))
+
+def test_leases_are_renewed_and_only_the_owner_records(db_session):
+    """Held leases are extended; a scheduler that lost a lease leaves the domain to its new owner."""
+    CrawlScheduler(db_session).add_domains(["a.com", "b.com"])
+    now = utcnow() + timedelta(seconds=1)
+    claim_due_domains(db_session, "worker-a", 1, 60, now=now)
+    assert renew_leases(db_session, "worker-a", 600, now=now + timedelta(seconds=30)) == 1
+    # worker-a's lease outlives the original 60s, so worker-b only gets the other domain
+    claimed = claim_due_domains(db_session, "worker-b", 2, 60, now=now + timedelta(seconds=90))
+    assert [domain for _, domain in claimed] == ["b.com"]
+    assert renew_leases(db_session, "worker-a", 600, now=now + timedelta(seconds=3600)) == 0
+
+    scheduler = CrawlScheduler(db_session, owner="worker-a")
+    scheduler.record("b.com", changed=True)
+    row = db_session.query(CrawlFrontier).filter_by(domain="b.com").one()
+    assert (row.lease_owner, row.crawl_count) == ("worker-b", 0)
+    scheduler.record("a.com", changed=True)
+    row = db_session.query(CrawlFrontier).filter_by(domain="a.com").one()
+    assert (row.lease_owner, row.crawl_count) == (None, 1)
+
+@pytest.mark.asyncio
+async def test_idle_workers_share_an_empty_claim(db_session):
+    """When nothing is due, one worker queries the frontier and the others wait for the next poll."""
+    scheduler = CrawlScheduler(db_session, concurrency=20, owner="worker-a")
+    with patch('app.services.scheduler.claim_due_domains', return_value=[]) as claim, \
+            patch.object(settings, 'CRAWLER_VALIDATION_PROCESSES', 0):
+        running = asyncio.ensure_future(scheduler.run())
+        await asyncio.sleep(0.2)
+        assert claim.call_count == 1
+        # New domains are claimed right away
+        scheduler.add_domains(["new.com"])
+        await asyncio.sleep(0.2)
+        assert claim.call_count == 2
+        scheduler.stop()
+        await running
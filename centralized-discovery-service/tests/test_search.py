@@ -1,7 +1,24 @@
 # tests/test_search.py
 
+import asyncio
+import math
+import time
+from types import SimpleNamespace
+import numpy as np
 import pytest
-from app.models import Service, Intent
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.crud import aio
+from app.models import Service, Intent, Tag
+from app.services import hybrid, nlp
+from app.services.hybrid import reciprocal_rank_fusion
+from app.services.nlp import ProcessedQuery, QueryPreprocessor, process_natural_language_query, rank_natural_language_query
+from app.search.bm25 import BM25Index
+from app.search.cache import QueryCache
+from app.search.indexing import IntentDocument
+from app.search.vectors import VectorIndex, encode_texts
 
 @pytest.fixture
 def setup_data(db_session):
@@ -37,4 +54,371 @@ def test_search_intents_by_query(client, setup_data, query, expected_count):
     response = client.get("/api/search/", params={"query": query})
     assert response.status_code == 200
     data = response.json()
-    assert len(data) == expected_count
\ No newline at end of file
+    assert len(data) == expected_count
+
+
+def test_search_ranks_and_follows_updates(db_session, create_intents):
+    """Test that full-text results are ranked and track description and tag changes."""
+    create_intents("rankservice.com", [
+        ("RentApartment", "Rent an apartment"),
+        ("FindApartment", "Find an apartment, apartment listings and apartment photos"),
+    ])
+
+    intents = process_natural_language_query(db_session, "apartment")
+    assert [intent.intent_name for intent in intents] == ["FindApartment", "RentApartment"]
+
+    intent = intents[1]
+    intent.description = "Rent a flat"
+    intent.tags.append(Tag(name="housing"))
+    db_session.commit()
+    assert [i.intent_name for i in process_natural_language_query(db_session, "apartment")] == ["FindApartment"]
+    assert [i.intent_name for i in process_natural_language_query(db_session, "housing flat")] == ["RentApartment"]
+
+def test_search_errors_are_not_swallowed(db_session, setup_data):
+    """A failing full-text query raises instead of looking like an empty result."""
+    savepoint = db_session.begin_nested()
+    db_session.execute(text("DROP TABLE intents_fts"))
+    with pytest.raises(OperationalError):
+        rank_natural_language_query(db_session, "searches for properties")
+    savepoint.rollback()
+    assert len(rank_natural_language_query(db_session, "searches for properties")) == 1
+
+def _walk_pages(client, url, params):
+    """Follow X-Next-Cursor headers and return the intent names of every page."""
+    names, cursor = [], None
+    while True:
+        response = client.get(url, params={**params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200
+        names.append([intent["intent_name"] for intent in response.json()])
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return names
+
+@pytest.mark.parametrize("url,params", [
+    ("/api/search/", {"query": "booking", "limit": 2}),
+    ("/api/search/", {"query": "booking", "limit": 2, "mode": "semantic"}),
+    ("/api/search/", {"query": "booking", "limit": 2, "mode": "bm25"}),
+    ("/api/intents/search", {"description": "booking", "limit": 2}),
+    ("/api/intents/search", {"limit": 2}),
+])
+def test_cursor_pagination(client, create_intents, url, params):
+    """Test that cursor pagination walks every match exactly once."""
+    create_intents("pageservice.com", [(f"Book{i}", "Make a booking " + "booking " * (i % 2)) for i in range(5)])
+
+    pages = _walk_pages(client, url, params)
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert sorted(name for page in pages for name in page) == [f"Book{i}" for i in range(5)]
+
+def test_invalid_cursor(client):
+    """Test that a malformed cursor is rejected."""
+    response = client.get("/api/search/", params={"query": "booking", "cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+@pytest.mark.parametrize("url,params", [
+    ("/api/search/", {"query": "booking"}),
+    ("/api/intents/search", {"description": "booking"}),
+    ("/api/intents/search", {"tags": "travel"}),
+])
+def test_query_count_independent_of_page_size(client, db_session, engine, create_intents, url, params):
+    """Test that serializing a page with tags issues a constant number of queries."""
+    travel = Tag(name="travel")
+    intents = create_intents("countservice.com", [(f"Book{i}", "Make a booking") for i in range(12)])
+    for i, intent in enumerate(intents):
+        intent.tags = [travel, Tag(name=f"tag{i}")]
+    db_session.commit()
+    db_session.expire_all()
+
+    statements = []
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    counts = {}
+    client.get(url, params={**params, "limit": 1})  # build in-process indexes
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        for limit in (2, 10):
+            statements.clear()
+            db_session.expire_all()
+            response = client.get(url, params={**params, "limit": limit})
+            assert response.status_code == 200
+            assert len(response.json()) == limit
+            assert all(len(intent["tags"]) == 2 for intent in response.json())
+            counts[limit] = len(statements)
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    assert counts[2] == counts[10]
+
+def test_search_results_are_cached_until_a_write(client, db_session, setup_data):
+    """Test that repeated searches hit the cache and that writes invalidate it."""
+    params = {"query": "Searches  for PROPERTIES"}
+    first = client.get("/api/search/", params=params)
+    second = client.get("/api/search/", params={"query": "searches for properties"})
+    assert first.headers["X-Cache"] == "MISS"
+    assert second.headers["X-Cache"] == "HIT"
+    assert second.json() == first.json()
+
+    intent = db_session.query(Intent).filter_by(intent_uid="testservice.com:TestIntent:v1").one()
+    intent.description = "A test intent that rents cars"
+    db_session.commit()
+    third = client.get("/api/search/", params=params)
+    assert third.headers["X-Cache"] == "MISS"
+    assert third.json() == []
+
+    stats = client.get("/api/metrics/cache").json()
+    assert stats["hits"] >= 1 and stats["misses"] >= 2
+
+def test_query_cache_bounds():
+    """Test LRU eviction by entry count and by byte size."""
+    cache = QueryCache(max_entries=2, max_bytes=10, ttl_seconds=60)
+    for key, size in [("a", 4), ("b", 4)]:
+        cache.get_or_load(key, lambda: (key, size))
+    assert cache.get_or_load("a", lambda: ("stale", 4)) == ("a", True)
+    cache.get_or_load("c", lambda: ("c", 4))  # evicts b, the least recently used
+    assert cache.get_or_load("b", lambda: ("b2", 4)) == ("b2", False)
+    cache.get_or_load("d", lambda: ("d", 9))  # too many bytes for anything else to stay
+    assert cache.stats()["entries"] == 1 and cache.stats()["bytes"] == 9
+    cache.get_or_load("huge", lambda: ("huge", 11))  # larger than the cache, never stored
+    assert cache.stats()["entries"] == 1
+
+def test_semantic_search(client, db_session, create_intents):
+    """Semantic mode matches on embeddings stored at ingest and follows catalog writes."""
+    flights, _ = create_intents("travel.com", [
+        ("SearchFlights", "Look up airline tickets between two airports"),
+        ("RentCar", "Reserve a rental vehicle"),
+    ])
+    assert len(flights.embedding) > 0
+
+    # No word of the query appears as such in the intent
+    response = client.get("/api/search/", params={"query": "flight search", "mode": "semantic"})
+    assert response.status_code == 200
+    assert response.json()[0]["intent_name"] == "SearchFlights"
+
+    db_session.delete(flights)
+    db_session.commit()
+    names = [intent["intent_name"] for intent in client.get(
+        "/api/search/", params={"query": "flight search", "mode": "semantic"}
+    ).json()]
+    assert "SearchFlights" not in names
+
+def test_vector_index_incremental_updates():
+    """The vector index keeps its matrix dense across removals and ranks by cosine similarity."""
+    texts = ["book a hotel room", "hotel booking", "weather forecast"]
+    index = VectorIndex()
+    index.loaded = True
+    index.apply([
+        IntentDocument(id=i + 1, service_id=1, intent_uid=f"s:{i}", intent_name=text, description="",
+                       embedding=encode_texts([text])[0].tobytes())
+        for i, text in enumerate(texts)
+    ], [])
+    query = encode_texts(["hotel booking"])[0]
+    assert [intent_id for intent_id, _ in index.search(query, 2)] == [2, 1]
+
+    index.apply([], [2])
+    hits = index.search(query, 3)
+    assert hits[0][0] == 1
+    assert 2 not in {intent_id for intent_id, _ in hits}
+    assert np.isclose(hits[0][1], float(encode_texts(["book a hotel room"])[0] @ query))
+
+def test_bm25_search(client, db_session, create_intents):
+    """BM25 mode weights names above descriptions and follows catalog writes."""
+    create_intents("bm25.com", [
+        ("BookHotel", "Reserve a room"),
+        ("ListRooms", "Show the hotel rooms of a city"),
+        ("GetWeather", "Weather forecast for a city"),
+    ])
+
+    def names(query):
+        response = client.get("/api/search/", params={"query": query, "mode": "bm25"})
+        assert response.status_code == 200
+        return [intent["intent_name"] for intent in response.json()]
+
+    assert names("hotel") == ["BookHotel", "ListRooms"]
+    assert names("nothing matches") == []
+
+    weather = db_session.query(Intent).filter_by(intent_name="GetWeather").one()
+    weather.tags.append(Tag(name="hotel"))
+    db_session.delete(db_session.query(Intent).filter_by(intent_name="BookHotel").one())
+    db_session.commit()
+    assert names("hotel") == ["GetWeather", "ListRooms"]
+
+def test_bm25_index_scores():
+    """The BM25 index matches a scalar BM25 computation and reuses rows of removed intents."""
+    def doc(intent_id, description):
+        return IntentDocument(id=intent_id, service_id=1, intent_uid=f"s:{intent_id}",
+                              intent_name="", description=description)
+
+    index = BM25Index()
+    index.loaded = True
+    index.apply([doc(1, "cheap flights"), doc(2, "cheap cheap hotels nearby"), doc(3, "car rental")], [])
+    hits = dict(index.search("cheap", 3))
+    assert set(hits) == {1, 2}
+
+    # Description weight 1: idf * tf / (tf + k1 * (1 - b + b * length / average))
+    idf = math.log(1 + (3 - 2 + 0.5) / (2 + 0.5))
+    average = 8 / 3
+    expected = idf * 2 / (2 + 1.2 * (1 - 0.75 + 0.75 * 4 / average))
+    assert math.isclose(hits[2], expected)
+
+    index.apply([doc(4, "cheap trains")], [3])
+    assert len(index._ids[:index._rows_used]) == 3
+    assert [intent_id for intent_id, _ in index.search("trains", 3)] == [4]
+
+def test_reciprocal_rank_fusion():
+    """Ids ranked well by several retrievers beat ids ranked first by only one."""
+    fused = reciprocal_rank_fusion([[1, 2, 3], [2, 3], [4]], k=60)
+    assert [item_id for item_id, _ in fused] == [2, 3, 1, 4]
+    assert fused[0][1] == pytest.approx(1 / 62 + 1 / 61)
+
+def test_hybrid_search(client, create_intents, monkeypatch):
+    """Hybrid search fuses its retrievers, reports stage timings and cuts off slow retrievers."""
+    create_intents("hybrid.com", [
+        ("BookHotel", "Reserve a hotel room"),
+        ("ListHotels", "List hotels of a city"),
+        ("GetWeather", "Weather forecast for a city"),
+    ])
+
+    assert client.get("/api/search/hybrid").status_code == 400
+
+    response = client.get("/api/search/hybrid", params={"query": "hotel room", "intent_name": "Book"})
+    assert response.status_code == 200
+    assert response.json()[0]["intent_name"] == "BookHotel"
+    stages = [part.split(";")[0] for part in response.headers["Server-Timing"].split(", ")]
+    assert stages == ["filters", "fulltext", "vector", "fusion", "fetch", "total"]
+
+    monkeypatch.setattr(hybrid, "rank_semantic_query", stuck_query)
+    monkeypatch.setattr(settings, "HYBRID_TIME_BUDGET_MS", 300)
+    started = time.perf_counter()
+    response = client.get("/api/search/hybrid", params={"query": "weather forecast"})
+    # The stuck retriever is interrupted, even though it shares the test's connection
+    assert time.perf_counter() - started < 5
+    assert response.status_code == 200
+    assert [intent["intent_name"] for intent in response.json()] == ["GetWeather"]
+    assert 'vector;dur=300.0;desc="timeout"' in response.headers["Server-Timing"]
+
+def stuck_query(db, **kwargs):
+    """A retriever whose query runs for minutes unless it is interrupted."""
+    db.execute(text(
+        "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 1000000000) SELECT max(i) FROM n"
+    )).scalar()
+    return []
+
+@pytest.mark.asyncio
+async def test_run_isolated_interrupts_cancelled_queries(tmp_path):
+    """Cancelling an isolated call interrupts its query and gives its connection back to the pool."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'isolated.db'}")
+    with Session(engine) as db:
+        started = time.perf_counter()
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(aio.run_isolated(db, stuck_query), timeout=0.2)
+        for _ in range(100):
+            if engine.pool.checkedout() == 0:
+                break
+            await asyncio.sleep(0.05)
+        assert engine.pool.checkedout() == 0
+        assert time.perf_counter() - started < 5
+    engine.dispose()
+
+def test_query_preprocessor(tmp_path, monkeypatch):
+    """Queries are reduced to their content words, expanded with synonyms and cached."""
+    synonyms = tmp_path / "synonyms.json"
+    synonyms.write_text('{"flat": ["apartment", "condo-unit"]}')
+    monkeypatch.setattr(settings, "NLP_SYNONYMS_FILE", str(synonyms))
+    preprocessor = QueryPreprocessor(model=None, cache_size=2)
+
+    processed = preprocessor.process("I want  a FLAT in Paris")
+    assert processed.terms == (("flat", "apartment", "condo unit"), ("paris",))
+    assert preprocessor.process("for the").terms == (("for",), ("the",))
+
+    preprocessor.process("I want a FLAT  in Paris")
+    stats = preprocessor.stats()
+    assert stats["backend"] == "fallback" and stats["load_seconds"] is not None
+    assert stats["processed"] == 2 and stats["cache_hits"] == 1
+
+def test_query_preprocessor_lemmas():
+    """With a spaCy pipeline, lemmas are searched alongside the words and entities are kept."""
+    def token(text, lemma, is_stop=False):
+        return SimpleNamespace(text=text, lower_=text.lower(), lemma_=lemma, is_stop=is_stop)
+
+    class FakeDoc(list):
+        ents = [SimpleNamespace(text="Paris", label_="GPE")]
+
+    preprocessor = QueryPreprocessor(model=None)
+    preprocessor.load()
+    preprocessor._nlp = lambda text: FakeDoc(
+        [token("Booking", "book"), token("in", "in", True), token("Paris", "Paris"), token("!", "!")]
+    )
+    processed = preprocessor.process("Booking in Paris!")
+    assert processed.terms == (("book", "booking"), ("paris",))
+    assert processed.entities == (("Paris", "GPE"),)
+    assert processed.text == "book paris"
+
+def test_search_matches_entities_as_phrases(client, create_intents, monkeypatch):
+    """Multi-word entities, recognized in the query as typed, must appear as phrases."""
+    create_intents("stay.com", [
+        ("NewYorkHotels", "Book hotels in New York"),
+        ("YorkHotels", "Book hotels in York, new listings every day"),
+    ])
+
+    class FakeDoc(list):
+        ents = []
+
+    def recognize(text):
+        doc = FakeDoc(
+            SimpleNamespace(text=word, lower_=word.lower(), lemma_=word.lower(), is_stop=word.lower() == "in")
+            for word in text.split()
+        )
+        doc.ents = [SimpleNamespace(text="New York", label_="GPE")] if "New York" in text else []
+        return doc
+
+    preprocessor = QueryPreprocessor(model=None)
+    preprocessor.load()
+    preprocessor._nlp = recognize
+    monkeypatch.setattr(nlp, "query_preprocessor", preprocessor)
+
+    assert ProcessedQuery((("new",), ("york",)), (("New York", "GPE"), ("York", "GPE"))).match_groups == (
+        ("new",), ("york",), ("new york",)
+    )
+    response = client.get("/api/search/", params={"query": "hotels in  New York"})
+    assert [intent["intent_name"] for intent in response.json()] == ["NewYorkHotels"]
+    # Cached under the lowercased query
+    assert client.get("/api/search/", params={"query": "HOTELS IN NEW YORK"}).headers["X-Cache"] == "HIT"
+
+def test_search_expands_synonyms(db_session, setup_data, tmp_path, monkeypatch):
+    """Full-text search matches synonyms of the query terms."""
+    synonyms = tmp_path / "synonyms.json"
+    synonyms.write_text('{"houses": ["properties"]}')
+    monkeypatch.setattr(settings, "NLP_SYNONYMS_FILE", str(synonyms))
+    monkeypatch.setattr(nlp, "query_preprocessor", nlp.QueryPreprocessor(model=None))
+    assert [i.intent_name for i in process_natural_language_query(db_session, "searches houses")] == ["TestIntent"]
+    assert process_natural_language_query(db_session, "searches castles") == []
+
+def test_nlp_metrics(client):
+    """The NLP metrics endpoint reports preprocessing cost and cache use."""
+    client.get("/api/search/", params={"query": "anything at all"})
+    stats = client.get("/api/metrics/nlp").json()
+    assert stats["processed"] >= 1
+    assert {"backend", "load_seconds", "average_ms", "cache_hits", "cache_misses"} <= stats.keys()
+
+def test_vector_index_hnsw_updates(monkeypatch):
+    """The HNSW path survives several intents updated in one commit and matches exact search."""
+    hnswlib = pytest.importorskip("hnswlib")
+    def doc(intent_id, text):
+        return IntentDocument(id=intent_id, service_id=1, intent_uid=f"s:{intent_id}", intent_name=text,
+                              description="", embedding=encode_texts([text])[0].tobytes())
+
+    monkeypatch.setattr(settings, "EMBEDDING_HNSW_MIN_SIZE", 2)
+    texts = ["book a hotel room", "hotel booking", "weather forecast", "car rental", "flight search"]
+    index = VectorIndex()
+    index.loaded = True
+    index.apply([doc(i + 1, text) for i, text in enumerate(texts)], [])
+    query = encode_texts(["hotel booking"])[0]
+    assert index.search(query, 2)[0][0] == 2
+    assert isinstance(index._hnsw, hnswlib.Index)
+
+    # Two updates in one commit: both labels are deleted, then re-added
+    index.apply([doc(2, "rain forecast"), doc(3, "hotel booking")], [])
+    assert sorted(index._hnsw.get_ids_list()) == [1, 2, 3, 4, 5]
+    assert [intent_id for intent_id, _ in index.search(query, 2)] == [3, 1]
+
+    index.apply([], [2, 3])
+    assert {intent_id for intent_id, _ in index.search(query, 5)} <= {1, 4, 5}
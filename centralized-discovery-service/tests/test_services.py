@@ -0,0 +1,96 @@
+# tests/test_services.py
+
+import json
+import pytest
+from app.crud.intent import get_intent_by_uid, get_intents_by_filters
+from app.crud.service import bulk_upsert_agents_json, get_service_by_name
+from app.schemas.service import AgentsJson
+
+def make_document(service_name, intent_names, tags=("bulk",), description="Bulk intent"):
+    """Build an agents.json document with one intent per name."""
+    return {
+        "service_info": {
+            "name": service_name,
+            "description": f"{service_name} service",
+            "service_url": f"https://{service_name}"
+        },
+        "intents": [
+            {
+                "intent_uid": f"{service_name}:{name}:v1",
+                "intent_name": name,
+                "description": description,
+                "input_parameters": [{"name": "query", "type": "string", "required": True}],
+                "output_parameters": [],
+                "endpoint": f"https://{service_name}/api/execute/{name}",
+                "tags": list(tags)
+            }
+            for name in intent_names
+        ]
+    }
+
+def test_bulk_upsert_agents_json(db_session):
+    """Test that bulk upserts insert, then update, services, intents and tags."""
+    documents = [make_document(f"bulk{i}.com", [f"Intent{j}" for j in range(3)]) for i in range(5)]
+    totals = bulk_upsert_agents_json(db_session, [AgentsJson(**d) for d in documents], batch_size=2)
+    assert totals == {"services": 5, "intents": 15, "skipped": 0}
+    # Warm the trigram index so the next batch is applied incrementally
+    assert get_intents_by_filters(db_session, intent_name="Renamed") == []
+
+    updated = make_document("bulk0.com", ["Intent0"], tags=("fresh", "bulk"), description="Renamed intent")
+    bulk_upsert_agents_json(db_session, [AgentsJson(**updated)])
+
+    intent = get_intent_by_uid(db_session, "bulk0.com:Intent0:v1")
+    assert intent.description == "Renamed intent"
+    assert intent.input_parameters[0]["name"] == "query"
+    assert sorted(tag.name for tag in intent.tags) == ["bulk", "fresh"]
+    assert get_service_by_name(db_session, "bulk4.com") is not None
+    assert [i.intent_uid for i in get_intents_by_filters(db_session, description="Renamed")] == [
+        "bulk0.com:Intent0:v1"
+    ]
+
+def test_bulk_endpoint_json_array(client, db_session):
+    """Test ingesting a JSON array of documents."""
+    documents = [make_document("arrayservice.com", ["SearchFlights", "BookFlight"])]
+    response = client.post("/api/services/bulk", json=documents)
+    assert response.status_code == 200
+    assert response.json() == {"services": 1, "intents": 2, "skipped": 0, "rejected": []}
+    assert get_intent_by_uid(db_session, "arrayservice.com:BookFlight:v1") is not None
+
+def test_bulk_endpoint_ndjson_stream(client, db_session):
+    """Test ingesting a stream of newline-delimited documents."""
+    body = "\n".join(json.dumps(make_document(f"stream{i}.com", ["Intent"])) for i in range(3)) + "\n"
+    response = client.post(
+        "/api/services/bulk", content=body, headers={"Content-Type": "application/x-ndjson"}
+    )
+    assert response.status_code == 200
+    assert response.json() == {"services": 3, "intents": 3, "skipped": 0, "rejected": []}
+    assert get_intent_by_uid(db_session, "stream2.com:Intent:v1") is not None
+
+def test_bulk_endpoint_reports_invalid_lines(client, db_session):
+    """Test that invalid NDJSON lines are skipped and reported with their line numbers."""
+    body = "\n".join([
+        json.dumps(make_document("valid.com", ["Intent"])),
+        json.dumps({"intents": []}),
+        json.dumps(make_document("alsovalid.com", ["Intent"]))
+    ])
+    response = client.post(
+        "/api/services/bulk", content=body, headers={"Content-Type": "application/x-ndjson"}
+    )
+    assert response.status_code == 207
+    result = response.json()
+    assert (result["services"], result["intents"]) == (2, 2)
+    assert [rejected["line"] for rejected in result["rejected"]] == [2]
+    assert get_intent_by_uid(db_session, "alsovalid.com:Intent:v1") is not None
+
+def test_bulk_upsert_keeps_intents_of_other_services(db_session):
+    """Test that an upsert never moves an intent that belongs to another service."""
+    bulk_upsert_agents_json(db_session, [AgentsJson(**make_document("owner.com", ["Intent"]))])
+    squatter = make_document("squatter.com", ["Other"])
+    squatter["intents"].append({**make_document("owner.com", ["Intent"])["intents"][0], "description": "Stolen"})
+    totals = bulk_upsert_agents_json(db_session, [AgentsJson(**squatter)])
+    assert totals == {"services": 1, "intents": 1, "skipped": 1}
+
+    intent = get_intent_by_uid(db_session, "owner.com:Intent:v1")
+    assert intent.service_id == get_service_by_name(db_session, "owner.com").id
+    assert intent.description == "Bulk intent"
+    assert get_intent_by_uid(db_session, "squatter.com:Other:v1") is not None